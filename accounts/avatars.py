@@ -0,0 +1,47 @@
+'''
+Deterministic identicon avatars, generated once per user and stored locally.
+
+The SVG is derived from a SHA-256 of the user's id and username and saved
+under a content-addressed name, so its URL can be cached forever. The URL
+is stored on the user's Avatar row and templates only read it back.
+'''
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import Avatar
+
+GRID = 5
+
+
+def identicon_svg(digest):
+    '''
+    A GRID x GRID pattern mirrored around the middle column
+    '''
+    hue = int.from_bytes(digest[:2], 'big') % 360
+    bits = int.from_bytes(digest[2:6], 'big')
+    half = (GRID + 1) // 2
+    cells = []
+    for row in range(GRID):
+        for column in range(half):
+            if bits & 1:
+                cells.append((column, row))
+                if column != GRID - 1 - column:
+                    cells.append((GRID - 1 - column, row))
+            bits >>= 1
+    path = ''.join('M{} {}h1v1h-1z'.format(column, row) for column, row in cells)
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {grid} {grid}" width="256" height="256" '
+        'shape-rendering="crispEdges"><rect width="{grid}" height="{grid}" fill="#f0f0f0"/>'
+        '<path fill="hsl({hue},55%,50%)" d="{path}"/></svg>'
+    ).format(grid=GRID, hue=hue, path=path)
+
+
+def create_avatar(user):
+    digest = hashlib.sha256('{}:{}'.format(user.pk, user.username).encode('utf-8')).digest()
+    name = 'avatars/{}.svg'.format(digest.hex()[:24])
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(identicon_svg(digest).encode('utf-8')))
+    avatar, _ = Avatar.objects.update_or_create(user=user, defaults={'url': default_storage.url(name)})
+    return avatar
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from accounts.avatars import create_avatar
+
+
+class Command(BaseCommand):
+    help = 'Generate identicon avatars for users that do not have one yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate every avatar')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if not options['all']:
+            users = users.filter(avatar__isnull=True)
+        count = 0
+        for user in users.iterator(chunk_size=1000):
+            create_avatar(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS('Generated {} avatars'.format(count)))
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.5 on 2026-10-19 07:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Avatar',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='avatar', serialize=False, to='auth.user')),
+                ('url', models.CharField(max_length=255)),
+            ],
+        ),
+    ]
@@ -1,3 +1,14 @@
 from django.db import models
+from django.contrib.auth.models import User
 
 # Create your models here.
+
+class Avatar(models.Model):
+    '''
+    Precomputed avatar URL, see accounts/avatars.py
+    '''
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='avatar')
+    url = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,12 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .avatars import create_avatar
+
+
+@receiver(post_save, sender=User)
+def generate_avatar(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: create_avatar(instance))
@@ -0,0 +1,16 @@
+from django import template
+from django.core.exceptions import ObjectDoesNotExist
+from django.templatetags.static import static
+
+register = template.Library()
+
+
+@register.filter
+def avatar_url(user):
+    '''
+    Reads the stored URL; prefetch_related('created_by__avatar') keeps it query-free
+    '''
+    try:
+        return user.avatar.url
+    except ObjectDoesNotExist:
+        return static('img/userprofile.jpg')
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from io import StringIO
+
+from ..avatars import create_avatar
+from ..models import Avatar
+from ..templatetags.avatars import avatar_url
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AvatarTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+
+    def test_avatar_generated_on_signup(self):
+        avatar = Avatar.objects.get(user=self.user)
+        self.assertTrue(avatar.url.startswith('/media/avatars/'))
+        self.assertTrue(avatar.url.endswith('.svg'))
+
+    def test_avatar_is_deterministic(self):
+        url = Avatar.objects.get(user=self.user).url
+        self.assertEquals(create_avatar(self.user).url, url)
+
+    def test_avatar_served_with_long_cache_headers(self):
+        response = self.client.get(Avatar.objects.get(user=self.user).url)
+        self.assertEquals(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'<svg', b''.join(response.streaming_content))
+
+    def test_missing_avatar(self):
+        response = self.client.get(reverse('avatar', kwargs={'name': 'missing'}))
+        self.assertEquals(response.status_code, 404)
+
+    def test_filter_reads_stored_url(self):
+        user = User.objects.select_related('avatar').get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEquals(avatar_url(user), user.avatar.url)
+
+    def test_filter_falls_back_without_avatar(self):
+        user = User.objects.create_user(username='jane', email='jane@doe.com', password='321')
+        url = avatar_url(user)
+        self.assertEquals(url, '/static/img/userprofile.jpg')
+        self.assertIsNotNone(finders.find(url[len(settings.STATIC_URL):]))
+
+    def test_backfill_command(self):
+        user = User.objects.create_user(username='jane', email='jane@doe.com', password='321')
+        call_command('generate_avatars', stdout=StringIO())
+        self.assertTrue(Avatar.objects.filter(user=user).exists())
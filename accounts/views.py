@@ -1,8 +1,11 @@
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.contrib.auth import login
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_safe
 from django.utils.decorators import method_decorator
 from django.views.generic import UpdateView
 
@@ -32,4 +35,17 @@ class UserUpdateView(UpdateView):
     context_object_name = 'user'
     
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+
+@require_safe
+def avatar(request, name):
+    '''
+    Avatar file names are content hashes, so they can be cached forever
+    '''
+    path = 'avatars/{}.svg'.format(name)
+    if not default_storage.exists(path):
+        raise Http404('No such avatar')
+    response = FileResponse(default_storage.open(path), content_type='image/svg+xml')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
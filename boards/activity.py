@@ -0,0 +1,155 @@
+'''
+Posts written per hour and per day, per board and site-wide.
+
+Every new post bumps four Activity rows once it is committed: its hour and
+its day, for its board and for the whole site. Charts then read one row per
+bucket instead of grouping boards_post by created_at. Buckets start on UTC
+hours and days, and buckets without posts have no row.
+
+The site-wide rows are hot, so posts are first counted per process and
+written at most every ACTIVITY_FLUSH_INTERVAL seconds, by the next post after
+the interval (and when the process exits), in one transaction with one
+UPDATE per bucket. Charts trail by up to that interval.
+
+Deleted posts are not taken back out; the rollups count posts as they were
+written. Posts that bypass signals (imports) are counted by
+`manage.py rollup_activity`, which rebuilds the rollups from boards_post.
+'''
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, router, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import Activity, Post
+from .routers import board_databases
+
+PERIODS = {Activity.HOUR: timedelta(hours=1), Activity.DAY: timedelta(days=1)}
+
+# {(board id, hour): posts} not written yet by this process
+pending = Counter()
+lock = threading.Lock()
+flushed_at = 0.0
+
+
+def bucket_start(moment, period):
+    moment = moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if period == Activity.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def record_post(board_id, created_at):
+    with lock:
+        pending[board_id, bucket_start(created_at, Activity.HOUR)] += 1
+        due = time.monotonic() - flushed_at >= settings.ACTIVITY_FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def flush():
+    '''
+    Write this process's pending posts; they stay pending if that fails
+    '''
+    global flushed_at
+    with lock:
+        posts = pending.copy()
+        pending.clear()
+        flushed_at = time.monotonic()
+    counts = Counter()
+    for (board_id, hour), count in posts.items():
+        for scope in (board_id, None):
+            counts[scope, Activity.HOUR, hour] += count
+            counts[scope, Activity.DAY, bucket_start(hour, Activity.DAY)] += count
+    if not counts:
+        return 0
+    try:
+        with transaction.atomic(using=router.db_for_write(Activity)):
+            # The same row order in every process, so concurrent flushes cannot deadlock
+            for (board_id, period, bucket), count in sorted(counts.items(), key=str):
+                add(board_id, period, bucket, count)
+    except DatabaseError:
+        with lock:
+            pending.update(posts)
+        raise
+    return len(counts)
+
+
+@atexit.register
+def flush_on_exit():
+    if pending:
+        try:
+            flush()
+        except DatabaseError:
+            pass
+
+
+def add(board_id, period, bucket, count):
+    rows = Activity.objects.filter(board_id=board_id, period=period, bucket=bucket)
+    if rows.update(posts=F('posts') + count):
+        return
+    try:
+        with transaction.atomic(using=router.db_for_write(Activity)):
+            Activity.objects.create(board_id=board_id, period=period, bucket=bucket, posts=count)
+    except IntegrityError:
+        # Another request opened the bucket first
+        rows.update(posts=F('posts') + count)
+
+
+def series(board_id, period, count, end=None):
+    '''
+    [(bucket, posts), ...] for the last `count` buckets up to the one
+    holding `end`, oldest first and with the empty ones filled in
+    '''
+    step = PERIODS[period]
+    last = bucket_start(end or timezone.now(), period)
+    first = last - step * (count - 1)
+    posts = dict(Activity.objects.filter(board_id=board_id, period=period, bucket__range=(first, last))
+                 .values_list('bucket', 'posts'))
+    buckets = [first + step * i for i in range(count)]
+    return [(bucket, posts.get(bucket, 0)) for bucket in buckets]
+
+
+def rebuild(since=None, board_ids=None):
+    '''
+    Recount the rollups from boards_post, from the day holding `since` on.
+    Site-wide rows are only rebuilt along with every board.
+    '''
+    if since is not None:
+        since = bucket_start(since, Activity.DAY)
+    hours = Counter()
+    for database in board_databases():
+        posts = Post.objects.using(database)
+        if since is not None:
+            posts = posts.filter(created_at__gte=since)
+        if board_ids:
+            posts = posts.filter(topic__board_id__in=board_ids)
+        rows = (posts.annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc))
+                .values_list('topic__board_id', 'bucket').annotate(posts=Count('id')).order_by())
+        for board_id, bucket, count in rows:
+            hours[board_id, bucket] += count
+
+    counts = Counter()
+    for (board_id, hour), count in hours.items():
+        for scope in ([board_id] if board_ids else [board_id, None]):
+            counts[scope, Activity.HOUR, hour] += count
+            counts[scope, Activity.DAY, bucket_start(hour, Activity.DAY)] += count
+
+    existing = Activity.objects.all()
+    if since is not None:
+        existing = existing.filter(bucket__gte=since)
+    if board_ids:
+        existing = existing.filter(board_id__in=board_ids)
+    with transaction.atomic(using=router.db_for_write(Activity)):
+        existing.delete()
+        Activity.objects.bulk_create([
+            Activity(board_id=board_id, period=period, bucket=bucket, posts=count)
+            for (board_id, period, bucket), count in counts.items()
+        ], batch_size=500)
+    return sum(hours.values()), len(counts)
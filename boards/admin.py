@@ -1,6 +1,48 @@
 from django.contrib import admin
-from .models import Board
+from . import live
+from .models import Board, Topic
+from .routers import get_topic, shard_for_board
 
 # Register your models here.
 
 admin.site.register(Board)
+
+
+@admin.register(Topic)
+class TopicAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'board', 'starter', 'post_count', 'views', 'last_updated', 'is_live')
+    list_filter = ('is_live', 'board')
+    search_fields = ('subject', )
+    actions = ('start_live_mode', 'stop_live_mode')
+    # Boards and users cannot be joined from a shard
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        '''
+        Topics of boards on a shard are listed once their board is picked in
+        the filter; the unfiltered list shows those in 'default'
+        '''
+        queryset = super().get_queryset(request).prefetch_related('board', 'starter')
+        board_id = request.GET.get('board__id__exact')
+        if board_id and board_id.isdigit():
+            queryset = queryset.using(shard_for_board(int(board_id)))
+        return queryset
+
+    def get_object(self, request, object_id, from_field=None):
+        '''
+        Change forms and actions find a topic in whichever database holds it
+        '''
+        try:
+            return get_topic(int(object_id))
+        except (ValueError, Topic.DoesNotExist):
+            return None
+
+    @admin.action(description='Start live mode')
+    def start_live_mode(self, request, queryset):
+        for topic in queryset:
+            live.set_live(topic, True)
+
+    @admin.action(description='Stop live mode and write counters')
+    def stop_live_mode(self, request, queryset):
+        for topic in queryset:
+            live.set_live(topic, False)
@@ -0,0 +1,140 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+from .models import Topic
+from .routers import board_databases
+
+TOKEN_RE = re.compile(r'[^\w]+')
+
+
+def tokenize(text):
+    '''
+    Lowercase, strip accents and split on anything that is not a word character
+    '''
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return [token for token in TOKEN_RE.split(text) if token]
+
+
+class SubjectIndex:
+    '''
+    Prefix index over normalized Topic.subject tokens.
+
+    `entries` is a sorted list of (token, -last_updated, topic_id) triples,
+    so all tokens that start with a prefix form one contiguous run found with
+    bisect, and each token's topics are newest first. A search merges those
+    runs and reads at most AUTOCOMPLETE_SCAN_LIMIT of the newest matches per
+    token of the query; ordering by views ranks within them. Only the
+    AUTOCOMPLETE_MAX_TOPICS most recently updated topics are kept. New topics
+    are added once their transaction commits; the index is rebuilt from the
+    database every AUTOCOMPLETE_REBUILD_INTERVAL seconds to pick up topics
+    created by other processes, by one thread at a time.
+    '''
+    def __init__(self):
+        self.max_topics = settings.AUTOCOMPLETE_MAX_TOPICS
+        self.rebuild_interval = settings.AUTOCOMPLETE_REBUILD_INTERVAL
+        self.scan_limit = settings.AUTOCOMPLETE_SCAN_LIMIT
+        self.entries = []
+        self.topics = {}
+        self.built_at = None
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def rebuild(self):
+        '''
+        The newest max_topics topics of every database, then the newest
+        max_topics of those
+        '''
+        rows = []
+        for database in board_databases():
+            rows.extend(Topic.objects.using(database).order_by('-last_updated').values_list(
+                'id', 'subject', 'board_id', 'views', 'last_updated')[:self.max_topics])
+        rows = sorted(rows, key=lambda row: row[4], reverse=True)[:self.max_topics]
+        topics, entries = {}, []
+        for topic_id, subject, board_id, views, last_updated in rows:
+            topics[topic_id] = (subject, board_id, views, last_updated.timestamp())
+            entries.extend((token, -topics[topic_id][3], topic_id) for token in set(tokenize(subject)))
+        entries.sort()
+        with self.lock:
+            self.topics, self.entries = topics, entries
+            self.built_at = time.monotonic()
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.rebuild_interval
+
+    def ensure_built(self):
+        '''
+        The first search waits for the one thread loading the index; once it
+        exists, the others keep searching it while one thread rebuilds
+        '''
+        if not self.is_stale():
+            return
+        if not self.build_lock.acquire(blocking=self.built_at is None):
+            return
+        try:
+            if self.is_stale():
+                self.rebuild()
+        finally:
+            self.build_lock.release()
+
+    def add(self, topic):
+        if self.built_at is None:
+            return  # The first search loads it from the database
+        with self.lock:
+            self.topics[topic.id] = (topic.subject, topic.board_id, topic.views, topic.last_updated.timestamp())
+            for token in set(tokenize(topic.subject)):
+                bisect.insort(self.entries, (token, -self.topics[topic.id][3], topic.id))
+            if len(self.topics) > self.max_topics * 1.1:
+                self.evict()
+
+    def evict(self):
+        '''
+        Drop the oldest topics in one pass once the budget is overrun by 10%
+        '''
+        keep = heapq.nlargest(self.max_topics, self.topics, key=lambda topic_id: self.topics[topic_id][3])
+        self.topics = {topic_id: self.topics[topic_id] for topic_id in keep}
+        self.entries = [entry for entry in self.entries if entry[2] in self.topics]
+
+    def newest(self, entries, prefix):
+        '''
+        Ids of the scan_limit newest topics with a token starting with prefix
+        '''
+        runs = []
+        position = bisect.bisect_left(entries, (prefix, ))
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            end = bisect.bisect_left(entries, (entries[position][0] + '\0', ), position)
+            runs.append(entries[i] for i in range(position, end))
+            position = end
+        merged = heapq.merge(*runs, key=lambda entry: entry[1:])
+        return {entry[2] for entry in itertools.islice(merged, self.scan_limit)}
+
+    def search(self, query, limit=10, order='recent', board_id=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        self.ensure_built()
+        with self.lock:
+            entries, topics = self.entries, self.topics
+
+        matches = None
+        for token in sorted(set(tokens), key=len, reverse=True):
+            ids = self.newest(entries, token)
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+
+        if board_id is not None:
+            matches = [topic_id for topic_id in matches if topics[topic_id][1] == board_id]
+        score = 2 if order == 'views' else 3
+        best = heapq.nlargest(limit, matches, key=lambda topic_id: (topics[topic_id][score], topic_id))
+        return [(topic_id, ) + topics[topic_id][:3] for topic_id in best]
+
+
+subject_index = SubjectIndex()
@@ -0,0 +1,18 @@
+'''
+Bulk writes for imports and board moves, which bypass model signals.
+'''
+
+
+def bulk_create_preserving_dates(model, objects, using=None, **kwargs):
+    '''
+    bulk_create() runs pre_save(), which replaces the given auto_now_add
+    dates with now; they are written back with bulk_update()
+    '''
+    fields = [field.attname for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+    dates = [[getattr(obj, field) for field in fields] for obj in objects]
+    model.objects.using(using).bulk_create(objects, batch_size=500, **kwargs)
+    if fields:
+        for obj, values in zip(objects, dates):
+            for field, value in zip(fields, values):
+                setattr(obj, field, value)
+        model.objects.using(using).bulk_update(objects, fields, batch_size=500)
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+
+from .models import Board
+
+MISSING = object()
+
+
+def board_stats_key(board_id):
+    return 'board:{}:stats'.format(board_id)
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = MISSING
+
+
+flights = {}
+flights_lock = threading.Lock()
+
+
+def get_or_compute(key, compute, timeout):
+    '''
+    Read-through for values that are expensive to build, with single-flight
+    misses.
+
+    Threads of one process that miss the same key wait for the first one to
+    compute it. Across processes, the miss that adds KEY:lock to the shared
+    cache computes the value while the others poll for it, for at most
+    CACHE_LOCK_TIMEOUT seconds before giving up and computing it themselves.
+    '''
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    with flights_lock:
+        flight = flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = flights[key] = Flight()
+    if not leader:
+        flight.done.wait()
+        # The leader failed, so this thread tries once on its own
+        return compute() if flight.value is MISSING else flight.value
+
+    try:
+        flight.value = compute_shared(key, compute, timeout)
+        return flight.value
+    finally:
+        with flights_lock:
+            del flights[key]
+        flight.done.set()
+
+
+def compute_shared(key, compute, timeout):
+    lock_key = key + ':lock'
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        time.sleep(settings.CACHE_LOCK_POLL)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        if time.monotonic() >= deadline:
+            return compute()
+    try:
+        value = compute()
+        cache.set(key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def board_stats(board):
+    '''
+    Post and topic counts and the last post of a board, as the home page
+    shows them
+    '''
+    def compute():
+        last_post = board.get_last_post()
+        if last_post is not None:
+            prefetch_related_objects([last_post], 'created_by')
+        return {'posts': board.get_posts_count(), 'topics': board.topics.count(), 'last_post': last_post}
+    return get_or_compute(board_stats_key(board.pk), compute, settings.BOARD_STATS_TIMEOUT)
+
+
+class BoardCache:
+    '''
+    Read-through cache for Board rows.
+
+    A bounded per-process LRU sits in front of the shared cache backend and
+    both are keyed by a version that is bumped on every board save or delete.
+    The saving process drops its LRU at once; other processes notice the new
+    version within BOARD_CACHE_LOCAL_TTL seconds.
+    '''
+    VERSION_KEY = 'boards:version'
+
+    def __init__(self):
+        self.maxsize = settings.BOARD_CACHE_SIZE
+        self.local_ttl = settings.BOARD_CACHE_LOCAL_TTL
+        self.timeout = settings.BOARD_CACHE_TIMEOUT
+        self.fields = [field.attname for field in Board._meta.concrete_fields]
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked_at = 0
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise Board.DoesNotExist
+        row = self.fetch('board:{}'.format(pk), lambda: Board.objects.filter(pk=pk).values_list(*self.fields).first())
+        if row is None:
+            raise Board.DoesNotExist
+        return self.build(row)
+
+    def get_or_404(self, pk):
+        try:
+            return self.get(pk)
+        except Board.DoesNotExist:
+            raise Http404('No Board matches the given query.')
+
+    def all(self):
+        rows = self.fetch('all', lambda: list(Board.objects.order_by('pk').values_list(*self.fields)))
+        return [self.build(row) for row in rows]
+
+    def invalidate(self):
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, int(time.time() * 1000), None)
+        with self.lock:
+            self.local.clear()
+            self.checked_at = 0
+
+    def stats(self):
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.local_hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+    def fetch(self, key, load):
+        version = self.current_version()
+        with self.lock:
+            if key in self.local:
+                self.local.move_to_end(key)
+                self.local_hits += 1
+                return self.local[key]
+
+        shared_key = 'boards:{}:{}'.format(version, key)
+        value = cache.get(shared_key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+            value = load()
+            if value is None:
+                return None
+            cache.set(shared_key, value, self.timeout)
+        else:
+            self.shared_hits += 1
+
+        with self.lock:
+            self.local[key] = value
+            self.local.move_to_end(key)
+            while len(self.local) > self.maxsize:
+                self.local.popitem(last=False)
+        return value
+
+    def current_version(self):
+        now = time.monotonic()
+        if now - self.checked_at >= self.local_ttl:
+            version = cache.get(self.VERSION_KEY)
+            if version is None:
+                cache.add(self.VERSION_KEY, int(time.time() * 1000), None)
+                version = cache.get(self.VERSION_KEY)
+            with self.lock:
+                if version != self.version:
+                    self.local.clear()
+                    self.version = version
+                self.checked_at = now
+        return self.version
+
+    def build(self, row):
+        '''
+        Every caller gets its own instance, so nothing cached is ever mutated
+        '''
+        return Board.from_db('default', self.fields, row)
+
+
+board_cache = BoardCache()
@@ -0,0 +1,25 @@
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .cache import board_cache, board_stats_key
+from .models import Post, Topic
+from .paginator import invalidate_pages, topic_count_key, topic_page_key
+
+
+def rebuild_post_counts(topics=None):
+    '''
+    Recount Topic.post_count in one UPDATE, for writes that bypass signals
+    '''
+    if topics is None:
+        topics = Topic.objects.all()
+    counts = Post.objects.filter(topic=OuterRef('pk')).values('topic').annotate(count=Count('*')).values('count')
+    return topics.update(post_count=Coalesce(Subquery(counts), 0))
+
+
+def reset_board_caches(board_ids):
+    board_cache.invalidate()
+    cache.delete_many([key for board_id in board_ids for key in (topic_count_key(board_id), board_stats_key(board_id))])
+    for board_id in board_ids:
+        for sort in Topic.ORDERINGS:
+            invalidate_pages(topic_page_key(board_id, sort))
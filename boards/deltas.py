@@ -0,0 +1,36 @@
+'''
+Compact text deltas for post edit history.
+
+A delta is a zlib-compressed JSON list of operations that rebuilds a target
+text from a source text: [start, end] copies source[start:end] and a string
+inserts itself. Its size follows the size of the edit, not of the post.
+'''
+import json
+import zlib
+from difflib import SequenceMatcher
+
+
+def make_delta(source, target):
+    ops = []
+    matcher = SequenceMatcher(None, source, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif tag in ('replace', 'insert'):
+            ops.append(target[j1:j2])
+    return zlib.compress(json.dumps(ops, separators=(',', ':')).encode('utf-8'))
+
+
+def apply_delta(source, delta):
+    parts = []
+    for op in json.loads(zlib.decompress(delta).decode('utf-8')):
+        parts.append(source[op[0]:op[1]] if isinstance(op, list) else op)
+    return ''.join(parts)
+
+
+def make_snapshot(text):
+    return zlib.compress(text.encode('utf-8'))
+
+
+def read_snapshot(snapshot):
+    return zlib.decompress(snapshot).decode('utf-8')
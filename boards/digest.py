@@ -0,0 +1,133 @@
+'''
+Daily digest emails.
+
+Users opt in per board with a Subscription. `manage.py send_digests` first
+summarizes the day once per board: its new topics, its busiest threads and
+its reply count, a few grouped queries per shard however many users there
+are. It then walks the subscribers of the boards that had activity in user
+id order, DIGEST_CHUNK_SIZE users at a time (three queries per chunk), and
+sends the messages over one backend connection that stays open for the whole
+run. Each user's DigestSent row is claimed in the same transaction as their
+message is sent, so a rerun for the same day (after a crash or a cron retry)
+only mails the users it has not reached yet, even when a chunk failed
+partway.
+'''
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .cache import board_cache
+from .models import DigestSent, Post, Subscription, Topic
+from .routers import board_databases
+
+
+class BoardSummary:
+    def __init__(self, board):
+        self.board = board
+        self.replies = 0
+        self.new_topics = []
+        self.busiest = []
+
+
+def topic_url(board_id, topic_id):
+    return settings.SITE_URL + reverse('topic_posts', kwargs={'pk': board_id, 'topic_pk': topic_id})
+
+
+def summarize(start, end):
+    '''
+    {board id: BoardSummary} for the boards with posts in [start, end)
+    '''
+    boards = {board.pk: board for board in board_cache.all()}
+    summaries = {}
+    for database in board_databases():
+        posts = dict(Post.objects.using(database).filter(created_at__gte=start, created_at__lt=end)
+                     .values_list('topic').annotate(Count('id')).order_by())
+        if not posts:
+            continue
+        started = dict(Post.objects.using(database).filter(topic__in=list(posts))
+                       .values_list('topic').annotate(Min('created_at')).order_by())
+        topics = Topic.objects.using(database).filter(id__in=list(posts)).values_list('id', 'board_id', 'subject')
+        for topic_id, board_id, subject in topics:
+            if board_id not in boards:
+                continue
+            summary = summaries.setdefault(board_id, BoardSummary(boards[board_id]))
+            entry = {'subject': subject, 'url': topic_url(board_id, topic_id), 'posts': posts[topic_id]}
+            if started[topic_id] >= start:
+                summary.new_topics.append(entry)
+                summary.replies += posts[topic_id] - 1
+            else:
+                summary.busiest.append(entry)
+                summary.replies += posts[topic_id]
+
+    limit = settings.DIGEST_TOPICS_PER_BOARD
+    for summary in summaries.values():
+        summary.new_topics = sorted(summary.new_topics, key=lambda entry: -entry['posts'])[:limit]
+        summary.busiest = sorted(summary.busiest, key=lambda entry: -entry['posts'])[:limit]
+    return summaries
+
+
+def subscriber_chunks(board_ids, chunk_size, day=None):
+    '''
+    Yields [(user, [board id, ...]), ...] per chunk of subscribers, keyset
+    paginated over user ids, leaving out the users already sent the digest
+    of `day`
+    '''
+    subscriptions = Subscription.objects.filter(board_id__in=board_ids)
+    last_id = 0
+    while True:
+        user_ids = list(subscriptions.filter(user_id__gt=last_id).order_by('user_id')
+                        .values_list('user_id', flat=True).distinct()[:chunk_size])
+        if not user_ids:
+            return
+        last_id = user_ids[-1]
+        boards = {}
+        for user_id, board_id in subscriptions.filter(user_id__in=user_ids).values_list('user_id', 'board_id'):
+            boards.setdefault(user_id, []).append(board_id)
+        users = User.objects.filter(id__in=user_ids, is_active=True).exclude(email='').only('id', 'username', 'email')
+        if day is not None:
+            users = users.exclude(digests_sent__day=day)
+        yield [(user, sorted(boards[user.pk])) for user in users.order_by('id')]
+
+
+def build_message(user, summaries, day):
+    context = {'user': user, 'summaries': summaries, 'day': day, 'site_url': settings.SITE_URL}
+    subject = render_to_string('digest_subject.txt', context).strip()
+    body = render_to_string('digest_email.txt', context)
+    return EmailMessage(subject, body, settings.DIGEST_FROM_EMAIL, [user.email])
+
+
+def send(start, end, chunk_size=None, progress=None):
+    '''
+    Sends the digests for [start, end) to the users that have not had this
+    day's digest yet and returns (users, messages)
+    '''
+    summaries = summarize(start, end)
+    users = messages = 0
+    if not summaries:
+        return users, messages
+    connection = get_connection()
+    connection.open()
+    try:
+        for chunk in subscriber_chunks(list(summaries), chunk_size or settings.DIGEST_CHUNK_SIZE, day=start.date()):
+            if not chunk:
+                continue
+            for user, board_ids in chunk:
+                message = build_message(user, [summaries[board_id] for board_id in board_ids], start)
+                try:
+                    # A failed send rolls the claim back, so the rerun mails this user
+                    with transaction.atomic():
+                        DigestSent.objects.create(user=user, day=start.date())
+                        messages += connection.send_messages([message]) or 0
+                except IntegrityError:
+                    # Another run got to this user first
+                    continue
+                users += 1
+            if progress is not None:
+                progress(users, messages)
+    finally:
+        connection.close()
+    return users, messages
@@ -0,0 +1,83 @@
+'''
+Stream posts as JSONL or CSV with constant memory.
+
+Rows come from a chunked server-side iterator over values_list(), so no model
+instances are built and only one chunk is held at a time. Output is emitted
+in blocks of EXPORT_CHUNK_SIZE rows. A site export reads every board database
+in turn.
+'''
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .models import Post
+from .routers import board_databases
+
+COLUMNS = ('id', 'topic_id', 'topic__subject', 'topic__board_id', 'created_by_id',
+           'created_at', 'updated_at', 'message')
+HEADER = ('id', 'topic_id', 'topic_subject', 'board_id', 'created_by', 'created_at', 'updated_at', 'message')
+FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def posts_for(board=None, topic=None):
+    '''
+    The querysets to export, one per database
+    '''
+    if topic is not None:
+        querysets = [topic.posts.all()]
+    elif board is not None:
+        querysets = [board.get_posts()]
+    else:
+        querysets = [Post.objects.using(database).all() for database in board_databases()]
+    return [queryset.order_by('id') for queryset in querysets]
+
+
+def iter_rows(queryset):
+    '''
+    Usernames are looked up once per chunk, since posts may live on a board
+    shard and users never do
+    '''
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    rows = queryset.values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        usernames = dict(User.objects.filter(id__in={row[4] for row in chunk}).values_list('id', 'username'))
+        for row in chunk:
+            row = row[:4] + (usernames.get(row[4]), ) + row[5:]
+            yield [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+
+
+class Echo:
+    '''
+    File-like object that hands csv.writer's output straight back
+    '''
+    def write(self, value):
+        return value
+
+
+def stream(querysets, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(HEADER)
+        encode = writer.writerow
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(HEADER, row)), ensure_ascii=False) + '\n'
+
+    block = []
+    for queryset in querysets:
+        for row in iter_rows(queryset):
+            block.append(encode(row))
+            if len(block) >= settings.EXPORT_CHUNK_SIZE:
+                yield ''.join(block)
+                block = []
+    if block:
+        yield ''.join(block)
@@ -0,0 +1,161 @@
+'''
+Atom feeds and topic sitemaps built from Topic.last_updated.
+
+Every request reads the id, last_updated and counts of the FEED_SIZE newest
+topics, one range of the last_updated index. Feeds are rebuilt only when one
+of those changes and are kept in the cache under a hash of them, so a feed
+reader polling an idle board costs that one query and If-Modified-Since
+answers come from its newest last_updated. The site feed takes the newest
+topics of every board database.
+
+Sitemap shards cut the topics of each database into SITEMAP_SHARD_SIZE runs
+by position rather than by id, since ids come from widely spaced per-shard
+ranges and moved boards keep theirs. The first id of every run is cached for
+SITEMAP_CACHE_TIMEOUT seconds and the last run of each database is open
+ended, so new topics still show up. Shards are streamed row by row.
+'''
+import hashlib
+import itertools
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Topic
+from .routers import board_databases, shard_for_board
+
+SITEMAP_CHUNKS_KEY = 'sitemap:chunks'
+
+
+def topic_querysets(board=None):
+    '''
+    A board's topics, or those of the whole site, one queryset per database
+    '''
+    if board is None:
+        return [Topic.objects.using(database).all() for database in board_databases()]
+    return [board.topics.all()]
+
+
+def newest_topics(board=None):
+    '''
+    (id, board id, last_updated, views, post_count) of the topics in the
+    feed, newest first
+    '''
+    rows = []
+    for topics in topic_querysets(board):
+        rows.extend(topics.order_by('-last_updated', '-id').values_list(
+            'id', 'board_id', 'last_updated', 'views', 'post_count')[:settings.FEED_SIZE])
+    rows.sort(key=lambda row: (row[2], row[0]), reverse=True)
+    return rows[:settings.FEED_SIZE]
+
+
+def get_last_modified(topics):
+    return topics[0][2] if topics else None
+
+
+def get_feed(request, board=None, topics=None):
+    '''
+    Entries show view and reply counts, so those are part of the key too
+    '''
+    if topics is None:
+        topics = newest_topics(board)
+    version = hashlib.sha1(repr(topics).encode()).hexdigest()
+    key = 'feed:{}:{}'.format(board.pk if board else 'site', version)
+    content = cache.get(key)
+    if content is None:
+        content = build_feed(request, board, topics)
+        cache.set(key, content, settings.FEED_CACHE_TIMEOUT)
+    return content
+
+
+def build_feed(request, board, rows):
+    if board is None:
+        title, link = 'NBA Boards', reverse('home')
+        description = 'Latest topics on all boards'
+    else:
+        title, link = 'NBA Boards - {}'.format(board.name), reverse('board_topics', kwargs={'pk': board.pk})
+        description = board.description
+    feed = Atom1Feed(
+        title=title,
+        link=request.build_absolute_uri(link),
+        description=description,
+        feed_url=request.build_absolute_uri()
+    )
+    ids = {}
+    for topic_id, board_id, *_ in rows:
+        ids.setdefault(shard_for_board(board_id), []).append(topic_id)
+    topics = {}
+    for database, topic_ids in ids.items():
+        topics.update((topic.pk, topic) for topic in
+                      Topic.objects.using(database).filter(id__in=topic_ids).prefetch_related('starter'))
+    for topic in (topics[row[0]] for row in rows if row[0] in topics):
+        url = request.build_absolute_uri(reverse('topic_posts', kwargs={'pk': topic.board_id, 'topic_pk': topic.pk}))
+        feed.add_item(
+            title=topic.subject,
+            link=url,
+            description='{} replies, {} views'.format(topic.replies, topic.views),
+            unique_id=url,
+            author_name=topic.starter.username,
+            updateddate=topic.last_updated
+        )
+    return feed.writeString('utf-8')
+
+
+def sitemap_chunks():
+    '''
+    [(database, first id, first id of the next shard or None), ...]
+    '''
+    chunks = cache.get(SITEMAP_CHUNKS_KEY)
+    if chunks is None:
+        chunks = []
+        for database in board_databases():
+            ids = Topic.objects.using(database).order_by('id').values_list('id', flat=True)
+            firsts = []
+            for offset in itertools.count(0, settings.SITEMAP_SHARD_SIZE):
+                first = ids[offset:offset + 1].first()
+                if first is None:
+                    break
+                firsts.append(first)
+            chunks.extend(zip([database] * len(firsts), firsts, firsts[1:] + [None]))
+        cache.set(SITEMAP_CHUNKS_KEY, chunks, settings.SITEMAP_CACHE_TIMEOUT)
+    return chunks
+
+
+def get_shard_count():
+    return len(sitemap_chunks())
+
+
+def shard_topics(shard):
+    chunks = sitemap_chunks()
+    if shard >= len(chunks):
+        return Topic.objects.none()
+    database, first_id, next_id = chunks[shard]
+    topics = Topic.objects.using(database).filter(id__gte=first_id)
+    return topics if next_id is None else topics.filter(id__lt=next_id)
+
+
+def build_sitemap_index(request):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for shard in range(get_shard_count()):
+        url = request.build_absolute_uri(reverse('sitemap_topics', kwargs={'shard': shard}))
+        lines.append('<sitemap><loc>{}</loc></sitemap>\n'.format(escape(url)))
+    lines.append('</sitemapindex>\n')
+    return ''.join(lines)
+
+
+def stream_sitemap_shard(request, shard):
+    '''
+    Only one chunk of rows is ever held in memory
+    '''
+    base_url = request.build_absolute_uri('/')[:-1]
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    rows = shard_topics(shard).order_by('id').values_list('id', 'board_id', 'last_updated')
+    for topic_id, board_id, last_updated in rows.iterator(chunk_size=2000):
+        url = reverse('topic_posts', kwargs={'pk': board_id, 'topic_pk': topic_id})
+        yield '<url><loc>{}{}</loc><lastmod>{}</lastmod></url>\n'.format(
+            escape(base_url), url, last_updated.isoformat())
+    yield '</urlset>\n'
@@ -0,0 +1,218 @@
+'''
+Live game-thread mode.
+
+While a topic is live, replies and views do not write the topic row. Running
+totals for post_count and views plus the newest last_updated are kept in the
+shared cache, next to the changes not yet written. At most one request per
+LIVE_FLUSH_INTERVAL adds those pending changes to the row in a single UPDATE
+(`manage.py flush_live_topics` flushes what is left when a burst ends). A
+total evicted from the cache is rebuilt from the row plus the pending
+changes, which live under their own keys.
+
+The newest posts are kept in a per-process ring buffer, topped up with one
+indexed range query, so the last pages of the thread (TailPaginator) and the
+reply form render without sorting the whole thread.
+
+Live mode wants a cache shared by all workers (memcached, redis). With the
+per-process locmem cache every worker shows its own totals, but the row still
+ends up right since each worker only adds its own pending changes.
+'''
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Topic
+from .paginator import CountedPaginator
+
+COUNTERS = ('post_count', 'views')
+PENDING = tuple('pending_' + name for name in COUNTERS)
+
+_tails = {}
+_tails_lock = threading.Lock()
+
+
+def key(topic_id, name):
+    return 'live:{}:{}'.format(topic_id, name)
+
+
+def set_live(topic, is_live):
+    '''
+    Writes go to the topic's own database, which may be a board shard
+    '''
+    topics = Topic.objects.using(topic._state.db)
+    if is_live:
+        topics.filter(pk=topic.pk).update(is_live=True)
+        topic.refresh_from_db()
+        start(topic)
+    else:
+        stop(topic)
+        topics.filter(pk=topic.pk).update(is_live=False)
+        topic.refresh_from_db()
+
+
+def start(topic):
+    '''
+    Seed the cached totals from the database row
+    '''
+    cache.set_many({key(topic.id, name): getattr(topic, name) for name in COUNTERS}, None)
+    cache.delete_many([key(topic.id, name) for name in PENDING + ('last_updated', 'flush_lock')])
+
+
+def stop(topic):
+    flush(topic.id, using=topic._state.db)
+    cache.delete_many([key(topic.id, name) for name in COUNTERS + PENDING + ('last_updated', 'flush_lock', 'flushed_at', 'dirty_since')])
+    forget_tail(topic.id)
+
+
+def record_reply(topic, post):
+    topic.post_count = increment(topic, 'post_count', 1)
+    topic.last_updated = post.created_at
+    cache.set(key(topic.id, 'last_updated'), post.created_at, None)
+    tail = _tails.get(topic.id)
+    if tail is not None and (not tail.posts or tail.posts[-1].id < post.id):
+        tail.posts.append(post)
+    maybe_flush(topic.id)
+
+
+def record_delete(topic, post):
+    topic.post_count = increment(topic, 'post_count', -1)
+    forget_tail(topic.id)
+    maybe_flush(topic.id)
+
+
+def record_view(topic):
+    topic.views = increment(topic, 'views', 1)
+    maybe_flush(topic.id)
+
+
+def increment(topic, name, delta):
+    cache.add(key(topic.id, 'dirty_since'), time.time(), None)
+    pending = key(topic.id, 'pending_' + name)
+    cache.add(pending, 0, None)
+    try:
+        pending_total = cache.incr(pending, delta)
+    except ValueError:
+        pending_total = delta
+        cache.set(pending, delta, None)
+    counter = key(topic.id, name)
+    try:
+        return cache.incr(counter, delta)
+    except ValueError:
+        # Not seeded or evicted: the row plus every change not written to it yet
+        value = getattr(topic, name) + pending_total
+        if cache.add(counter, value, None):
+            return value
+        return cache.incr(counter, delta)
+
+
+def get_post_count(topic):
+    return cache.get(key(topic.id, 'post_count'), topic.post_count)
+
+
+def maybe_flush(topic_id):
+    '''
+    Only the first caller in every LIVE_FLUSH_INTERVAL gets the lock, which
+    keeps topic row writes constant no matter how fast replies arrive
+    '''
+    if cache.add(key(topic_id, 'flush_lock'), True, settings.LIVE_FLUSH_INTERVAL):
+        flush(topic_id)
+
+
+def flush(topic_id, using=None):
+    '''
+    Adds the pending changes to the row rather than writing the cached
+    totals, so a worker with stale totals cannot overwrite newer ones.
+    Returns the changes written.
+    '''
+    changes = {}
+    for name in COUNTERS:
+        pending = key(topic_id, 'pending_' + name)
+        delta = cache.get(pending)
+        if delta:
+            try:
+                cache.decr(pending, delta)
+            except ValueError:
+                pass  # Evicted; its changes are written now
+            changes[name] = delta
+    last_updated = cache.get(key(topic_id, 'last_updated'))
+    if last_updated is not None:
+        changes['last_updated'] = last_updated
+    cache.delete(key(topic_id, 'dirty_since'))
+    if changes:
+        updates = {name: F(name) + changes[name] for name in COUNTERS if name in changes}
+        if last_updated is not None:
+            updates['last_updated'] = Greatest('last_updated', last_updated)
+        Topic.objects.using(using).filter(pk=topic_id).update(**updates)
+    cache.set(key(topic_id, 'flushed_at'), time.time(), None)
+    return changes
+
+
+def get_flush_lag(topic_id):
+    '''
+    Seconds the oldest unwritten change of a topic has been waiting
+    '''
+    dirty_since = cache.get(key(topic_id, 'dirty_since'))
+    return time.time() - dirty_since if dirty_since is not None else 0.0
+
+
+def tail_posts(topic):
+    '''
+    The newest LIVE_TAIL_SIZE posts, oldest first
+    '''
+    now = time.monotonic()
+    tail = _tails.get(topic.id)
+    posts = topic.posts.prefetch_related('created_by__avatar')
+    if tail is None or now - tail.loaded_at > settings.LIVE_TAIL_TTL:
+        tail = Tail(settings.LIVE_TAIL_SIZE, now)
+        tail.posts.extend(reversed(posts.order_by('-id')[:settings.LIVE_TAIL_SIZE]))
+        with _tails_lock:
+            _tails[topic.id] = tail
+    elif now - tail.checked_at > settings.LIVE_TAIL_REFRESH:
+        last_id = tail.posts[-1].id if tail.posts else 0
+        tail.posts.extend(posts.filter(id__gt=last_id).order_by('id')[:settings.LIVE_TAIL_SIZE])
+        tail.checked_at = now
+    return list(tail.posts)
+
+
+def recent_posts(topic, count=10):
+    '''
+    Newest posts first, like Topic.get_last_ten_posts()
+    '''
+    return list(reversed(tail_posts(topic)))[:count]
+
+
+def forget_tail(topic_id):
+    '''
+    Edited or deleted posts are reloaded from the database on the next read
+    '''
+    with _tails_lock:
+        _tails.pop(topic_id, None)
+
+
+class TailPaginator(CountedPaginator):
+    '''
+    Pages of a live thread that lie within the tail buffer are cut from it,
+    going by the live post count; older pages come from the database
+    '''
+    def __init__(self, object_list, per_page, topic=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.topic = topic
+
+    def fetch(self, number, bottom, top):
+        posts = tail_posts(self.topic)
+        first = self.count - len(posts)
+        if posts and 0 <= first <= bottom:
+            return posts[bottom - first:top - first]
+        return super().fetch(number, bottom, top)
+
+
+class Tail:
+    def __init__(self, size, now):
+        self.posts = deque(maxlen=size)
+        self.loaded_at = now
+        self.checked_at = now
@@ -0,0 +1,60 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from boards.models import Board, Post, Topic
+
+
+class Command(BaseCommand):
+    help = 'Measure the time per logged-out page view with and without the anonymous fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per page and round')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Alternating rounds per setting; the fastest round is reported')
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:<14} {:>12} {:>12} {:>12}'.format('page', 'full ms', 'fast ms', 'saved us'))
+        with transaction.atomic():
+            pages = self.seed()
+            clients = {}
+            for fast in (False, True):
+                # The middleware reads the setting once, when the client's handler loads it
+                with override_settings(ANONYMOUS_FAST_PATH=fast, ALLOWED_HOSTS=['*']):
+                    clients[fast] = Client()
+                    for name, url in pages:
+                        clients[fast].get(url)
+            for name, url in pages:
+                best = {False: float('inf'), True: float('inf')}
+                for i in range(options['rounds']):
+                    for fast in (False, True):
+                        with override_settings(ALLOWED_HOSTS=['*']):
+                            best[fast] = min(best[fast], self.measure(clients[fast], url, options['requests']))
+                self.stdout.write('{:<14} {:>12.3f} {:>12.3f} {:>12.1f}'.format(
+                    name, best[False] * 1000, best[True] * 1000, (best[False] - best[True]) * 1000000))
+            transaction.set_rollback(True)
+
+    def seed(self):
+        '''
+        Rolled back after the run, so the benchmark never leaves data behind
+        '''
+        user = User.objects.create_user(username='bench_anonymous', password='bench')
+        board = Board.objects.create(name='bench_anonymous', description='Benchmark board')
+        for i in range(10):
+            topic = Topic.objects.create(subject='Benchmark topic {}'.format(i), board=board, starter=user)
+            Post.objects.create(message='Benchmark post', topic=topic, created_by=user)
+        return [
+            ('home', reverse('home')),
+            ('board_topics', reverse('board_topics', kwargs={'pk': board.pk})),
+            ('topic_posts', reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk})),
+        ]
+
+    def measure(self, client, url, requests):
+        started = time.perf_counter()
+        for i in range(requests):
+            client.get(url)
+        return (time.perf_counter() - started) / requests
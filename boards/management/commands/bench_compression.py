@@ -0,0 +1,76 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from boards import compression
+from boards.models import Board, Post, Topic
+
+MINIFYING_LOADER = 'boards.template_loaders.Loader'
+PLAIN_LOADER = 'django.template.loaders.filesystem.Loader'
+
+
+def templates(minify):
+    '''
+    TEMPLATES with the cached loader, minifying or not
+    '''
+    loaders = [MINIFYING_LOADER if minify else PLAIN_LOADER, 'django.template.loaders.app_directories.Loader']
+    variant = copy.deepcopy(settings.TEMPLATES)
+    variant[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', loaders)]
+    return variant
+
+
+class Command(BaseCommand):
+    help = 'Measure bytes on the wire and CPU time per page for each template and compression setting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per page and setting')
+        parser.add_argument('--topics', type=int, default=30)
+        parser.add_argument('--posts', type=int, default=30, help='Posts in the measured topic')
+
+    def handle(self, *args, **options):
+        encodings = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+        self.stdout.write('{:<14} {:<8} {:<9} {:>10} {:>12}'.format('page', 'minify', 'encoding', 'bytes', 'cpu ms/page'))
+        with transaction.atomic():
+            pages = self.seed(options['topics'], options['posts'])
+            for minify in (False, True):
+                with override_settings(TEMPLATES=templates(minify), ALLOWED_HOSTS=['*']):
+                    client = Client()
+                    for name, url in pages:
+                        for encoding in encodings:
+                            size, cpu = self.measure(client, url, encoding, options['requests'])
+                            self.stdout.write('{:<14} {:<8} {:<9} {:>10} {:>12.3f}'.format(
+                                name, 'yes' if minify else 'no', encoding, size, cpu * 1000))
+            transaction.set_rollback(True)
+
+    def seed(self, topics, posts):
+        '''
+        Rolled back after the run, so the benchmark never leaves data behind
+        '''
+        user = User.objects.create_user(username='bench_compression', password='bench')
+        board = Board.objects.create(name='bench_compression', description='Benchmark board')
+        for i in range(topics):
+            topic = Topic.objects.create(subject='Benchmark topic {}'.format(i), board=board, starter=user)
+            Post.objects.create(message='Opening post of topic {}'.format(i), topic=topic, created_by=user)
+        for i in range(posts - 1):
+            Post.objects.create(message='Reply **{}** with some *markdown* in it.'.format(i), topic=topic, created_by=user)
+        return [
+            ('home', reverse('home')),
+            ('board_topics', reverse('board_topics', kwargs={'pk': board.pk})),
+            ('topic_posts', reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk})),
+        ]
+
+    def measure(self, client, url, encoding, requests):
+        client.get(url, HTTP_ACCEPT_ENCODING=encoding)  # Compile and cache the templates first
+        size = 0
+        started = time.process_time()
+        for i in range(requests):
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            size = len(content)
+        return size, (time.process_time() - started) / requests
@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from boards.models import Board, Post, Topic
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = 'Count database writes per page views for every session mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=1000)
+        parser.add_argument('--topics', type=int, default=50)
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:<8} {:>15} {:>15} {:>10}'.format(
+            'mode', 'session writes', 'total writes', 'ms/view'))
+        for mode, engine in settings.SESSION_ENGINES.items():
+            with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['*']):
+                session_writes, total_writes, elapsed = self.run(options['views'], options['topics'])
+            self.stdout.write('{:<8} {:>15} {:>15} {:>10.2f}'.format(
+                mode, session_writes, total_writes, elapsed * 1000 / options['views']))
+
+    def run(self, views, topics):
+        '''
+        Browse as a logged-in user inside a transaction that is rolled back,
+        so the benchmark never leaves data behind
+        '''
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_sessions', password='bench')
+            board = Board.objects.create(name='bench_sessions', description='Benchmark board')
+            urls = []
+            for i in range(topics):
+                topic = Topic.objects.create(subject='Topic {}'.format(i), board=board, starter=user)
+                Post.objects.create(message='Benchmark post', topic=topic, created_by=user)
+                urls.append(reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk}))
+
+            client = Client()
+            client.force_login(user)
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as context:
+                for i in range(views):
+                    client.get(urls[i % len(urls)])
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        writes = [query['sql'] for query in context.captured_queries
+                  if query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS)]
+        session_writes = [sql for sql in writes if 'django_session' in sql]
+        return len(session_writes), len(writes), elapsed
@@ -0,0 +1,129 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from boards.sqlite import pragmas
+
+SCHEMA = (
+    'CREATE TABLE topic (id INTEGER PRIMARY KEY, views INTEGER, post_count INTEGER, last_updated REAL)',
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, topic_id INTEGER, message TEXT, created_at REAL)',
+    'CREATE INDEX post_topic ON post (topic_id, id)',
+)
+READ = 'SELECT id, message, created_at FROM post WHERE topic_id = ? ORDER BY id LIMIT 10'
+WRITES = (
+    'INSERT INTO post (topic_id, message, created_at) VALUES (?, ?, ?)',
+    'UPDATE topic SET post_count = post_count + 1, last_updated = ? WHERE id = ?',
+)
+
+
+class Mode:
+    def __init__(self, name, statements, persistent, begin):
+        self.name = name
+        self.statements = statements
+        self.persistent = persistent
+        self.begin = begin
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent read/write throughput of the default and the tuned SQLite setup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--topics', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=50, help='Posts per topic to start with')
+
+    def handle(self, *args, **options):
+        modes = [
+            # Django's defaults: rollback journal, a new connection per request
+            Mode('rollback', ['PRAGMA journal_mode = delete', 'PRAGMA synchronous = full'], False, 'BEGIN'),
+            # The SQLITE_* settings with persistent connections
+            Mode('tuned', pragmas(), True, 'BEGIN IMMEDIATE'),
+        ]
+        self.stdout.write('{:<10} {:>10} {:>10} {:>12} {:>8}'.format(
+            'mode', 'reads/s', 'writes/s', 'p99 read ms', 'errors'))
+        for mode in modes:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, mode, options['topics'], options['posts'])
+                result = self.run(path, mode, options)
+            self.stdout.write('{:<10} {:>10.0f} {:>10.0f} {:>12.2f} {:>8}'.format(
+                mode.name, result['reads'] / options['seconds'], result['writes'] / options['seconds'],
+                result['p99'] * 1000, result['errors']))
+
+    def connect(self, path, mode):
+        connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        for statement in mode.statements:
+            connection.execute(statement)
+        return connection
+
+    def seed(self, path, mode, topics, posts):
+        connection = self.connect(path, mode)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        now = time.time()
+        connection.execute('BEGIN')
+        connection.executemany('INSERT INTO topic VALUES (?, 0, ?, ?)', [(i, posts, now) for i in range(1, topics + 1)])
+        connection.executemany('INSERT INTO post (topic_id, message, created_at) VALUES (?, ?, ?)', [
+            (i, 'Seed post ' * 20, now) for i in range(1, topics + 1) for _ in range(posts)])
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run(self, path, mode, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+        topics = options['topics']
+
+        def worker(write):
+            connection = self.connect(path, mode) if mode.persistent else None
+            reads = writes = errors = 0
+            latencies = []
+            while not stop.is_set():
+                current = connection or self.connect(path, mode)
+                topic_id = random.randint(1, topics)
+                started = time.perf_counter()
+                try:
+                    if write:
+                        current.execute(mode.begin)
+                        current.execute(WRITES[0], (topic_id, 'Benchmark reply ' * 20, time.time()))
+                        current.execute(WRITES[1], (time.time(), topic_id))
+                        current.execute('COMMIT')
+                        writes += 1
+                    else:
+                        current.execute(READ, (topic_id, )).fetchall()
+                        latencies.append(time.perf_counter() - started)
+                        reads += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if current.in_transaction:
+                        current.execute('ROLLBACK')
+                finally:
+                    if current is not connection:
+                        current.close()
+            if connection is not None:
+                connection.close()
+            with lock:
+                result['reads'] += reads
+                result['writes'] += writes
+                result['errors'] += errors
+                result['latencies'].extend(latencies)
+
+        threads = [threading.Thread(target=worker, args=(False, )) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=(True, )) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(result['latencies'])
+        result['p99'] = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+        return result
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.export import FORMATS, posts_for, stream
+from boards.models import Board, Topic
+from boards.routers import get_topic
+
+
+class Command(BaseCommand):
+    help = 'Stream the posts of a topic, a board or the whole site as JSONL or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int)
+        parser.add_argument('--topic', type=int)
+        parser.add_argument('--format', default='jsonl', choices=sorted(FORMATS))
+        parser.add_argument('--output', help='File to write, defaults to stdout')
+
+    def handle(self, *args, **options):
+        try:
+            topic = get_topic(options['topic']) if options['topic'] else None
+            board = Board.objects.get(pk=options['board']) if options['board'] else None
+        except (Topic.DoesNotExist, Board.DoesNotExist) as e:
+            raise CommandError(e)
+
+        started = time.monotonic()
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else self.stdout
+        try:
+            written = 0
+            for block in stream(posts_for(board, topic), options['format']):
+                output.write(block)
+                written += len(block)
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write('Exported {} characters in {:.1f}s'.format(written, time.monotonic() - started))
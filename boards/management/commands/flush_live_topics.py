@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from boards import live
+from boards.models import Topic
+from boards.routers import board_databases
+
+
+class Command(BaseCommand):
+    help = 'Write the coalesced counters of live topics back to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=float, default=0,
+                            help='Keep flushing every LOOP seconds instead of exiting')
+
+    def handle(self, *args, **options):
+        while True:
+            for database in board_databases():
+                for topic_id in Topic.objects.using(database).filter(is_live=True).values_list('id', flat=True):
+                    updates = live.flush(topic_id, using=database)
+                    if updates and options['verbosity'] > 1:
+                        self.stdout.write('Topic {}: {}'.format(topic_id, updates))
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
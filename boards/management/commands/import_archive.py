@@ -0,0 +1,161 @@
+import json
+import sys
+import time
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.avatars import create_avatar
+from boards import activity
+from boards.bulk import bulk_create_preserving_dates
+from boards.counters import rebuild_post_counts, reset_board_caches
+from boards.models import Board, Post, Topic
+from boards.rendering import render_markdown
+
+# Parents are always written before children within a batch
+ORDER = ('board', 'user', 'topic', 'post')
+MODELS = {'board': Board, 'user': User, 'topic': Topic, 'post': Post}
+
+
+class Command(BaseCommand):
+    help = '''Bulk import archived boards, users, topics and posts from JSONL.
+
+    One JSON object per line, with a "type" of board, user, topic or post and
+    the original "id". References use original ids:
+      {"type": "board", "id": 1, "name": "...", "description": "..."}
+      {"type": "user", "id": 7, "username": "...", "email": "...", "password": "<hash>", "date_joined": "..."}
+      {"type": "topic", "id": 3, "board": 1, "starter": 7, "subject": "...", "last_updated": "...", "views": 0}
+      {"type": "post", "id": 9, "topic": 3, "created_by": 7, "message": "...", "created_at": "...",
+       "updated_at": null, "updated_by": null}
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file, or - for stdin')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-render', action='store_true',
+                            help='Leave message_html empty and backfill with render_posts --missing-only')
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help='Skip rows whose id already exists, to re-run an interrupted import')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batches = {kind: [] for kind in ORDER}
+        self.counts = Counter()
+        self.board_ids = set()
+        self.first_post_at = None
+        self.started = time.monotonic()
+
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            for line_number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    kind = record.pop('type')
+                    self.batches[kind].append(getattr(self, 'build_' + kind)(record))
+                except (ValueError, KeyError, TypeError) as e:
+                    raise CommandError('Line {}: {!r}'.format(line_number, e))
+                if len(self.batches[kind]) >= options['batch_size']:
+                    self.flush()
+            self.flush()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.finish()
+
+    def flush(self):
+        with transaction.atomic():
+            for kind in ORDER:
+                objects = self.batches[kind]
+                if objects:
+                    bulk_create_preserving_dates(MODELS[kind], objects,
+                                                 ignore_conflicts=self.options['ignore_conflicts'])
+                    self.counts[kind] += len(objects)
+                    self.batches[kind] = []
+        elapsed = time.monotonic() - self.started
+        self.stdout.write('{} ({:.0f} rows/s)'.format(
+            ', '.join('{} {}s'.format(self.counts[kind], kind) for kind in ORDER),
+            sum(self.counts.values()) / elapsed if elapsed else 0))
+
+    def finish(self):
+        '''
+        Move id sequences past the imported ids and rebuild what signals
+        would have maintained: post counts, caches, activity rollups from the
+        first imported post on, and avatars
+        '''
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(MODELS.values())):
+                cursor.execute(sql)
+        started = time.monotonic()
+        rebuild_post_counts()
+        reset_board_caches(self.board_ids or Board.objects.values_list('id', flat=True))
+        if self.first_post_at is not None:
+            activity.rebuild(since=self.first_post_at)
+        avatars = 0
+        for user in User.objects.filter(avatar__isnull=True).order_by('id').iterator(chunk_size=1000):
+            create_avatar(user)
+            avatars += 1
+        self.stdout.write('Rebuilt counters, activity and {} avatars in {:.1f}s'.format(
+            avatars, time.monotonic() - started))
+
+        elapsed = time.monotonic() - self.started
+        total = sum(self.counts.values())
+        self.stdout.write(self.style.SUCCESS('Imported {} rows in {:.1f}s ({:.0f} rows/s)'.format(
+            total, elapsed, total / elapsed if elapsed else 0)))
+
+    def build_board(self, record):
+        return Board(id=record['id'], name=record['name'], description=record.get('description', ''))
+
+    def build_user(self, record):
+        return User(
+            id=record['id'],
+            username=record['username'],
+            email=record.get('email', ''),
+            password=record.get('password') or '!',
+            date_joined=self.parse_date(record.get('date_joined')) or timezone.now()
+        )
+
+    def build_topic(self, record):
+        self.board_ids.add(record['board'])
+        return Topic(
+            id=record['id'],
+            subject=record['subject'],
+            board_id=record['board'],
+            starter_id=record['starter'],
+            views=record.get('views', 0),
+            last_updated=self.parse_date(record['last_updated'])
+        )
+
+    def build_post(self, record):
+        message = record['message']
+        created_at = self.parse_date(record['created_at'])
+        if self.first_post_at is None or created_at < self.first_post_at:
+            self.first_post_at = created_at
+        return Post(
+            id=record['id'],
+            message=message,
+            message_html='' if self.options['skip_render'] else render_markdown(message),
+            topic_id=record['topic'],
+            created_by_id=record['created_by'],
+            created_at=created_at,
+            updated_at=self.parse_date(record.get('updated_at')),
+            updated_by_id=record.get('updated_by')
+        )
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        date = parse_datetime(value)
+        if date is None:
+            raise ValueError('Invalid date {!r}'.format(value))
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date, dt_timezone.utc)
+        return date
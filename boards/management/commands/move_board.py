@@ -0,0 +1,104 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, transaction
+
+from boards.bulk import bulk_create_preserving_dates
+from boards.counters import reset_board_caches
+from boards.feeds import SITEMAP_CHUNKS_KEY
+from boards.models import Board, Post, PostRevision, Topic
+from boards.paginator import invalidate_pages, post_page_key
+from boards.routers import board_databases, shard_id_range
+
+# Parents are copied before children and deleted after them
+MODELS = (Topic, Post, PostRevision)
+
+
+class Command(BaseCommand):
+    help = '''Move the topics, posts and post revisions of a board to another shard.
+
+    Rows are copied in id order, then Board.shard is switched and the old rows
+    are deleted. Replies written to the board while the copy runs are lost, so
+    run it while the board is quiet. Rows keep their ids, so a board that
+    gained rows on a shard cannot move back to a shard with a lower id range.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('board', type=int)
+        parser.add_argument('shard', help='A database alias from BOARD_SHARDS, or default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(pk=options['board'])
+        except Board.DoesNotExist as e:
+            raise CommandError(e)
+        source, target = board.shard, options['shard']
+        if target not in board_databases():
+            raise CommandError('Unknown shard {!r}, expected one of {}'.format(target, ', '.join(board_databases())))
+        if source == target:
+            self.stdout.write('Board {} is already on {}'.format(board, target))
+            return
+
+        started = time.monotonic()
+        querysets = {
+            Topic: Topic.objects.using(source).filter(board=board),
+            Post: Post.objects.using(source).filter(topic__board=board),
+            PostRevision: PostRevision.objects.using(source).filter(post__topic__board=board),
+        }
+        # SQLite numbers a new row after the highest id in its table, so a
+        # copied id above the target's range would move the target into the
+        # range of another shard and topic ids would collide across shards
+        end = shard_id_range(target)[1]
+        for model in MODELS:
+            if querysets[model].filter(id__gte=end).exists():
+                raise CommandError('Board {} has {}s numbered after the id range of {}, '
+                                   'which cannot be moved there'.format(board, model._meta.model_name, target))
+        try:
+            with transaction.atomic(using=target):
+                for model in MODELS:
+                    copied = self.copy(querysets[model], target, options['batch_size'])
+                    self.stdout.write('Copied {} {}s'.format(copied, model._meta.model_name))
+        except IntegrityError as e:
+            raise CommandError('Rows of board {} already exist on {}: {}'.format(board, target, e))
+
+        board.shard = target
+        board.save(update_fields=['shard'])
+
+        topic_ids = list(querysets[Topic].values_list('id', flat=True))
+        self.delete(board, source)
+        # Cached pages hold instances bound to the old shard
+        reset_board_caches([board.pk])
+        cache.delete(SITEMAP_CHUNKS_KEY)
+        for topic_id in topic_ids:
+            invalidate_pages(post_page_key(topic_id))
+        self.stdout.write('Moved board {} from {} to {} in {:.1f}s'.format(
+            board, source, target, time.monotonic() - started))
+
+    def copy(self, queryset, target, batch_size):
+        '''
+        Keyset pagination by id keeps every batch an indexed range query
+        '''
+        copied = 0
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not rows:
+                return copied
+            bulk_create_preserving_dates(queryset.model, rows, using=target)
+            copied += len(rows)
+            last_id = rows[-1].id
+
+    def delete(self, board, source):
+        '''
+        One DELETE per table; going through the ORM would send a signal
+        and recount the topic for every post
+        '''
+        connection = connections[source]
+        topic, post, revision = (connection.ops.quote_name(model._meta.db_table) for model in MODELS)
+        topics = 'SELECT id FROM {} WHERE board_id = %s'.format(topic)
+        posts = 'SELECT id FROM {} WHERE topic_id IN ({})'.format(post, topics)
+        with transaction.atomic(using=source), connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE post_id IN ({})'.format(revision, posts), [board.pk])
+            cursor.execute('DELETE FROM {} WHERE topic_id IN ({})'.format(post, topics), [board.pk])
+            cursor.execute('DELETE FROM {} WHERE board_id = %s'.format(topic), [board.pk])
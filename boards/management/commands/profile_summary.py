@@ -0,0 +1,63 @@
+import os
+import pstats
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Summarize the hottest functions per URL name from captured request profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PROFILING_DIR)
+        parser.add_argument('--url-name', help='Only summarize this URL name')
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'])
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        if not os.path.isdir(directory):
+            self.stderr.write('No profiles found in {}'.format(directory))
+            return
+
+        profiles = defaultdict(list)
+        samples = defaultdict(list)
+        for filename in sorted(os.listdir(directory)):
+            url_name, _, rest = filename.partition('.')
+            if options['url_name'] and url_name != options['url_name']:
+                continue
+            path = os.path.join(directory, filename)
+            if rest.endswith('.prof'):
+                profiles[url_name].append(path)
+            elif rest.endswith('.collapsed'):
+                samples[url_name].append(path)
+
+        for url_name, paths in sorted(profiles.items()):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                '{} ({} profiled requests)'.format(url_name, len(paths))))
+            stats = pstats.Stats(*paths, stream=self.stdout)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+
+        for url_name, paths in sorted(samples.items()):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                '{} ({} sampled requests)'.format(url_name, len(paths))))
+            self.summarize_samples(paths, options['limit'])
+
+    def summarize_samples(self, paths, limit):
+        '''
+        Count leaf frames (self time) and every frame on the stack (total time)
+        '''
+        own, total = Counter(), Counter()
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    frames = stack.split(';')
+                    own[frames[-1]] += int(count)
+                    for frame in set(frames):
+                        total[frame] += int(count)
+
+        self.stdout.write('  samples   self  function')
+        for frame, count in total.most_common(limit):
+            self.stdout.write('  {:7d} {:6d}  {}'.format(count, own[frame], frame))
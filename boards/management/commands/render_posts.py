@@ -0,0 +1,108 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from boards.models import Post
+from boards.rendering import render_rows
+
+
+class Command(BaseCommand):
+    help = 'Re-render Post.message_html in id-ordered chunks across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only render posts that have no stored HTML yet')
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='Skip posts with an id up to and including this one')
+        parser.add_argument('--checkpoint',
+                            help='File recording the last written post id, for --resume')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the id stored in --checkpoint')
+
+    def handle(self, *args, **options):
+        self.options = options
+        last_id = options['start_after']
+        if options['resume']:
+            last_id = max(last_id, self.read_checkpoint())
+
+        total = self.queryset(last_id).count()
+        self.stdout.write('Rendering {} posts after id {} with {} workers'.format(
+            total, last_id, options['workers']))
+
+        # Forked workers must not inherit open database connections
+        for connection in connections.all():
+            if not connection.in_atomic_block:
+                connection.close()
+
+        done = 0
+        started = time.monotonic()
+        in_flight = deque()
+        chunks = self.chunks(last_id)
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for rows in chunks:
+                in_flight.append(executor.submit(render_rows, rows))
+                if len(in_flight) >= options['workers'] * 2:
+                    done += self.write(in_flight.popleft().result())
+                    self.progress(done, total, started)
+            while in_flight:
+                done += self.write(in_flight.popleft().result())
+                self.progress(done, total, started)
+
+        self.stdout.write(self.style.SUCCESS('Rendered {} posts in {:.1f}s'.format(
+            done, time.monotonic() - started)))
+
+    def queryset(self, last_id):
+        queryset = Post.objects.filter(id__gt=last_id)
+        if self.options['missing_only']:
+            queryset = queryset.filter(message_html='')
+        return queryset
+
+    def chunks(self, last_id):
+        '''
+        Keyset pagination over ids, so every chunk is one indexed range scan
+        '''
+        while True:
+            rows = list(self.queryset(last_id).order_by('id').values_list(
+                'id', 'message')[:self.options['chunk_size']])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def write(self, rendered):
+        '''
+        Chunks are written in submission order, so the checkpoint only ever
+        advances past posts that are already stored
+        '''
+        posts = [Post(id=pk, message_html=html) for pk, html in rendered]
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, ['message_html'], batch_size=500)
+        self.write_checkpoint(rendered[-1][0])
+        return len(posts)
+
+    def progress(self, done, total, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        remaining = (total - done) / rate if rate else 0
+        self.stdout.write('{}/{} posts ({:.0f}/s, ~{:.0f}s left)'.format(
+            done, total, rate, remaining))
+
+    def read_checkpoint(self):
+        path = self.options['checkpoint']
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        return 0
+
+    def write_checkpoint(self, last_id):
+        path = self.options['checkpoint']
+        if path:
+            with open(path + '.tmp', 'w') as f:
+                f.write(str(last_id))
+            os.replace(path + '.tmp', path)
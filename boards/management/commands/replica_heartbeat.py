@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from boards.routers import beat
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the Heartbeat row on the primary; replicas whose copy gets too old stop serving reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=float, default=0,
+                            help='Keep beating every LOOP seconds instead of exiting')
+
+    def handle(self, *args, **options):
+        while True:
+            beat()
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
@@ -0,0 +1,26 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from boards import activity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily post rollups from the posts table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.fromisoformat,
+                            help='First day to rebuild, YYYY-MM-DD (default: everything)')
+        parser.add_argument('--board', type=int, action='append', dest='boards',
+                            help='Only rebuild this board, site-wide rows are left alone (repeatable)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        since = options['since']
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(since, timezone.utc)
+        posts, buckets = activity.rebuild(since, options['boards'])
+        self.stdout.write('Rolled up {} posts into {} buckets in {:.1f}s'.format(
+            posts, buckets, time.monotonic() - started))
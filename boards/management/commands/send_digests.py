@@ -0,0 +1,30 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from boards import digest
+
+
+class Command(BaseCommand):
+    help = "Email every subscriber the digest of one day's new topics and replies on their boards"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='UTC day to summarize, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--chunk-size', type=int, help='Users per batch (default: DIGEST_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        day = options['date'] or timezone.now().date() - timedelta(days=1)
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()), timezone.utc)
+        self.started = time.monotonic()
+        users, messages = digest.send(start, start + timedelta(days=1), options['chunk_size'], self.progress)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS('Sent {} digests to {} users in {:.1f}s ({:.0f} messages/s)'.format(
+            messages, users, elapsed, messages / elapsed if elapsed else 0)))
+
+    def progress(self, users, messages):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write('{} users, {} messages ({:.0f}/s)'.format(
+            users, messages, messages / elapsed if elapsed else 0))
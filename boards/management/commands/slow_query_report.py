@@ -0,0 +1,57 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from boards.slow_queries import read_entries
+
+
+class Command(BaseCommand):
+    help = 'Rank slow-query fingerprints by total time, with their SQL, call sites and query plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--sort', default='total', choices=['total', 'count', 'max'])
+        parser.add_argument('--view', help='Only count queries issued by this view (dotted name)')
+
+    def handle(self, *args, **options):
+        stats = defaultdict(lambda: {'count': 0, 'total': 0.0, 'max': 0.0, 'views': Counter(), 'sites': Counter()})
+        samples = {}
+        for entry in read_entries(options['log']):
+            key = entry['fingerprint']
+            # Every line has the SQL; the first in each file also has the plan
+            if key not in samples or ('plan' in entry and 'plan' not in samples[key]):
+                samples[key] = entry
+            if options['view'] and entry.get('view') != options['view']:
+                continue
+            # Summary lines stand for `count` queries of `ms` in total
+            count = entry.get('count', 1)
+            fingerprint = stats[key]
+            fingerprint['count'] += count
+            fingerprint['total'] += entry['ms']
+            fingerprint['max'] = max(fingerprint['max'], entry.get('max_ms', entry['ms']))
+            fingerprint['views'][entry.get('view') or '-'] += count
+            fingerprint['sites'][entry.get('site') or '-'] += count
+
+        if not stats:
+            self.stdout.write('No slow queries logged in {}'.format(options['log']))
+            return
+
+        ranked = sorted(stats.items(), key=lambda item: item[1][options['sort']], reverse=True)
+        for key, fingerprint in ranked[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                '{}  total {:.1f} ms  count {}  mean {:.1f} ms  max {:.1f} ms'.format(
+                    key, fingerprint['total'], fingerprint['count'],
+                    fingerprint['total'] / fingerprint['count'], fingerprint['max'])))
+            sample = samples.get(key)
+            if sample is not None:
+                self.stdout.write('  sql:    {}'.format(sample['sql']))
+                if sample.get('params'):
+                    self.stdout.write('  params: {}'.format(', '.join(sample['params'])))
+            for view, count in fingerprint['views'].most_common(3):
+                self.stdout.write('  view:   {} ({})'.format(view, count))
+            for site, count in fingerprint['sites'].most_common(3):
+                self.stdout.write('  site:   {} ({})'.format(site, count))
+            for line in (sample or {}).get('plan') or []:
+                self.stdout.write('  plan:   {}'.format(line))
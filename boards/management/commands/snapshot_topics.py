@@ -0,0 +1,54 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from boards import snapshots
+from boards.models import Topic
+from boards.routers import board_databases, current_board, use_primary
+
+
+class Command(BaseCommand):
+    help = 'Render every page of idle topics to static HTML under SNAPSHOT_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=settings.SNAPSHOT_IDLE_DAYS)
+        parser.add_argument('--board', type=int)
+        parser.add_argument('--force', action='store_true',
+                            help='Render topics again even if their snapshot is newer than the last reply')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        cutoff = timezone.now() - timedelta(days=options['idle_days'])
+        topics_written = pages_written = 0
+        use_primary.set(True)
+        for database in board_databases():
+            topics = Topic.objects.using(database).filter(last_updated__lt=cutoff, is_live=False)
+            if options['board']:
+                topics = topics.filter(board_id=options['board'])
+            for topic in topics.order_by('id').iterator():
+                if not options['force'] and self.is_fresh(topic):
+                    continue
+                current_board.set(topic.board_id)
+                pages_written += snapshots.write(topic)
+                topics_written += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write('Topic {}: {} pages'.format(topic.pk, topic.get_page_count()))
+        self.stdout.write('Wrote {} pages of {} topics in {:.1f}s'.format(
+            pages_written, topics_written, time.monotonic() - started))
+
+    def is_fresh(self, topic):
+        '''
+        Edits re-render their page as they happen, so only replies and
+        partial refreshes matter here
+        '''
+        if snapshots.is_stale(topic):
+            return False
+        path = os.path.join(snapshots.topic_dir(topic.board_id, topic.pk), 'index.html')
+        try:
+            return os.path.getmtime(path) >= topic.last_updated.timestamp()
+        except OSError:
+            return False
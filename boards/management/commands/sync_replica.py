@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from boards.routers import beat
+
+
+def replica_path(alias):
+    '''
+    Replicas are opened as read-only URIs, file:<path>?mode=ro
+    '''
+    name = str(settings.DATABASES[alias]['NAME'])
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?')[0]
+    return name
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the local replicas, a stand-in for real replication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=float, default=0,
+                            help='Keep copying every LOOP seconds instead of exiting')
+
+    def handle(self, *args, **options):
+        while True:
+            beat()  # Copied along, so the replicas read as caught up
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                source = sqlite3.connect(str(settings.DATABASES['default']['NAME']))
+                target = sqlite3.connect(replica_path(alias), timeout=settings.SQLITE_BUSY_TIMEOUT / 1000)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+                if options['verbosity'] > 1:
+                    self.stdout.write('Copied to {} in {:.2f}s'.format(alias, time.monotonic() - started))
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
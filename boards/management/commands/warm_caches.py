@@ -0,0 +1,110 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+
+from boards import snapshots
+from boards.cache import board_cache, board_stats
+from boards.models import Post, Topic
+from boards.rendering import render_rows
+from boards.routers import board_databases, current_board, use_primary
+from boards.views import board_topics
+
+
+def in_worker(task):
+    '''
+    Threads get their own database connections, which nothing else closes
+    '''
+    try:
+        return task()
+    finally:
+        connections.close_all()
+
+
+def from_primary(board_id, task):
+    use_primary.set(True)
+    current_board.set(board_id)
+    return task()
+
+
+def warm_board_page(board_id, number):
+    request = snapshots.anonymous_get(reverse('board_topics', kwargs={'pk': board_id}),
+                                      {'page': number} if number > 1 else {})
+    board_topics(request, pk=board_id)
+
+
+def render_missing_html(topic):
+    '''
+    Store message_html of posts saved before it existed, so the hot pages
+    are not rendered from Markdown on every request
+    '''
+    database = board_cache.get(topic.board_id).shard
+    rows = list(Post.objects.using(database).filter(topic_id=topic.pk, message_html='').values_list('id', 'message'))
+    if rows:
+        posts = [Post(id=pk, message_html=html) for pk, html in render_rows(rows)]
+        with transaction.atomic(using=database):
+            Post.objects.using(database).bulk_update(posts, ['message_html'], batch_size=500)
+    return len(rows)
+
+
+class Command(BaseCommand):
+    help = 'Fill the shared cache after a deploy: board stats and the first pages of the busiest boards and topics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boards', type=int, default=10, help='Busiest boards to warm the topic lists of')
+        parser.add_argument('--topics', type=int, default=50, help='Most recently active topics to warm')
+        parser.add_argument('--pages', type=int, default=settings.PAGE_CACHE_PAGES, help='Pages per board and topic')
+        parser.add_argument('--hours', type=int, default=24, help='Activity window for ranking boards')
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.workers = options['workers']
+        use_primary.set(True)
+        boards = board_cache.all()
+        topics = self.hottest_topics(options['topics'])
+        busiest = self.busiest_boards(options['boards'], timezone.now() - timedelta(hours=options['hours']))
+
+        stats = self.run([partial(from_primary, board.pk, partial(board_stats, board)) for board in boards])
+        topic_counts = {board.pk: values['topics'] for board, values in zip(boards, stats)}
+        rendered = sum(self.run([partial(from_primary, topic.board_id, partial(render_missing_html, topic))
+                                 for topic in topics]))
+        pages = [partial(from_primary, board_id, partial(warm_board_page, board_id, number))
+                 for board_id in busiest
+                 for number in range(1, min(options['pages'], math.ceil(topic_counts.get(board_id, 0) / 10)) + 1)]
+        pages += [partial(from_primary, topic.board_id, partial(snapshots.render_page, topic, number))
+                  for topic in topics for number in range(1, min(options['pages'], topic.get_page_count()) + 1)]
+        self.run(pages)
+
+        self.stdout.write('Warmed {} boards, {} pages of {} boards and {} topics, rendered {} posts in {:.1f}s'.format(
+            len(boards), len(pages), len(busiest), len(topics), rendered, time.monotonic() - started))
+
+    def run(self, tasks):
+        if self.workers <= 1:
+            return [task() for task in tasks]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(in_worker, tasks))
+
+    def hottest_topics(self, limit):
+        topics = []
+        for database in board_databases():
+            topics += Topic.objects.using(database).order_by('-last_updated')[:limit]
+        return sorted(topics, key=lambda topic: topic.last_updated, reverse=True)[:limit]
+
+    def busiest_boards(self, limit, since):
+        '''
+        Boards with the most topics active since `since`
+        '''
+        activity = []
+        for database in board_databases():
+            activity += Topic.objects.using(database).filter(last_updated__gte=since).values_list(
+                'board_id').annotate(active=Count('id')).order_by('-active')[:limit]
+        return [board_id for board_id, active in sorted(activity, key=lambda row: row[1], reverse=True)[:limit]]
@@ -0,0 +1,284 @@
+'''
+Prometheus-style metrics.
+
+Every worker process counts into a small in-memory registry, guarded by one
+lock held only for a few dict updates, and dumps it to
+METRICS_DIR/<pid>-<start time>.json at most every METRICS_WRITE_INTERVAL
+seconds. The /metrics view sums the files of all workers, so any worker can
+answer a scrape. A worker folds its numbers into archived.json when it exits,
+and the next scrape does the same for workers that died without doing so;
+the start time in the name tells a dead worker from a new one that got its
+pid. The summed counters therefore never go down, which Prometheus would
+take for a counter reset.
+'''
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from . import live
+from .cache import board_cache
+from .models import Topic
+from .routers import board_databases, replica_monitor
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ARCHIVE = 'archived.json'
+
+DUMP_NAME = re.compile(r'^(\d+)-(\d+)\.json$')
+
+logger = logging.getLogger('boards.metrics')
+
+
+def process_start(pid):
+    '''
+    Start time of a process in clock ticks since boot, or None where /proc
+    cannot tell
+    '''
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            # The command name in parentheses may contain spaces
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def dump_name(pid):
+    return '{}-{}.json'.format(pid, process_start(pid) or 0)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.latency = defaultdict(lambda: [0] * (len(BUCKETS) + 3))
+        self.db = defaultdict(lambda: [0.0, 0])
+        self.written_at = 0
+        self.write_lock = threading.Lock()
+        self.cleanup_registered = False
+        self.pid = None
+        self.name = None
+
+    def observe_request(self, url_name, method, status, seconds, db_seconds, db_queries):
+        bucket = bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.requests['{}|{}|{}'.format(url_name, method, status)] += 1
+            latency = self.latency[url_name]
+            latency[bucket] += 1
+            latency[-2] += seconds
+            latency[-1] += 1
+            db = self.db[url_name]
+            db[0] += db_seconds
+            db[1] += db_queries
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'latency': {name: list(values) for name, values in self.latency.items()},
+                'db': {name: list(values) for name, values in self.db.items()},
+                'board_cache': board_cache.stats(),
+            }
+
+    def dump_name(self):
+        # Forked workers inherit the registry, so the name follows the pid
+        pid = os.getpid()
+        if self.pid != pid:
+            self.pid, self.name = pid, dump_name(pid)
+        return self.name
+
+    def maybe_write(self):
+        '''
+        One thread writes at a time; the others skip, the dump is at most
+        an interval behind anyway
+        '''
+        if time.monotonic() - self.written_at < settings.METRICS_WRITE_INTERVAL:
+            return
+        if not self.write_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self.written_at < settings.METRICS_WRITE_INTERVAL:
+                return
+            self.written_at = now
+            if not self.cleanup_registered:
+                # Forked workers inherit it, and remove() uses their own pid
+                atexit.register(self.remove)
+                self.cleanup_registered = True
+            self.write()
+        finally:
+            self.write_lock.release()
+
+    def write(self):
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.dump_name())
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def remove(self):
+        '''
+        Archive this worker's final numbers on exit
+        '''
+        path = os.path.join(settings.METRICS_DIR, self.dump_name())
+        if not os.path.exists(path):
+            return  # Never wrote there
+        try:
+            with self.write_lock:
+                self.write()
+            archive(path)
+        except OSError:
+            pass
+
+
+registry = Registry()
+
+
+def is_running(pid, start=None):
+    '''
+    A pid counts only while the process that has it started at `start`
+    '''
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Someone else's process
+    if start and start != '0':
+        current = process_start(pid)
+        if current is not None and current != start:
+            return False  # The pid went to a new process
+    return True
+
+
+def read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # Missing, or being replaced right now
+
+
+def merge(snapshots):
+    total = {'requests': defaultdict(int), 'latency': {}, 'db': {}, 'board_cache': defaultdict(float)}
+    for snapshot in snapshots:
+        for key, count in snapshot['requests'].items():
+            total['requests'][key] += count
+        for section in ('latency', 'db'):
+            for name, values in snapshot[section].items():
+                current = total[section].setdefault(name, [0] * len(values))
+                total[section][name] = [a + b for a, b in zip(current, values)]
+        for name in ('local_hits', 'shared_hits', 'misses'):
+            total['board_cache'][name] += snapshot['board_cache'][name]
+    return total
+
+
+def archive(path):
+    '''
+    Add the dump of a worker that is gone to archived.json and remove it.
+    Scrapes of several workers may find the same dump, so this runs under a
+    file lock and a dump that is already gone is skipped.
+    '''
+    directory = os.path.dirname(path)
+    with open(os.path.join(directory, 'archive.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(path):
+            return
+        snapshot = read(path)
+        if snapshot is not None:
+            archived = read(os.path.join(directory, ARCHIVE))
+            total = merge([archived, snapshot] if archived else [snapshot])
+            with open(os.path.join(directory, ARCHIVE + '.tmp'), 'w') as f:
+                json.dump(total, f)
+            os.replace(os.path.join(directory, ARCHIVE + '.tmp'), os.path.join(directory, ARCHIVE))
+        os.remove(path)
+
+
+def collect():
+    '''
+    Sum the dumps of all workers and of the archived ones, with this
+    process's live numbers
+    '''
+    own = registry.dump_name()
+    snapshots = [registry.snapshot()]
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        name = os.path.basename(path)
+        match = DUMP_NAME.match(name)
+        if name == own or match is None or int(match.group(1)) <= 0:
+            continue
+        if not is_running(int(match.group(1)), match.group(2)):
+            try:
+                archive(path)  # A worker that died without doing it
+            except OSError:
+                pass
+            continue
+        snapshot = read(path)
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    archived = read(os.path.join(settings.METRICS_DIR, ARCHIVE))
+    if archived is not None:
+        snapshots.append(archived)
+    return merge(snapshots)
+
+
+def render():
+    total = collect()
+    lines = []
+
+    def metric(name, kind, help_text):
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, kind))
+
+    metric('boards_http_requests_total', 'counter', 'Requests by URL name, method and status.')
+    for key, count in sorted(total['requests'].items()):
+        url_name, method, status = key.split('|')
+        lines.append('boards_http_requests_total{{url_name="{}",method="{}",status="{}"}} {}'.format(
+            url_name, method, status, count))
+
+    metric('boards_http_request_duration_seconds', 'histogram', 'Request latency by URL name.')
+    for url_name, values in sorted(total['latency'].items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf', ), values):
+            cumulative += count
+            lines.append('boards_http_request_duration_seconds_bucket{{url_name="{}",le="{}"}} {}'.format(
+                url_name, bound, cumulative))
+        lines.append('boards_http_request_duration_seconds_sum{{url_name="{}"}} {:.6f}'.format(url_name, values[-2]))
+        lines.append('boards_http_request_duration_seconds_count{{url_name="{}"}} {}'.format(url_name, values[-1]))
+
+    metric('boards_db_query_duration_seconds_total', 'counter', 'Time spent in database queries by URL name.')
+    for url_name, (seconds, queries) in sorted(total['db'].items()):
+        lines.append('boards_db_query_duration_seconds_total{{url_name="{}"}} {:.6f}'.format(url_name, seconds))
+    metric('boards_db_queries_total', 'counter', 'Database queries by URL name.')
+    for url_name, (seconds, queries) in sorted(total['db'].items()):
+        lines.append('boards_db_queries_total{{url_name="{}"}} {}'.format(url_name, int(queries)))
+
+    stats = total['board_cache']
+    metric('boards_board_cache_lookups_total', 'counter', 'Board cache lookups by result.')
+    for result, name in (('local_hit', 'local_hits'), ('shared_hit', 'shared_hits'), ('miss', 'misses')):
+        lines.append('boards_board_cache_lookups_total{{result="{}"}} {}'.format(result, int(stats[name])))
+    lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+    metric('boards_board_cache_hit_ratio', 'gauge', 'Share of board lookups served from cache.')
+    lines.append('boards_board_cache_hit_ratio {:.4f}'.format(
+        (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0))
+
+    metric('boards_live_flush_lag_seconds', 'gauge', 'Age of the oldest view or reply counter change not yet written back.')
+    for database in board_databases():
+        for topic_id in Topic.objects.using(database).filter(is_live=True).values_list('id', flat=True):
+            lines.append('boards_live_flush_lag_seconds{{topic_id="{}"}} {:.3f}'.format(topic_id, live.get_flush_lag(topic_id)))
+
+    metric('boards_replica_lag_seconds', 'gauge', 'Replica lag at the last check of this worker.')
+    for alias, lag in sorted(replica_monitor.lags.items()):
+        value = '+Inf' if lag == float('inf') else '{:.3f}'.format(lag)
+        lines.append('boards_replica_lag_seconds{{database="{}"}} {}'.format(alias, value))
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,323 @@
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sessions import middleware as sessions_middleware
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from .compression import choose_encoding, compress, compress_stream, is_compressible
+from .metrics import logger as metrics_logger, registry
+from .routers import current_board, use_primary
+from .slow_queries import current_view
+
+
+class ProfilingMiddleware:
+    '''
+    Opt-in request profiler.
+
+    A request is profiled when it carries the PROFILING_HEADER (and the user
+    is staff, or DEBUG is on) or when it is picked by PROFILING_SAMPLE_RATE.
+    In 'cprofile' mode a pstats dump is written per request; in 'sample' mode
+    a background thread samples the request thread's stack and writes
+    collapsed stacks, one "frame;frame;frame count" line each, ready for
+    flamegraph.pl or speedscope.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PROFILING_ENABLED
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.mode = settings.PROFILING_MODE
+        self.directory = settings.PROFILING_DIR
+
+    def __call__(self, request):
+        if not self.enabled or not self.should_profile(request):
+            return self.get_response(request)
+
+        if self.mode == 'sample':
+            sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            self.write(request, 'collapsed', sampler.dump)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            self.write(request, 'prof', profiler.dump_stats)
+        return response
+
+    def should_profile(self, request):
+        if self.header in request.META:
+            user = getattr(request, 'user', None)
+            return settings.DEBUG or (user is not None and user.is_staff)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def write(self, request, extension, dump):
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match else None) or 'unresolved'
+        os.makedirs(self.directory, exist_ok=True)
+        filename = '{url_name}.{stamp}.{pid}.{extension}'.format(
+            url_name=url_name,
+            stamp=int(time.time() * 1000),
+            pid=os.getpid(),
+            extension=extension
+        )
+        dump(os.path.join(self.directory, filename))
+
+
+class StackSampler:
+    '''
+    Samples one thread's Python stack at a fixed interval
+    '''
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{name} ({file}:{line})'.format(
+                    name=code.co_name,
+                    file=os.path.basename(code.co_filename),
+                    line=code.co_firstlineno
+                ))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write('{} {}\n'.format(stack, count))
+
+
+class MetricsMiddleware:
+    '''
+    Records latency, status and database time of every request
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match else None) or 'unresolved'
+        registry.observe_request(url_name, request.method, response.status_code, elapsed, timer.seconds, timer.queries)
+        try:
+            registry.maybe_write()
+        except Exception:
+            # Metrics must never fail the request they measured
+            metrics_logger.exception('Writing the metrics dump failed')
+        return response
+
+
+class QueryTimer:
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class SlowQueryMiddleware:
+    '''
+    Names the view in slow-query log entries
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Not reset on the way out: streamed responses query after returning
+        current_view.set(None)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        current_view.set('{}.{}'.format(view.__module__, view.__qualname__))
+
+
+class BoardShardMiddleware:
+    '''
+    Routes the topic and post queries of a request to the shard of the board
+    in its URL
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Not reset on the way out: streamed responses query after returning
+        current_board.set(None)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.route.startswith('boards/'):
+            current_board.set(view_kwargs.get('pk'))
+
+
+class ReplicaPinMiddleware:
+    '''
+    Requests that write read from the primary, and so does the same browser
+    for REPLICA_PIN_SECONDS afterwards, so nobody misses their own post
+    while the replicas catch up
+    '''
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in self.SAFE_METHODS
+        use_primary.set(writes or settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        response = self.get_response(request)
+        if writes and settings.DATABASE_REPLICAS and response.status_code < 400:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class CompressionMiddleware:
+    '''
+    gzip or brotli for text responses, streaming ones included
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.COMPRESSION_ENABLED
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (not self.enabled or response.has_header('Content-Encoding')
+                or not is_compressible(response.get('Content-Type', ''))):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The bytes changed, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class AnonymousReadMiddleware:
+    '''
+    Marks GETs of ANONYMOUS_FAST_PATH_VIEWS that carry neither a session nor
+    a messages cookie. Such a visitor cannot be logged in and has nothing
+    waiting for them. Without a cookie the session and user are empty and
+    lazy anyway, so the decision waits for process_view and the URL resolved
+    by Django; the authentication middleware below then hands out a plain
+    AnonymousUser, and the session and messages middleware skip their
+    response work.
+    '''
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.ANONYMOUS_FAST_PATH
+        self.url_names = set(settings.ANONYMOUS_FAST_PATH_VIEWS)
+        self.cookies = (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+
+    def __call__(self, request):
+        request.anonymous_read = False
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.anonymous_read = self.enabled and self.is_anonymous_read(request)
+
+    def is_anonymous_read(self, request):
+        if request.method not in self.SAFE_METHODS or any(name in request.COOKIES for name in self.cookies):
+            return False
+        return request.resolver_match.url_name in self.url_names
+
+
+def is_anonymous_read(request):
+    return getattr(request, 'anonymous_read', False)
+
+
+class SessionMiddleware(sessions_middleware.SessionMiddleware):
+    def process_response(self, request, response):
+        if is_anonymous_read(request) and not request.session.modified:
+            # The page would differ with a session cookie
+            patch_vary_headers(response, ('Cookie', ))
+            return response
+        return super().process_response(request, response)
+
+
+class AuthenticationMiddleware(auth_middleware.AuthenticationMiddleware):
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_anonymous_read(request):
+            request.user = AnonymousUser()  # Nothing to look up in an empty session
+
+
+class MessageMiddleware(messages_middleware.MessageMiddleware):
+    '''
+    Anonymous reads store messages only when the view added one; merely
+    showing the (empty) list would otherwise send a cookie-deleting header
+    '''
+    def process_response(self, request, response):
+        storage = getattr(request, '_messages', None)
+        if is_anonymous_read(request) and not (storage is not None and storage.added_new):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.5 on 2026-10-19 07:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_posts(apps, schema_editor):
+    Topic = apps.get_model('boards', 'Topic')
+    Post = apps.get_model('boards', 'Post')
+    counts = Post.objects.filter(topic=OuterRef('pk')).values('topic').annotate(count=Count('*')).values('count')
+    Topic.objects.update(post_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0003_post_message_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='is_live',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
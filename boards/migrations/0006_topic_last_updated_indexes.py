@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-19 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_postrevision'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['last_updated'], name='topic_last_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'last_updated'], name='topic_board_updated_idx'),
+        ),
+    ]
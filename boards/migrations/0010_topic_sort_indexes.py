@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0009_activity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'views'], name='topic_board_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'post_count'], name='topic_board_post_count_idx'),
+        ),
+    ]
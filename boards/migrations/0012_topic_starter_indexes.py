@@ -0,0 +1,29 @@
+# Generated by Django 3.2.5 on 2026-10-19 08:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0011_subscription'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'starter'], name='topic_board_starter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'starter', 'last_updated'], name='topic_starter_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'starter', 'views'], name='topic_starter_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'starter', 'post_count'], name='topic_starter_post_count_idx'),
+        ),
+    ]
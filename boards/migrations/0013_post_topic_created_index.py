@@ -0,0 +1,17 @@
+# Generated by Django 3.2.5 on 2026-10-19 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0012_topic_starter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['topic', 'created_at'], name='post_topic_created_idx'),
+        ),
+    ]
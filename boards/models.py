@@ -1,9 +1,12 @@
 import math
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.text import Truncator
 from django.utils.html import mark_safe
-from markdown import markdown
+
+from .deltas import apply_delta, make_delta, make_snapshot, read_snapshot
+from .rendering import render_markdown
 
 
 # Create your models here.
@@ -11,29 +14,64 @@ from markdown import markdown
 class Board(models.Model):
     name = models.CharField(max_length=30, unique=True)
     description = models.CharField(max_length=100)
+    shard = models.CharField(max_length=30, default='default', editable=False)
 
     def __str__(self):
         return self.name
 
+    def get_posts(self):
+        # Routed to the board's shard, see boards.routers
+        return Post.objects.db_manager(hints={'instance': self}).filter(topic__board=self)
+
     def get_posts_count(self):
-        return Post.objects.filter(topic__board=self).count()
+        return self.get_posts().count()
     
     def get_last_post(self):
-        return Post.objects.filter(topic__board=self).order_by('-created_at').first()
+        return self.get_posts().order_by('-created_at').first()
     
     
 class Topic(models.Model):
     subject = models.CharField(max_length=255)
     last_updated = models.DateTimeField(auto_now_add=True)
-    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='topics')
-    starter = models.ForeignKey(User, on_delete=models.CASCADE,  related_name='topics')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='topics', db_constraint=False)
+    starter = models.ForeignKey(User, on_delete=models.CASCADE,  related_name='topics', db_constraint=False)
     views = models.PositiveIntegerField(default=0)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    is_live = models.BooleanField(default=False, editable=False)
+
+    # Sort modes of the topic list. Every ordering ends in id, so a page can
+    # also be resumed after its last row, and each one reads an index below
+    # (SQLite ends every index with the rowid, and the board FK index serves
+    # 'newest'). The board and starter indexes do the same for "my topics".
+    SORT_CHOICES = (('recent', 'Recent'), ('views', 'Most viewed'), ('replies', 'Most replies'), ('newest', 'Newest'))
+    ORDERINGS = {
+        'recent': ('-last_updated', '-id'),
+        'views': ('-views', '-id'),
+        'replies': ('-post_count', '-id'),
+        'newest': ('-id', ),
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_updated'], name='topic_last_updated_idx'),
+            models.Index(fields=['board', 'last_updated'], name='topic_board_updated_idx'),
+            models.Index(fields=['board', 'views'], name='topic_board_views_idx'),
+            models.Index(fields=['board', 'post_count'], name='topic_board_post_count_idx'),
+            models.Index(fields=['board', 'starter'], name='topic_board_starter_idx'),
+            models.Index(fields=['board', 'starter', 'last_updated'], name='topic_starter_updated_idx'),
+            models.Index(fields=['board', 'starter', 'views'], name='topic_starter_views_idx'),
+            models.Index(fields=['board', 'starter', 'post_count'], name='topic_starter_post_count_idx'),
+        ]
 
     def __str__(self):
         return self.subject
+
+    @property
+    def replies(self):
+        return max(self.post_count - 1, 0)
     
     def get_page_count(self):
-        count = self.posts.count()
+        count = self.post_count
         pages = count/10
         return math.ceil(pages)
     
@@ -54,15 +92,164 @@ class Topic(models.Model):
 
 class Post(models.Model):
     message = models.TextField(max_length=4000)
+    message_html = models.TextField(blank=True, default='', editable=False)
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE,  related_name='posts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(null=True)
-    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
-    updated_by = models.ForeignKey(User, on_delete=models.CASCADE,  null=True, related_name='+')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', db_constraint=False)
+    updated_by = models.ForeignKey(User, on_delete=models.CASCADE,  null=True, related_name='+', db_constraint=False)
+
+    class Meta:
+        indexes = [
+            # Thread pages and their infinite scroll read (created_at, id) ranges
+            models.Index(fields=['topic', 'created_at'], name='post_topic_created_idx'),
+        ]
 
     def __str__(self):
         truncated_message = Truncator(self.message)
         return truncated_message.chars(30)
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'message' in update_fields:
+            self.message_html = render_markdown(self.message)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'message_html'}
+        super().save(*args, **kwargs)
+
     def get_message_as_markdown(self):
-        return mark_safe(markdown(self.message, safe_mode='escape'))
\ No newline at end of file
+        '''
+        Posts saved before message_html existed render on the fly until
+        `manage.py render_posts --missing-only` has backfilled them
+        '''
+        return mark_safe(self.message_html or render_markdown(self.message))
+    
+    def add_revision(self, previous_message, previous_author, previous_date):
+        '''
+        Keep the text being replaced as a delta against the new message.
+        Every POST_REVISION_SNAPSHOT_INTERVAL-th revision is stored in full,
+        which bounds the delta chain walked to rebuild any revision.
+        '''
+        number = self.revisions.count()
+        is_snapshot = (number + 1) % settings.POST_REVISION_SNAPSHOT_INTERVAL == 0
+        if is_snapshot:
+            data = make_snapshot(previous_message)
+        else:
+            data = make_delta(self.message, previous_message)
+        return PostRevision.objects.create(
+            post=self,
+            number=number,
+            data=data,
+            is_snapshot=is_snapshot,
+            created_at=previous_date,
+            created_by=previous_author
+        )
+    
+    def get_revision_message(self, number):
+        snapshot = self.revisions.filter(number__gte=number, is_snapshot=True).order_by('number').first()
+        revisions = self.revisions.filter(number__gte=number)
+        if snapshot is not None:
+            revisions = revisions.filter(number__lt=snapshot.number)
+            message = read_snapshot(snapshot.data)
+        else:
+            message = self.message
+        for revision in revisions.order_by('-number').only('data'):
+            message = apply_delta(message, revision.data)
+        return message
+    
+    def get_revisions(self):
+        '''
+        Every earlier version with its text, newest first, in one pass
+        '''
+        message = self.message
+        revisions = []
+        for revision in self.revisions.prefetch_related('created_by').order_by('-number'):
+            if revision.is_snapshot:
+                message = read_snapshot(revision.data)
+            else:
+                message = apply_delta(message, revision.data)
+            revision.message = message
+            revisions.append(revision)
+        return revisions
+
+
+class PostRevision(models.Model):
+    '''
+    An earlier version of a post. `data` rebuilds it from the next newer
+    version (or holds it in full when is_snapshot is set).
+    '''
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    data = models.BinaryField()
+    is_snapshot = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_constraint=False)
+
+    class Meta:
+        unique_together = ('post', 'number')
+
+    def __str__(self):
+        return '{} (revision {})'.format(self.post, self.number)
+
+class Heartbeat(models.Model):
+    '''
+    Rewritten on the primary every few seconds; how far a replica's copy
+    trails behind is the replica's lag
+    '''
+    beat = models.DateTimeField()
+
+
+class Activity(models.Model):
+    '''
+    Posts written per hour or day, per board and (with no board) site-wide,
+    see boards.activity
+    '''
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = ((HOUR, 'Hour'), (DAY, 'Day'))
+
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, null=True, related_name='+', db_constraint=False)
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    posts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'period', 'bucket'], name='activity_board_bucket_uniq'),
+            models.UniqueConstraint(fields=['period', 'bucket'], condition=models.Q(board=None),
+                                    name='activity_site_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return '{} {} {}: {}'.format(self.board_id or 'site', self.period, self.bucket, self.posts)
+
+
+class Subscription(models.Model):
+    '''
+    A user's favorite board; its new topics and replies go into the user's
+    daily digest email, see boards.digest
+    '''
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriptions')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='subscriptions')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'board')
+
+    def __str__(self):
+        return '{} -> {}'.format(self.user_id, self.board_id)
+
+
+class DigestSent(models.Model):
+    '''
+    A day's digest that went out to a user; a rerun of send_digests for that
+    day skips the user
+    '''
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='digests_sent')
+    day = models.DateField()
+
+    class Meta:
+        unique_together = ('user', 'day')
+
+    def __str__(self):
+        return '{} {}'.format(self.user_id, self.day)
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.utils.functional import cached_property
+
+from .cache import get_or_compute
+
+
+def topic_count_key(board_id):
+    return 'board:{}:topic_count'.format(board_id)
+
+
+def starter_topic_count_key(board_id, user_id):
+    return 'board:{}:starter:{}:topic_count'.format(board_id, user_id)
+
+
+def topic_page_key(board_id, sort='recent'):
+    return 'board:{}:topics:{}:page:'.format(board_id, sort)
+
+
+def post_page_key(topic_id):
+    return 'topic:{}:posts:page:'.format(topic_id)
+
+
+def invalidate_pages(page_key):
+    cache.delete_many([page_key + str(number) for number in range(1, settings.PAGE_CACHE_PAGES + 1)])
+
+
+class CountedPaginator(Paginator):
+    '''
+    Paginator that takes its count from a maintained counter (`count`) or a
+    short-lived cache entry (`count_key`) instead of running COUNT(*) on every
+    page.
+
+    The count may be an estimate. Every page fetches one extra row, so a page
+    that turns out to be the real last page fixes the count for free, and the
+    rare underestimate falls back to an exact COUNT(*). A page before the
+    estimated last one also reads the row the estimate says is last, and an
+    overestimate falls back to COUNT(*) too. Page links are therefore always
+    drawn from a correct count. When a COUNT(*) shows that a maintained `count`
+    was wrong, `repair` is called with the real count to fix the counter.
+
+    With a `page_key`, the rows of the first PAGE_CACHE_PAGES pages are kept
+    in the shared cache as well, and concurrent misses build them only once.
+    '''
+    def __init__(self, object_list, per_page, count=None, count_key=None, page_key=None, repair=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+        self.count_key = count_key
+        self.page_key = page_key
+        self.repair = repair
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_key:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        return self.exact_count()
+
+    def exact_count(self):
+        count = Paginator.count.func(self)
+        self.set_count(count)
+        if self.repair is not None and self.known_count is not None and count != self.known_count:
+            self.repair(count)
+        return count
+
+    def set_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        if self.count_key:
+            cache.set(self.count_key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+
+    def page(self, number):
+        try:
+            number = self.validate_number(number)
+        except EmptyPage:
+            if int(number) < 1 or self.count == self.exact_count():
+                raise
+            number = self.validate_number(number)
+
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        object_list = self.fetch(number, bottom, top + 1)
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            if top >= self.count:
+                self.exact_count()
+            elif not self.has_row(self.count - 1):
+                self.exact_count()
+        elif not object_list and number > 1:
+            # Past the real end, which could be anywhere before this page
+            self.exact_count()
+            raise EmptyPage('That page contains no results')
+        elif bottom + len(object_list) != self.count:
+            # Nothing after this page, so the real count is known exactly
+            self.set_count(bottom + len(object_list))
+        return self._get_page(object_list, number, self)
+
+    def has_row(self, index):
+        return len(self.object_list[index:index + 1]) > 0
+
+    def fetch(self, number, bottom, top):
+        if self.page_key and number <= settings.PAGE_CACHE_PAGES:
+            return get_or_compute(self.page_key + str(number), lambda: list(self.object_list[bottom:top]),
+                                  settings.PAGE_CACHE_TIMEOUT)
+        return list(self.object_list[bottom:top])
@@ -0,0 +1,12 @@
+from markdown import markdown
+
+
+def render_markdown(text):
+    return markdown(text, safe_mode='escape')
+
+
+def render_rows(rows):
+    '''
+    Render a chunk of (id, message) rows; runs inside process pool workers
+    '''
+    return [(pk, render_markdown(message)) for pk, message in rows]
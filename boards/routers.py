@@ -0,0 +1,210 @@
+'''
+Board shards.
+
+Topics, posts and post revisions of a board are stored in the database named
+by Board.shard; boards, users, sessions and everything else stay in
+'default'. Related managers and saved instances carry their database with
+them. Querysets that start from a model class, like the
+get_object_or_404(Topic, board__pk=pk, pk=topic_pk) lookups in the views, are
+routed by the board of the current request, which BoardShardMiddleware takes
+from the URL. Joins cannot cross databases, so users are loaded with
+prefetch_related() rather than select_related().
+
+Every shard gets the full schema (`manage.py migrate --database <shard>`),
+and new shards go at the end of BOARD_SHARDS, since the position of a shard
+picks its id range. Move a board with `manage.py move_board`.
+
+Read replicas.
+
+Reads of 'default' go to a replica from DATABASE_REPLICAS (none by
+default), as long as its copy of the Heartbeat row is at most
+REPLICA_MAX_LAG seconds old. `manage.py replica_heartbeat --loop 1` rewrites
+the row on the primary (`manage.py sync_replica` does too, before every
+copy); requests only read it, from the replicas. Without a running heartbeat
+every replica looks stale and reads stay on the primary. Requests that
+write, and browsers that wrote in the last REPLICA_PIN_SECONDS (see
+ReplicaPinMiddleware), read from the primary so they always see their own
+posts. Shards have no replicas.
+'''
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .cache import board_cache
+from .models import Board, Heartbeat, Topic
+
+SHARDED_MODELS = {'topic', 'post', 'postrevision'}
+
+# Shard n numbers its rows from n * SHARD_ID_RANGE, so ids never collide
+SHARD_ID_RANGE = 10 ** 12
+
+current_board = contextvars.ContextVar('current_board', default=None)
+
+use_primary = contextvars.ContextVar('use_primary', default=False)
+
+
+def is_sharded(model):
+    return model._meta.app_label == 'boards' and model._meta.model_name in SHARDED_MODELS
+
+
+def board_databases():
+    '''
+    Every database that can hold topics and posts
+    '''
+    return [DEFAULT_DB_ALIAS] + [shard for shard in settings.BOARD_SHARDS if shard != DEFAULT_DB_ALIAS]
+
+
+def first_shard_id(shard):
+    return (settings.BOARD_SHARDS.index(shard) + 1) * SHARD_ID_RANGE
+
+
+def shard_id_range(database):
+    '''
+    [first, end) of the ids that new rows of a database are numbered from
+    '''
+    first = 0 if database == DEFAULT_DB_ALIAS else first_shard_id(database)
+    return first, first + SHARD_ID_RANGE
+
+
+def get_topic(pk):
+    '''
+    A topic by its id alone, from whichever database holds it
+    '''
+    for database in board_databases():
+        topic = Topic.objects.using(database).filter(pk=pk).first()
+        if topic is not None:
+            return topic
+    raise Topic.DoesNotExist('Topic matching query does not exist.')
+
+
+def shard_for_board(board_id):
+    try:
+        return board_cache.get(board_id).shard
+    except Board.DoesNotExist:
+        return DEFAULT_DB_ALIAS
+
+
+class BoardShardRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.BOARD_SHARDS:
+            return None
+        instance = hints.get('instance')
+        if not is_sharded(model):
+            # Django would otherwise follow post.created_by onto the shard
+            return DEFAULT_DB_ALIAS if instance is not None and is_sharded(instance) else None
+        if isinstance(instance, Board):
+            return instance.shard
+        if instance is not None and is_sharded(instance):
+            if instance._state.db is not None:
+                return instance._state.db
+            if isinstance(instance, Topic) and instance.board_id is not None:
+                return shard_for_board(instance.board_id)
+        board_id = current_board.get()
+        if board_id is not None:
+            return shard_for_board(board_id)
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Foreign keys to boards and users cross databases on purpose
+        if is_sharded(obj1) or is_sharded(obj2):
+            return True
+        return None
+
+
+def beat():
+    '''
+    Rewrites the Heartbeat row on the primary; never called by requests
+    '''
+    Heartbeat.objects.using(DEFAULT_DB_ALIAS).update_or_create(pk=1, defaults={'beat': timezone.now()})
+
+
+def primary_of(alias):
+    return DEFAULT_DB_ALIAS if alias in settings.DATABASE_REPLICAS else alias
+
+
+class ReplicaMonitor:
+    '''
+    Rechecks replica lag at most every REPLICA_LAG_CHECK_INTERVAL seconds
+    per process
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.healthy = []
+        self.lags = {}
+        self.checked_at = None
+
+    def choose(self):
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+            with self.lock:
+                if self.checked_at is None or now - self.checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+                    self.check()
+        return random.choice(self.healthy) if self.healthy else None
+
+    def check(self):
+        self.lags = {alias: self.lag(alias) for alias in settings.DATABASE_REPLICAS}
+        self.healthy = [alias for alias, lag in self.lags.items() if lag <= settings.REPLICA_MAX_LAG]
+        self.checked_at = time.monotonic()
+
+    def lag(self, alias):
+        try:
+            replica_beat = self.read_beat(alias)
+        except DatabaseError:
+            return float('inf')  # Missing, unreadable or not migrated yet
+        if replica_beat is None:
+            return float('inf')
+        return max((timezone.now() - replica_beat).total_seconds(), 0.0)
+
+    def read_beat(self, alias):
+        return Heartbeat.objects.using(alias).filter(pk=1).values_list('beat', flat=True).first()
+
+    def reset(self):
+        with self.lock:
+            self.healthy = []
+            self.lags = {}
+            self.checked_at = None
+
+
+replica_monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+    shards = BoardShardRouter()
+
+    def primary_for(self, model, hints):
+        alias = self.shards.db_for_write(model, **hints)
+        if alias is None:
+            instance = hints.get('instance')
+            alias = instance._state.db if instance is not None and instance._state.db else DEFAULT_DB_ALIAS
+        return primary_of(alias)
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        primary = self.primary_for(model, hints)
+        if primary != DEFAULT_DB_ALIAS or use_primary.get() or connections[primary].in_atomic_block:
+            return primary
+        return replica_monitor.choose() or primary
+
+    def db_for_write(self, model, **hints):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        # Instances read from a replica are saved to the primary
+        return self.primary_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if settings.DATABASE_REPLICAS and primary_of(obj1._state.db) == primary_of(obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,160 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import activity, live, slow_queries, snapshots, sqlite
+from .autocomplete import subject_index
+from .cache import board_cache, board_stats_key
+from .models import Board, Post, PostRevision, Topic
+from .paginator import invalidate_pages, post_page_key, starter_topic_count_key, topic_count_key, topic_page_key
+from .routers import first_shard_id
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    sqlite.configure(connection)
+    slow_queries.install(connection)
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def invalidate_board_cache(sender, using, **kwargs):
+    # After the commit, or a reader in between would cache the old row under the new version
+    transaction.on_commit(board_cache.invalidate, using=using)
+
+
+@receiver(pre_delete, sender=Board)
+def delete_sharded_topics(sender, instance, **kwargs):
+    '''
+    Deleting a board only cascades within 'default'
+    '''
+    if instance.shard != DEFAULT_DB_ALIAS:
+        instance.topics.all().delete()
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, using, **kwargs):
+    topic = instance.topic
+    if not topic.is_live:
+        if created:
+            Topic.objects.using(using).filter(pk=topic.pk).update(post_count=F('post_count') + 1)
+    elif created:
+        live.record_reply(topic, instance)
+    else:
+        live.forget_tail(topic.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, using, **kwargs):
+    try:
+        topic = instance.topic
+    except Topic.DoesNotExist:
+        return  # The whole topic is being deleted
+    if topic.is_live:
+        live.record_delete(topic, instance)
+    else:
+        Topic.objects.using(using).filter(pk=topic.pk, post_count__gt=0).update(post_count=F('post_count') - 1)
+
+
+# Cached pages and counts are dropped once the write commits; dropped any
+# earlier, a concurrent reader could cache the old rows again until it does
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_topic_count(sender, instance, using, created=True, **kwargs):
+    if created:
+        keys = [topic_count_key(instance.board_id), starter_topic_count_key(instance.board_id, instance.starter_id)]
+        transaction.on_commit(partial(cache.delete_many, keys), using=using)
+
+
+def drop_topic_pages(board_id, stats):
+    for sort in Topic.ORDERINGS:
+        invalidate_pages(topic_page_key(board_id, sort))
+    if stats:
+        cache.delete(board_stats_key(board_id))
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_topic_pages(sender, instance, using, created=True, **kwargs):
+    transaction.on_commit(partial(drop_topic_pages, instance.board_id, created), using=using)
+
+
+def drop_post_pages(topic_id, board_id):
+    invalidate_pages(post_page_key(topic_id))
+    if board_id is not None:
+        cache.delete(board_stats_key(board_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, using, created=True, **kwargs):
+    board_id = None
+    if created:
+        try:
+            board_id = instance.topic.board_id
+        except Topic.DoesNotExist:
+            pass  # The whole topic is being deleted, which clears the stats itself
+    transaction.on_commit(partial(drop_post_pages, instance.topic_id, board_id), using=using)
+
+
+@receiver(post_save, sender=Topic)
+def index_topic_subject(sender, instance, created, using, **kwargs):
+    if created:
+        transaction.on_commit(partial(subject_index.add, instance), using=using)
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    '''
+    Start the id sequences of a new shard at its own range, so topic ids stay
+    unique across shards and boards can move without renumbering
+    '''
+    if sender.name != 'boards' or using not in settings.BOARD_SHARDS:
+        return
+    first_id = first_shard_id(using)
+    with connections[using].cursor() as cursor:
+        for model in (Topic, Post, PostRevision):
+            table = model._meta.db_table
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, first_id])
+            elif row[0] < first_id:
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [first_id, table])
+
+
+@receiver(post_save, sender=Post)
+def refresh_snapshot(sender, instance, created, using, **kwargs):
+    topic = instance.topic
+    if snapshots.exists(topic):
+        transaction.on_commit(partial(snapshots.refresh, topic.board_id, topic.pk, instance.pk, created), using=using)
+
+
+@receiver(post_delete, sender=Post)
+def refresh_snapshot_after_delete(sender, instance, using, **kwargs):
+    try:
+        topic = instance.topic
+    except Topic.DoesNotExist:
+        return
+    if snapshots.exists(topic):
+        transaction.on_commit(partial(snapshots.refresh, topic.board_id, topic.pk, deleted_at=instance.created_at),
+                              using=using)
+
+
+@receiver(post_delete, sender=Topic)
+def remove_snapshot(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(snapshots.remove, instance.board_id, instance.pk), using=using)
+
+
+@receiver(post_save, sender=Post)
+def record_activity(sender, instance, created, using, **kwargs):
+    if created:
+        transaction.on_commit(partial(activity.record_post, instance.topic.board_id, instance.created_at), using=using)
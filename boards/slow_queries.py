@@ -0,0 +1,223 @@
+'''
+Slow-query log.
+
+Every query that takes SLOW_QUERY_THRESHOLD seconds or more is written as a
+JSON line to SLOW_QUERY_LOG, with its normalized SQL and the view and the
+project line that issued it. Queries are grouped by a fingerprint of that
+SQL, with literals and IN lists normalized. The first time a process sees a
+fingerprint in the current file, its line also carries the query plan
+(EXPLAIN QUERY PLAN on SQLite) and, for SELECTs outside the session and auth
+tables, the parameters. After that a process writes at most one line per
+fingerprint every SLOW_QUERY_SUMMARY_INTERVAL seconds, with the `count`,
+total `ms` and `max_ms` of the queries since its last line, so a hot query
+cannot flood the file. `manage.py slow_query_report` ranks the fingerprints
+by total time.
+
+All workers append to the same file, which is created readable by its owner
+and group only. Rotate it externally (logrotate, with `create 0640`); every
+process reopens it once it has been moved and logs its plans again.
+'''
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import WatchedFileHandler
+
+from django.conf import settings
+from django.utils import timezone
+
+# Dotted name of the view being served, set by SlowQueryMiddleware
+current_view = ContextVar('current_view', default=None)
+explaining = ContextVar('explaining', default=False)
+
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+WHITESPACE = re.compile(r'\s+')
+# Their parameters are session keys, password hashes and the like
+PRIVATE_TABLES = re.compile(r'\b"?(django_session|auth_\w+|accounts_\w+)"?', re.IGNORECASE)
+
+logger = logging.getLogger('boards.slow_queries')
+logger.propagate = False
+handler_lock = threading.Lock()
+# Guards seen and log_file_id, which every request thread updates
+state_lock = threading.Lock()
+# {fingerprint: queries since its last line}
+seen = {}
+log_file_id = None
+
+
+def normalize(sql):
+    sql = STRINGS.sub('?', sql)
+    sql = NUMBERS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LISTS.sub('(...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+def call_site(connection):
+    '''
+    The innermost frame in the project's own code, past the execute wrappers
+    '''
+    wrappers = {getattr(wrapper, '__code__', None) or wrapper.__call__.__code__
+                for wrapper in connection.execute_wrappers}
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if (frame.f_code not in wrappers and path.startswith(str(settings.BASE_DIR))
+                and 'site-packages' not in path and os.sep + 'migrations' + os.sep not in path):
+            return '{}:{} in {}'.format(os.path.relpath(path, settings.BASE_DIR), frame.f_lineno, frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    token = explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('{} {}'.format(connection.ops.explain_query_prefix(), sql), params)
+            return [' | '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return ['EXPLAIN failed: {}'.format(e)]
+    finally:
+        explaining.reset(token)
+
+
+def get_logger():
+    if not logger.handlers:
+        with handler_lock:
+            if not logger.handlers:
+                os.close(os.open(settings.SLOW_QUERY_LOG, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640))
+                handler = WatchedFileHandler(settings.SLOW_QUERY_LOG, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+    return logger
+
+
+def check_rotation():
+    '''
+    Forget the fingerprints seen so far once the log has been rotated, so the
+    new file gets their plans too. Called with state_lock held.
+    '''
+    global log_file_id
+    try:
+        stat = os.stat(settings.SLOW_QUERY_LOG)
+        file_id = (stat.st_dev, stat.st_ino)
+    except OSError:
+        file_id = None
+    if file_id != log_file_id:
+        seen.clear()
+        log_file_id = file_id
+
+
+def loggable_params(sql, params, many):
+    if not params or many or not sql.lstrip().upper().startswith('SELECT') or PRIVATE_TABLES.search(sql):
+        return None
+    return [str(param) for param in params]
+
+
+class Summary:
+    def __init__(self, now):
+        self.written_at = now
+        self.count = 0
+        self.ms = 0.0
+        self.max_ms = 0.0
+        self.entry = None
+
+    def add(self, entry):
+        self.count += 1
+        self.ms += entry['ms']
+        self.max_ms = max(self.max_ms, entry['ms'])
+        self.entry = entry
+
+    def line(self):
+        return dict(self.entry, count=self.count, ms=round(self.ms, 3), max_ms=self.max_ms)
+
+
+def record(connection, sql, params, many, seconds):
+    key = fingerprint(sql)
+    entry = {
+        'at': timezone.now().isoformat(),
+        'fingerprint': key,
+        'ms': round(seconds * 1000, 3),
+        'database': connection.alias,
+        'view': current_view.get(),
+        'site': call_site(connection),
+        'sql': normalize(sql),
+    }
+    log = get_logger()
+    now = time.monotonic()
+    with state_lock:
+        check_rotation()
+        summary = seen.get(key)
+        if summary is None:
+            seen[key] = Summary(now)
+        else:
+            summary.add(entry)
+            if now - summary.written_at < settings.SLOW_QUERY_SUMMARY_INTERVAL:
+                return
+            seen[key] = Summary(now)
+            entry = summary.line()
+    if summary is None:
+        entry['params'] = loggable_params(sql, params, many)
+        entry['plan'] = None if many else explain(connection, sql, params)
+    log.info(json.dumps(entry))
+
+
+@atexit.register
+def write_summaries():
+    '''
+    Queries counted since the last line of their fingerprint
+    '''
+    with state_lock:
+        summaries = [summary for summary in seen.values() if summary.count]
+        seen.clear()
+    if summaries and logger.handlers:
+        for summary in summaries:
+            logger.info(json.dumps(summary.line()))
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    if explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = time.perf_counter() - started
+    if elapsed >= settings.SLOW_QUERY_THRESHOLD:
+        record(context['connection'], sql, params, many, elapsed)
+    return result
+
+
+def install(connection):
+    # The wrapper list belongs to the DatabaseWrapper, which outlives its connections
+    if settings.SLOW_QUERY_ENABLED and log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+def read_entries(path):
+    '''
+    Entries of the log and its rotated files, oldest file first
+    '''
+    paths = ['{}.{}'.format(path, n) for n in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)] + [path]
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,153 @@
+'''
+Static HTML snapshots of idle topics.
+
+`manage.py snapshot_topics` renders every page of the topics that have had no
+reply for SNAPSHOT_IDLE_DAYS, the way an anonymous visitor sees them, to
+SNAPSHOT_ROOT/boards/<board>/topics/<topic>/page-<n>.html (plus index.html
+for the first page). Once committed, an edit re-renders its page, and a late
+reply or a deleted post re-renders at most its own page and the last two.
+The other pages keep their old page links or post boundaries until
+snapshot_topics renders the whole topic again, which a `stale` marker in its
+directory asks for. Deleted topics lose their snapshot.
+
+A front-end server answers anonymous visitors from there, for nginx:
+
+    map $arg_page $snapshot_page { "" index; default page-$arg_page; }
+
+    location ~ ^/boards/\\d+/topics/\\d+/$ {
+        root <SNAPSHOT_ROOT>/..;
+        error_page 418 = @django;
+        if ($cookie_sessionid) { return 418; }
+        try_files /snapshots${uri}${snapshot_page}.html @django;
+    }
+
+Snapshot hits do not count topic views.
+'''
+import os
+import shutil
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, QueryDict
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import Topic
+from .routers import current_board, use_primary
+from .views import PostListView
+
+render_view = PostListView.as_view(count_views=False, infinite_scroll=False)
+
+
+def topic_dir(board_id, topic_id):
+    return os.path.join(settings.SNAPSHOT_ROOT, 'boards', str(board_id), 'topics', str(topic_id))
+
+
+def exists(topic):
+    return os.path.isdir(topic_dir(topic.board_id, topic.pk))
+
+
+def remove(board_id, topic_id):
+    shutil.rmtree(topic_dir(board_id, topic_id), ignore_errors=True)
+
+
+def anonymous_get(path, params=None):
+    '''
+    A GET request for rendering a page outside of a request, as an anonymous
+    visitor on SITE_URL would send it
+    '''
+    site = urlsplit(settings.SITE_URL)
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.GET = QueryDict(urlencode(params or {}))
+    request.META = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': request.GET.urlencode(),
+        'SERVER_NAME': site.hostname,
+        'SERVER_PORT': str(site.port or (443 if site.scheme == 'https' else 80)),
+    }
+    request.user = AnonymousUser()
+    return request
+
+
+def render_page(topic, number):
+    url = reverse('topic_posts', kwargs={'pk': topic.board_id, 'topic_pk': topic.pk})
+    request = anonymous_get(url, {'page': number} if number > 1 else {})
+    response = render_view(request, pk=topic.board_id, topic_pk=topic.pk)
+    return response.render().content
+
+
+def write_file(path, content):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.tmp', path)
+
+
+def is_stale(topic):
+    return os.path.exists(os.path.join(topic_dir(topic.board_id, topic.pk), 'stale'))
+
+
+def mark_stale(topic):
+    write_file(os.path.join(topic_dir(topic.board_id, topic.pk), 'stale'), b'')
+
+
+def write(topic, numbers=None):
+    '''
+    Render the given pages, or all of them, and drop pages past the end
+    '''
+    directory = topic_dir(topic.board_id, topic.pk)
+    os.makedirs(directory, exist_ok=True)
+    page_count = max(topic.get_page_count(), 1)
+    if numbers is None:
+        numbers = range(1, page_count + 1)
+        if is_stale(topic):
+            os.remove(os.path.join(directory, 'stale'))
+    for number in numbers:
+        if number > page_count:
+            continue
+        content = render_page(topic, number)
+        write_file(os.path.join(directory, 'page-{}.html'.format(number)), content)
+        if number == 1:
+            write_file(os.path.join(directory, 'index.html'), content)
+    for name in os.listdir(directory):
+        if name.startswith('page-') and name.endswith('.html') and int(name[5:-5]) > page_count:
+            os.remove(os.path.join(directory, name))
+    return len(numbers)
+
+
+def refresh(board_id, topic_id, post_id=None, created=False, deleted_at=None):
+    '''
+    Runs after commit, in the request that wrote, so it renders at most
+    three pages and leaves the rest to snapshot_topics
+    '''
+    board_token = current_board.set(board_id)
+    primary_token = use_primary.set(True)  # Replicas may not have the change yet
+    try:
+        topic = Topic.objects.filter(pk=topic_id).first()
+        if topic is None or topic.is_live:
+            remove(board_id, topic_id)
+            return
+        per_page = PostListView.paginate_by
+        last = topic.get_page_count()
+        if created:
+            if topic.post_count % per_page == 1 and last > 1:
+                mark_stale(topic)  # Earlier pages lack a link to the new one
+                write(topic, [last - 1, last])
+            else:
+                write(topic, [last])
+        elif post_id is not None:
+            post = topic.posts.get(pk=post_id)
+            position = topic.posts.filter(created_at__lt=post.created_at).count()
+            write(topic, [position // per_page + 1])
+        else:
+            mark_stale(topic)  # Later pages shifted by one post
+            numbers = {last - 1, last}
+            if deleted_at is not None:
+                numbers.add(topic.posts.filter(created_at__lt=deleted_at).count() // per_page + 1)
+            write(topic, sorted(number for number in numbers if number > 0))
+    finally:
+        use_primary.reset(primary_token)
+        current_board.reset(board_token)
@@ -0,0 +1,56 @@
+'''
+SQLite connection tuning.
+
+Every new connection applies the journal mode and pragmas from settings (in
+WAL mode readers keep reading while a writer commits). Transactions begin
+IMMEDIATE, so a writer waits for the write lock up front instead of failing
+halfway through, and statements that still hit "database is locked" outside
+a transaction are retried with backoff. Compare settings with
+`manage.py bench_sqlite`.
+'''
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+
+def pragmas():
+    return [
+        'PRAGMA journal_mode = {}'.format(settings.SQLITE_JOURNAL_MODE),
+        'PRAGMA synchronous = {}'.format(settings.SQLITE_SYNCHRONOUS),
+        'PRAGMA cache_size = {}'.format(settings.SQLITE_CACHE_SIZE),
+        'PRAGMA mmap_size = {}'.format(settings.SQLITE_MMAP_SIZE),
+        'PRAGMA busy_timeout = {}'.format(settings.SQLITE_BUSY_TIMEOUT),
+    ]
+
+
+def configure(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in pragmas():
+            cursor.execute(pragma)
+    # The wrapper list belongs to the DatabaseWrapper, which outlives its connections
+    if retry_when_locked not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_when_locked)
+
+
+def is_locked(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def retry_when_locked(execute, sql, params, many, context):
+    connection = context['connection']
+    if sql == 'BEGIN' and settings.SQLITE_IMMEDIATE_TRANSACTIONS:
+        sql = 'BEGIN IMMEDIATE'
+    attempt = 0
+    while True:
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            # Inside a transaction the snapshot is stale; only a rollback helps
+            if not is_locked(e) or connection.in_atomic_block or attempt >= settings.SQLITE_BUSY_RETRIES:
+                raise
+            time.sleep(settings.SQLITE_BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import activity
+from ..models import Activity, Board, Post, Topic
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class ActivityTestCase(TestCase):
+    def setUp(self):
+        activity.pending.clear()  # Left over by other tests' posts
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.other = Board.objects.create(name='Python', description='Python board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        self.other_topic = Topic.objects.create(subject='Hi', board=self.other, starter=self.user)
+
+    def post(self, topic, message='Post'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(message=message, topic=topic, created_by=self.user)
+
+
+class RecordPostTests(ActivityTestCase):
+    def test_new_posts_bump_board_and_site_buckets(self):
+        self.post(self.topic)
+        self.post(self.topic)
+        self.post(self.other_topic)
+        now = timezone.now()
+        self.assertEquals(activity.series(self.board.pk, Activity.HOUR, 1, now)[0][1], 2)
+        self.assertEquals(activity.series(self.board.pk, Activity.DAY, 1, now)[0][1], 2)
+        self.assertEquals(activity.series(None, Activity.HOUR, 1, now)[0][1], 3)
+        self.assertEquals(Activity.objects.count(), 6)
+
+    @override_settings(ACTIVITY_FLUSH_INTERVAL=60)
+    def test_posts_are_written_together(self):
+        activity.flush()
+        self.post(self.topic)
+        self.post(self.other_topic)
+        self.assertFalse(Activity.objects.exists())
+        activity.flush()
+        for i in range(3):
+            self.post(self.topic)
+        # One transaction, one UPDATE per bucket however many posts came in
+        with self.assertNumQueries(6):
+            self.assertEquals(activity.flush(), 4)
+        self.assertEquals(activity.series(None, Activity.HOUR, 1)[0][1], 5)
+
+    def test_series_fills_empty_buckets(self):
+        self.post(self.topic)
+        series = activity.series(self.board.pk, Activity.HOUR, 24)
+        self.assertEquals(len(series), 24)
+        self.assertEquals([posts for bucket, posts in series], [0] * 23 + [1])
+        self.assertEquals(series[1][0] - series[0][0], timedelta(hours=1))
+
+    def test_series_reads_one_query(self):
+        with self.assertNumQueries(1):
+            activity.series(self.board.pk, Activity.HOUR, 500)
+
+
+class RollupActivityCommandTests(ActivityTestCase):
+    def setUp(self):
+        super().setUp()
+        yesterday = timezone.make_aware(datetime(2026, 3, 1, 21, 30), timezone.utc)
+        for topic in (self.topic, self.topic, self.other_topic):
+            Post.objects.create(message='Imported', topic=topic, created_by=self.user)
+        Post.objects.update(created_at=yesterday)
+
+    def rollup(self, **options):
+        out = StringIO()
+        call_command('rollup_activity', stdout=out, **options)
+        return out.getvalue()
+
+    def test_rebuilds_from_posts(self):
+        self.assertIn('Rolled up 3 posts into 6 buckets', self.rollup())
+        end = datetime(2026, 3, 1, 21, tzinfo=timezone.utc)
+        self.assertEquals(activity.series(self.board.pk, Activity.HOUR, 1, end), [(end, 2)])
+        self.assertEquals(activity.series(None, Activity.DAY, 1, end)[0][1], 3)
+
+    def test_single_board_leaves_site_rows_alone(self):
+        self.rollup(boards=[self.board.pk])
+        self.assertFalse(Activity.objects.filter(board=None).exists())
+        self.assertFalse(Activity.objects.filter(board=self.other).exists())
+
+    def test_since_keeps_older_buckets(self):
+        self.rollup()
+        self.assertIn('Rolled up 0 posts', self.rollup(since=datetime(2026, 3, 2)))
+        self.assertEquals(Activity.objects.count(), 6)
+
+
+class ActivityViewTests(ActivityTestCase):
+    def test_page(self):
+        self.post(self.topic)
+        response = self.client.get(reverse('board_activity', kwargs={'pk': self.board.pk}))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response.context['hours']), 48)
+        self.assertEquals(response.context['hours'][-1][1:], (1, 100))
+
+    def test_board_json(self):
+        self.post(self.topic)
+        url = reverse('board_activity_json', kwargs={'pk': self.board.pk})
+        data = self.client.get(url, {'period': 'day', 'buckets': 7}).json()
+        self.assertEquals(data['period'], 'day')
+        self.assertEquals([bucket['posts'] for bucket in data['buckets']], [0] * 6 + [1])
+
+    def test_site_json(self):
+        self.post(self.topic)
+        self.post(self.other_topic)
+        data = self.client.get(reverse('site_activity_json')).json()
+        self.assertIsNone(data['board'])
+        self.assertEquals(data['buckets'][-1]['posts'], 2)
+
+    def test_bad_period(self):
+        response = self.client.get(reverse('site_activity_json'), {'period': 'week'})
+        self.assertEquals(response.status_code, 400)
+
+    def test_unknown_board(self):
+        response = self.client.get(reverse('board_activity_json', kwargs={'pk': 99}))
+        self.assertEquals(response.status_code, 404)
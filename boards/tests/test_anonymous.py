@@ -0,0 +1,73 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import get_resolver, reverse
+from django.urls.resolvers import URLResolver
+
+from ..middleware import MessageMiddleware
+from ..models import Board
+
+
+class AnonymousFastPathTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+
+    def test_cookieless_read(self):
+        response = self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertTrue(response.wsgi_request.anonymous_read)
+        self.assertContains(response, 'Log in')
+        self.assertIn('Cookie', response['Vary'])
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertNotIn('messages', response.cookies)
+
+    def test_url_is_resolved_once(self):
+        root = get_resolver()
+        with mock.patch.object(URLResolver, 'resolve', autospec=True, side_effect=URLResolver.resolve) as resolve:
+            self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertEquals(len([call for call in resolve.call_args_list if call.args[0] is root]), 1)
+
+    def test_messages_added_on_a_fast_path_are_kept(self):
+        def view(request):
+            messages.info(request, 'Welcome back')
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.anonymous_read = True
+        response = MessageMiddleware(view)(request)
+        self.assertIn('messages', response.cookies)
+
+    def test_logged_in_read(self):
+        self.client.login(username='john', password='123')
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.wsgi_request.anonymous_read)
+        self.assertContains(response, 'john')
+
+    def test_pending_messages_take_the_full_path(self):
+        self.client.cookies['messages'] = 'pending'
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.wsgi_request.anonymous_read)
+
+    def test_other_pages_take_the_full_path(self):
+        response = self.client.get(reverse('login'))
+        self.assertFalse(response.wsgi_request.anonymous_read)
+
+    @override_settings(ANONYMOUS_FAST_PATH=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.wsgi_request.anonymous_read)
+
+
+class BenchAnonymousCommandTests(TestCase):
+    def test_reports_every_page(self):
+        out = StringIO()
+        call_command('bench_anonymous', requests=1, rounds=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEquals(len(lines), 4)
+        self.assertTrue(lines[3].startswith('topic_posts'))
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..autocomplete import subject_index, tokenize
+from ..models import Board, Topic
+
+
+class TokenizeTests(TestCase):
+    def test_normalizes_case_accents_and_punctuation(self):
+        self.assertEquals(tokenize('Jokić: MVP-level game!'), ['jokic', 'mvp', 'level', 'game'])
+
+
+class TopicAutocompleteTests(TestCase):
+    def setUp(self):
+        subject_index.built_at = None
+        self.board = Board.objects.create(name='Players', description='Player threads.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.lebron = Topic.objects.create(subject='LeBron James career thread', board=self.board, starter=self.user, views=5)
+        self.lebron_stats = Topic.objects.create(subject='LeBron stats', board=self.board, starter=self.user, views=50)
+        Topic.objects.create(subject='Luka Doncic', board=self.board, starter=self.user)
+        self.url = reverse('topic_autocomplete')
+
+    def search(self, **params):
+        return self.client.get(self.url, params).json()['results']
+
+    def test_prefix_match_by_recency(self):
+        results = self.search(q='lebr')
+        self.assertEquals([result['id'] for result in results], [self.lebron_stats.id, self.lebron.id])
+
+    def test_every_token_must_match(self):
+        results = self.search(q='lebron car')
+        self.assertEquals([result['subject'] for result in results], ['LeBron James career thread'])
+
+    def test_order_by_views(self):
+        results = self.search(q='l', order='views')
+        self.assertEquals(results, [])
+        results = self.search(q='le', order='views')
+        self.assertEquals(results[0]['views'], 50)
+
+    def test_new_topics_are_indexed(self):
+        self.search(q='lebron')
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(subject='Lakers vs Celtics', board=self.board, starter=self.user)
+        with self.assertNumQueries(0):
+            results = self.search(q='lakers')
+        self.assertEquals(results[0]['subject'], 'Lakers vs Celtics')
+
+    def test_uncommitted_topics_are_not_indexed(self):
+        self.search(q='lebron')
+        with self.captureOnCommitCallbacks(execute=False):
+            Topic.objects.create(subject='Lakers vs Celtics', board=self.board, starter=self.user)
+        self.assertEquals(subject_index.search('lakers'), [])
+
+    def test_scan_keeps_newest_matches(self):
+        for i in range(5):
+            Topic.objects.create(subject='Lakers game {}'.format(i), board=self.board, starter=self.user)
+        Topic.objects.filter(subject='Lakers game 0').update(last_updated=timezone.now() + timedelta(days=1))
+        subject_index.built_at = None
+        with mock.patch.object(subject_index, 'scan_limit', 2):
+            results = self.search(q='lak')
+        self.assertEquals([result['subject'] for result in results], ['Lakers game 0', 'Lakers game 4'])
+
+    def test_stale_index_is_served_while_another_thread_rebuilds(self):
+        self.search(q='lebron')
+        subject_index.built_at -= subject_index.rebuild_interval + 1
+        with subject_index.build_lock, self.assertNumQueries(0):
+            self.assertEquals(len(subject_index.search('lebron')), 2)
+
+    def test_result_links_to_topic(self):
+        result = self.search(q='luka')[0]
+        self.assertEquals(result['url'], reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': result['id']}))
+
+    def test_invalid_limit(self):
+        response = self.client.get(self.url, {'q': 'lebron', 'limit': 'x'})
+        self.assertEquals(response.status_code, 400)
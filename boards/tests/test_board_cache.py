@@ -0,0 +1,54 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from ..cache import board_cache
+from ..models import Board
+
+
+class BoardCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board = Board.objects.create(name='Django', description='Django board.')
+
+    def test_repeated_lookups_skip_database(self):
+        board_cache.get(self.board.pk)
+        with self.assertNumQueries(0):
+            board = board_cache.get(self.board.pk)
+        self.assertEquals(board.name, 'Django')
+
+    def test_lookups_count_hits_and_misses(self):
+        before = board_cache.stats()
+        board_cache.get(self.board.pk)
+        board_cache.get(self.board.pk)
+        after = board_cache.stats()
+        self.assertEquals(after['misses'] - before['misses'], 1)
+        self.assertEquals(after['local_hits'] - before['local_hits'], 1)
+
+    def test_save_invalidates(self):
+        board_cache.get(self.board.pk)
+        self.board.name = 'Python'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board.save()
+            # A read before the commit must not outlive it
+            self.assertEquals(board_cache.get(self.board.pk).name, 'Django')
+        self.assertEquals(board_cache.get(self.board.pk).name, 'Python')
+
+    def test_shared_tier_serves_after_local_eviction(self):
+        board_cache.get(self.board.pk)
+        board_cache.local.clear()
+        with self.assertNumQueries(0):
+            board_cache.get(self.board.pk)
+
+    def test_all_boards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Board.objects.create(name='Python', description='Python board.')
+        self.assertEquals([board.name for board in board_cache.all()], ['Django', 'Python'])
+
+    def test_instances_are_not_shared(self):
+        board = board_cache.get(self.board.pk)
+        board.name = 'Changed'
+        self.assertEquals(board_cache.get(self.board.pk).name, 'Django')
+
+    def test_missing_board_is_404(self):
+        response = self.client.get(reverse('board_topics', kwargs={'pk': 99}))
+        self.assertEquals(response.status_code, 404)
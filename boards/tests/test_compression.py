@@ -0,0 +1,93 @@
+import gzip
+from io import StringIO
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.template.loader import get_template
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..compression import brotli, choose_encoding
+from ..models import Board, Post, Topic
+from ..template_loaders import minify
+
+
+class MinifyTests(SimpleTestCase):
+    def test_indentation_is_stripped(self):
+        self.assertEquals(minify('<div>\n    <p>Hi</p>\n\n\n    </div>\n'), '<div>\n<p>Hi</p>\n</div>\n')
+
+    def test_structural_tag_lines_are_joined(self):
+        source = '<ul>\n    {% for x in xs %}\n    <li>{{ x }}</li>\n    {% endfor %}\n</ul>'
+        self.assertEquals(minify(source), '<ul>\n{% for x in xs %}<li>{{ x }}</li>\n{% endfor %}</ul>\n')
+
+    def test_output_tags_keep_their_line_break(self):
+        self.assertEquals(minify('{% firstof name %}\n    there'), '{% firstof name %}\nthere\n')
+
+    def test_preformatted_blocks_are_kept(self):
+        source = '<div>\n    <pre>\n    indented\n</pre>\n    <script>\n  var a = 1;\n</script>\n</div>'
+        self.assertEquals(minify(source), '<div>\n<pre>\n    indented\n</pre>\n<script>\n  var a = 1;\n</script>\n</div>\n')
+
+
+class MinifyingLoaderTests(SimpleTestCase):
+    def test_project_templates_are_minified(self):
+        source = get_template('includes/pagination.html').template.source
+        self.assertNotIn('\n    ', source)
+
+    def test_skipped_templates_are_untouched(self):
+        source = get_template('password_reset_email.html').template.source
+        self.assertIn('Hello!\n\nA password reset', source)
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    def test_gzip(self):
+        self.assertEquals(choose_encoding('gzip, deflate'), 'gzip')
+
+    def test_refused_encodings(self):
+        self.assertEquals(choose_encoding('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding(''))
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        self.assertEquals(choose_encoding('gzip, br'), 'br')
+
+
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123', is_staff=True)
+        topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        for i in range(20):
+            Post.objects.create(message='Post {}'.format(i), topic=topic, created_by=self.user)
+
+    def test_gzip_response(self):
+        response = self.client.get(reverse('home'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEquals(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(b'Django board.', gzip.decompress(response.content))
+        self.assertEquals(int(response['Content-Length']), len(response.content))
+
+    def test_uncompressed_without_accept_encoding(self):
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_streaming_response(self):
+        self.client.login(username='john', password='123')
+        response = self.client.get(reverse('export_board', kwargs={'pk': self.board.pk, 'fmt': 'csv'}),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEquals(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEquals(len(content.splitlines()), 21)
+
+
+class BenchCompressionCommandTests(TestCase):
+    def test_reports_every_setting(self):
+        out = StringIO()
+        call_command('bench_compression', requests=1, topics=2, posts=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('gzip', out.getvalue())
+        self.assertEquals(len(lines), 1 + 3 * 2 * (3 if brotli else 2))
@@ -0,0 +1,128 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import digest
+from ..models import Board, DigestSent, Post, Subscription, Topic
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.django = Board.objects.create(name='Django', description='Django board.')
+            self.python = Board.objects.create(name='Python', description='Python board.')
+            self.quiet = Board.objects.create(name='Quiet', description='Nothing happens here.')
+        self.john = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.jane = User.objects.create_user(username='jane', email='jane@doe.com', password='123')
+        self.mute = User.objects.create_user(username='mute', email='', password='123')
+        self.start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.end = self.start + timedelta(days=1)
+
+        old = Topic.objects.create(subject='Old thread', board=self.django, starter=self.john)
+        Post.objects.create(message='First', topic=old, created_by=self.john)
+        Post.objects.filter(topic=old).update(created_at=self.start - timedelta(days=2))
+        for i in range(3):
+            Post.objects.create(message='Reply {}'.format(i), topic=old, created_by=self.jane)
+        self.new = new = Topic.objects.create(subject='New thread', board=self.python, starter=self.jane)
+        Post.objects.create(message='First', topic=new, created_by=self.jane)
+        Post.objects.filter(created_at__gte=self.start).update(created_at=self.start + timedelta(hours=1))
+
+        for user, board in [(self.john, self.django), (self.john, self.python), (self.jane, self.quiet),
+                            (self.mute, self.django)]:
+            Subscription.objects.create(user=user, board=board)
+
+    def test_summary(self):
+        summaries = digest.summarize(self.start, self.end)
+        self.assertEquals(set(summaries), {self.django.pk, self.python.pk})
+        self.assertEquals(summaries[self.django.pk].replies, 3)
+        self.assertEquals(summaries[self.django.pk].busiest[0]['subject'], 'Old thread')
+        self.assertEquals(summaries[self.python.pk].replies, 0)
+        self.assertEquals(summaries[self.python.pk].new_topics[0]['subject'], 'New thread')
+
+    def test_only_subscribers_of_active_boards_get_mail(self):
+        self.assertEquals(digest.send(self.start, self.end), (1, 1))
+        self.assertEquals(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEquals(message.to, ['john@doe.com'])
+        self.assertIn('Old thread (3 new posts)', message.body)
+        self.assertIn('New thread (1 post)', message.body)
+        self.assertIn(reverse('topic_posts', kwargs={'pk': self.python.pk, 'topic_pk': self.new.pk}), message.body)
+        self.assertNotIn('Quiet', message.body)
+
+    def test_nothing_to_send_without_activity(self):
+        self.assertEquals(digest.send(self.end, self.end + timedelta(days=1)), (0, 0))
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_chunks_share_one_connection(self):
+        Subscription.objects.create(user=self.jane, board=self.python)
+        calls = []
+        with mock.patch('boards.digest.get_connection', wraps=get_connection) as connection:
+            self.assertEquals(digest.send(self.start, self.end, chunk_size=1,
+                                          progress=lambda *args: calls.append(args)), (2, 2))
+        connection.assert_called_once()
+        self.assertEquals(calls, [(1, 1), (2, 2)])
+        self.assertEquals(sorted(message.to[0] for message in mail.outbox), ['jane@doe.com', 'john@doe.com'])
+
+    def test_rerun_skips_users_already_sent(self):
+        Subscription.objects.create(user=self.jane, board=self.python)
+        self.assertEquals(digest.send(self.start, self.end), (2, 2))
+        self.assertEquals(DigestSent.objects.filter(day=self.start.date()).count(), 2)
+        self.assertEquals(digest.send(self.start, self.end), (0, 0))
+        self.assertEquals(len(mail.outbox), 2)
+
+    def test_chunk_failing_partway_resends_only_the_rest(self):
+        Subscription.objects.create(user=self.jane, board=self.python)
+        backend = get_connection()
+        send_messages = backend.send_messages
+        calls = []
+
+        def crash_on_second_message(messages):
+            calls.append(messages)
+            if len(calls) == 2:
+                raise ConnectionError('SMTP went away')
+            return send_messages(messages)
+
+        backend.send_messages = crash_on_second_message
+        with mock.patch('boards.digest.get_connection', return_value=backend):
+            with self.assertRaises(ConnectionError):
+                digest.send(self.start, self.end, chunk_size=10)
+        self.assertEquals(list(DigestSent.objects.values_list('user__username', flat=True)), ['john'])
+        self.assertEquals(digest.send(self.start, self.end, chunk_size=10), (1, 1))
+        self.assertEquals([message.to for message in mail.outbox], [['john@doe.com'], ['jane@doe.com']])
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command('send_digests', date=self.start.date(), chunk_size=10, stdout=out)
+        self.assertIn('Sent 1 digests to 1 users', out.getvalue())
+        self.assertIn('messages/s', out.getvalue())
+
+
+class SubscribeBoardTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.url = reverse('subscribe_board', kwargs={'pk': self.board.pk})
+
+    def test_login_required(self):
+        response = self.client.post(self.url)
+        self.assertRedirects(response, '{}?next={}'.format(reverse('login'), self.url))
+
+    def test_toggle(self):
+        self.client.login(username='john', password='123')
+        response = self.client.post(self.url)
+        self.assertRedirects(response, reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertTrue(Subscription.objects.filter(user=self.user, board=self.board).exists())
+        page = self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertContains(page, 'Unsubscribe from digest')
+        self.client.post(self.url)
+        self.assertFalse(Subscription.objects.exists())
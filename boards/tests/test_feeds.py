@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Board, Post, Topic
+
+
+class FeedTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topics = []
+        for i in range(3):
+            topic = Topic.objects.create(subject='Topic {}'.format(i), board=self.board, starter=self.user)
+            Post.objects.create(message='Lorem ipsum', topic=topic, created_by=self.user)
+            self.topics.append(topic)
+
+
+class BoardFeedTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('board_feed', kwargs={'pk': self.board.pk})
+        self.response = self.client.get(self.url)
+
+    def test_feed_lists_topics(self):
+        self.assertEquals(self.response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        for topic in self.topics:
+            self.assertContains(self.response, topic.subject)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=self.response['Last-Modified'])
+        self.assertEquals(response.status_code, 304)
+
+    def test_feed_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_new_topic_refreshes_feed(self):
+        topic = Topic.objects.create(subject='Brand new', board=self.board, starter=self.user)
+        self.assertContains(self.client.get(self.url), topic.subject)
+
+    def test_new_view_count_refreshes_feed(self):
+        Topic.objects.filter(pk=self.topics[0].pk).update(views=42)
+        self.assertContains(self.client.get(self.url), '42 views')
+
+    def test_site_feed(self):
+        self.assertContains(self.client.get(reverse('site_feed')), 'Topic 0')
+
+    def test_board_page_links_feed(self):
+        response = self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertContains(response, 'href="{}"'.format(self.url))
+
+
+@override_settings(SITEMAP_SHARD_SIZE=2)
+class SitemapTests(FeedTestCase):
+    def test_index_lists_shards(self):
+        response = self.client.get(reverse('sitemap_index'))
+        self.assertContains(response, '<sitemap>', 2)
+
+    def test_shard_streams_its_topics(self):
+        response = self.client.get(reverse('sitemap_topics', kwargs={'shard': 0}))
+        content = b''.join(response.streaming_content).decode()
+        self.assertEquals(content.count('<url>'), 2)
+
+    def test_missing_shard(self):
+        response = self.client.get(reverse('sitemap_topics', kwargs={'shard': 9}))
+        self.assertEquals(response.status_code, 404)
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import Avatar
+
+from ..models import Activity, Board, Post, Topic
+
+ARCHIVE = [
+    {'type': 'board', 'id': 10, 'name': 'Archive', 'description': 'Old threads'},
+    {'type': 'user', 'id': 20, 'username': 'oldtimer', 'email': 'old@timer.com', 'date_joined': '2009-01-01T00:00:00'},
+    {'type': 'topic', 'id': 30, 'board': 10, 'starter': 20, 'subject': '2010 Finals', 'last_updated': '2010-06-17T23:00:00Z', 'views': 42},
+    {'type': 'post', 'id': 40, 'topic': 30, 'created_by': 20, 'message': '*Game 7*', 'created_at': '2010-06-17T21:00:00Z'},
+    {'type': 'post', 'id': 41, 'topic': 30, 'created_by': 20, 'message': 'What a game', 'created_at': '2010-06-17T23:00:00Z'},
+]
+
+
+class ImportArchiveTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(handle, 'w') as f:
+            for record in ARCHIVE:
+                f.write(json.dumps(record) + '\n')
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def run_import(self, **options):
+        call_command('import_archive', self.path, batch_size=2, stdout=StringIO(), **options)
+
+    def test_rows_are_imported_with_original_ids(self):
+        self.run_import()
+        self.assertEquals(Board.objects.get(pk=10).name, 'Archive')
+        self.assertEquals(User.objects.get(pk=20).username, 'oldtimer')
+        self.assertEquals(Post.objects.filter(topic_id=30).count(), 2)
+
+    def test_original_timestamps_are_kept(self):
+        self.run_import()
+        self.assertEquals(Topic.objects.get(pk=30).last_updated, datetime(2010, 6, 17, 23, tzinfo=timezone.utc))
+        self.assertEquals(Post.objects.get(pk=40).created_at, datetime(2010, 6, 17, 21, tzinfo=timezone.utc))
+
+    def test_counters_and_html_are_built(self):
+        self.run_import()
+        self.assertEquals(Topic.objects.get(pk=30).post_count, 2)
+        self.assertEquals(Post.objects.get(pk=40).message_html, '<p><em>Game 7</em></p>')
+
+    def test_skip_render(self):
+        self.run_import(skip_render=True)
+        self.assertEquals(Post.objects.get(pk=40).message_html, '')
+
+    def test_rerun_with_ignore_conflicts(self):
+        self.run_import()
+        self.run_import(ignore_conflicts=True)
+        self.assertEquals(Post.objects.count(), 2)
+
+    def test_auto_now_add_is_left_alone(self):
+        self.run_import()
+        self.assertTrue(Post._meta.get_field('created_at').auto_now_add)
+
+    def test_signal_work_is_backfilled(self):
+        self.run_import()
+        self.assertTrue(Avatar.objects.filter(user_id=20).exists())
+        day = datetime(2010, 6, 17, tzinfo=timezone.utc)
+        self.assertEquals(Activity.objects.get(board_id=10, period=Activity.DAY, bucket=day).posts, 2)
+        self.assertEquals(Activity.objects.get(board=None, period=Activity.DAY, bucket=day).posts, 2)
@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import live
+from ..models import Board, Post, Topic
+
+
+class LiveTopicTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Games', description='Game threads.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Lakers @ Celtics', board=self.board, starter=self.user)
+        Post.objects.create(message='Tip off', topic=self.topic, created_by=self.user)
+        live.set_live(self.topic, True)
+        self.url = reverse('reply_topic', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        self.client.login(username='john', password='123')
+
+    def tearDown(self):
+        live.set_live(self.topic, False)
+
+
+class LiveReplyTests(LiveTopicTestCase):
+    def test_topic_row_written_once_per_interval(self):
+        with CaptureQueriesContext(connection) as context:
+            for i in range(5):
+                self.client.post(self.url, {'message': 'reply {}'.format(i)})
+        topic_writes = [query for query in context.captured_queries
+                        if query['sql'].startswith('UPDATE "boards_topic"')]
+        self.assertEquals(len(topic_writes), 1)
+
+    def test_redirect_uses_coalesced_count(self):
+        for i in range(9):
+            self.client.post(self.url, {'message': 'reply {}'.format(i)})
+        response = self.client.post(self.url, {'message': 'eleventh post'})
+        post = Post.objects.latest('id')
+        topic_url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        self.assertRedirects(response, '{url}?page=2#{id}'.format(url=topic_url, id=post.id))
+
+    def test_flush_command_writes_counters(self):
+        for i in range(3):
+            self.client.post(self.url, {'message': 'reply {}'.format(i)})
+        call_command('flush_live_topics', stdout=StringIO())
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.post_count, 4)
+        self.assertEquals(self.topic.last_updated, Post.objects.latest('id').created_at)
+
+    def test_flush_adds_pending_changes(self):
+        self.client.post(self.url, {'message': 'reply'})  # Flushes
+        self.client.post(self.url, {'message': 'reply'})
+        # Another worker wrote its own replies in the meantime
+        Topic.objects.filter(pk=self.topic.pk).update(post_count=10)
+        live.flush(self.topic.pk)
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.post_count, 11)
+        self.assertEquals(live.flush(self.topic.pk), {'last_updated': self.topic.last_updated})
+
+    def test_evicted_total_keeps_pending_changes(self):
+        self.client.post(self.url, {'message': 'reply'})  # Flushes
+        self.client.post(self.url, {'message': 'reply'})
+        cache.delete(live.key(self.topic.pk, 'post_count'))
+        self.client.post(self.url, {'message': 'reply'})
+        self.assertEquals(live.get_post_count(self.topic), 4)
+
+    def test_stop_writes_counters(self):
+        self.client.post(self.url, {'message': 'reply'})
+        self.client.post(self.url, {'message': 'reply'})
+        live.set_live(self.topic, False)
+        self.assertFalse(self.topic.is_live)
+        self.assertEquals(self.topic.post_count, 3)
+
+
+class LiveTailTests(LiveTopicTestCase):
+    def test_recent_posts_newest_first(self):
+        live.recent_posts(self.topic)
+        self.client.post(self.url, {'message': 'buzzer beater'})
+        posts = live.recent_posts(self.topic)
+        self.assertEquals([post.message for post in posts], ['buzzer beater', 'Tip off'])
+
+    def test_last_thread_page_is_cut_from_tail(self):
+        for i in range(11):
+            self.client.post(self.url, {'message': 'reply {}'.format(i)})
+        topic_url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        live.tail_posts(self.topic)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(topic_url, {'page': 2})
+        self.assertContains(response, 'reply 9')
+        self.assertContains(response, 'reply 10')
+        self.assertNotContains(response, 'reply 8<')
+        post_reads = [query for query in context.captured_queries
+                      if query['sql'].startswith('SELECT') and 'FROM "boards_post"' in query['sql']
+                      and 'ORDER BY' in query['sql']]
+        self.assertEquals(post_reads, [])
+
+    def test_reply_page_shows_tail(self):
+        self.client.post(self.url, {'message': 'buzzer beater'})
+        response = self.client.get(self.url)
+        self.assertContains(response, 'buzzer beater')
+
+
+class PostCountTests(TestCase):
+    def setUp(self):
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        self.post = Post.objects.create(message='Lorem ipsum', topic=self.topic, created_by=user)
+        Post.objects.create(message='Dolor sit amet', topic=self.topic, created_by=user)
+
+    def test_created_posts_are_counted(self):
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.post_count, 2)
+
+    def test_deleted_posts_are_uncounted(self):
+        self.post.delete()
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.post_count, 1)
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import live, metrics
+from ..metrics import registry
+from ..models import Board, Topic
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR, METRICS_WRITE_INTERVAL=0)
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.client.get(reverse('home'))
+        self.addCleanup(self.remove, metrics.ARCHIVE)
+
+    def remove(self, name):
+        try:
+            os.remove(os.path.join(METRICS_DIR, name))
+        except FileNotFoundError:
+            pass
+
+    def dump(self, name, count):
+        snapshot = registry.snapshot()
+        snapshot['requests'] = {'home|GET|200': count}
+        with open(os.path.join(METRICS_DIR, name), 'w') as f:
+            json.dump(snapshot, f)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEquals(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_counts_and_latency(self):
+        content = self.scrape()
+        self.assertIn('boards_http_requests_total{url_name="home",method="GET",status="200"}', content)
+        self.assertIn('boards_http_request_duration_seconds_bucket{url_name="home",le="+Inf"}', content)
+        self.assertIn('boards_db_queries_total{url_name="home"}', content)
+        self.assertIn('boards_board_cache_hit_ratio', content)
+
+    def test_worker_dump_is_written(self):
+        path = os.path.join(METRICS_DIR, registry.dump_name())
+        with open(path) as f:
+            self.assertIn('requests', json.load(f))
+
+    def test_other_workers_are_summed(self):
+        name = metrics.dump_name(os.getppid())
+        self.dump(name, 1000)
+        own = registry.snapshot()['requests'].get('home|GET|200', 0)
+        content = self.scrape()
+        self.remove(name)
+        self.assertIn('boards_http_requests_total{{url_name="home",method="GET",status="200"}} {}'.format(own + 1000), content)
+
+    def test_dead_workers_are_archived(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        name = '{}-0.json'.format(process.pid)
+        self.dump(name, 1000)
+        self.assertGreater(metrics.collect()['requests']['home|GET|200'], 1000)
+        self.assertFalse(os.path.exists(os.path.join(METRICS_DIR, name)))
+        # Counters never go down, so no scrape sees a reset
+        self.assertGreater(metrics.collect()['requests']['home|GET|200'], 1000)
+
+    @skipUnless(os.path.exists('/proc/self/stat'), 'Needs /proc for process start times')
+    def test_recycled_pid_is_archived(self):
+        name = '{}-1.json'.format(os.getppid())
+        self.dump(name, 1000)
+        metrics.collect()
+        self.assertFalse(os.path.exists(os.path.join(METRICS_DIR, name)))
+        self.assertIn('home|GET|200', metrics.read(os.path.join(METRICS_DIR, metrics.ARCHIVE))['requests'])
+
+    def test_write_errors_do_not_fail_requests(self):
+        with mock.patch.object(registry, 'write', side_effect=FileNotFoundError):
+            with self.assertLogs('boards.metrics', 'ERROR'):
+                response = self.client.get(reverse('home'))
+        self.assertEquals(response.status_code, 200)
+
+    def test_live_flush_lag(self):
+        cache.clear()
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Game thread', board=self.board, starter=user)
+        live.set_live(topic, True)
+        live.record_view(topic)
+        self.assertIn('boards_live_flush_lag_seconds{{topic_id="{}"}}'.format(topic.pk), self.scrape())
+        live.set_live(topic, False)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_restricted_by_ip(self):
+        self.assertEquals(self.client.get(reverse('metrics')).status_code, 403)
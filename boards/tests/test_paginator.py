@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Board, Post, Topic
+from ..paginator import CountedPaginator, topic_count_key
+
+
+class CountedPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        for i in range(25):
+            Post.objects.create(message='Post {}'.format(i), topic=self.topic, created_by=self.user)
+        self.queryset = self.topic.posts.order_by('id')
+
+    def test_known_count_skips_count_query(self):
+        paginator = CountedPaginator(self.queryset, 10, count=25)
+        # The page and the one-row check of the estimated last post
+        with self.assertNumQueries(2):
+            page = paginator.page(2)
+            self.assertEquals(len(page), 10)
+            self.assertTrue(page.has_next())
+
+    def test_underestimate_is_corrected(self):
+        paginator = CountedPaginator(self.queryset, 10, count=15)
+        page = paginator.page(2)
+        self.assertTrue(page.has_next())
+        self.assertEquals(paginator.num_pages, 3)
+
+    def test_overestimate_is_corrected(self):
+        paginator = CountedPaginator(self.queryset, 10, count=45)
+        page = paginator.page(3)
+        self.assertFalse(page.has_next())
+        self.assertEquals(paginator.count, 25)
+
+    def test_overestimate_is_corrected_before_the_last_page(self):
+        paginator = CountedPaginator(self.queryset[:15], 10, count=25)
+        page = paginator.page(1)
+        self.assertTrue(page.has_next())
+        self.assertEquals(paginator.num_pages, 2)
+        self.assertEquals(paginator.count, 15)
+
+    def test_topic_posts_overestimate_repairs_the_row(self):
+        Topic.objects.filter(pk=self.topic.pk).update(post_count=45)
+        url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        response = self.client.get(url)
+        self.assertEquals(response.context['paginator'].num_pages, 3)
+        self.assertNotContains(response, '?page=4')
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.post_count, 25)
+
+    def test_page_past_low_estimate_is_served(self):
+        paginator = CountedPaginator(self.queryset, 10, count=5)
+        self.assertEquals(len(paginator.page(3)), 5)
+
+    def test_empty_page_past_overestimate(self):
+        paginator = CountedPaginator(self.queryset, 10, count=100)
+        with self.assertRaises(EmptyPage):
+            paginator.page(8)
+        self.assertEquals(paginator.num_pages, 3)
+
+    def test_cached_count(self):
+        key = topic_count_key(self.board.pk)
+        CountedPaginator(self.board.topics.order_by('id'), 10, count_key=key).count
+        self.assertEquals(cache.get(key), 1)
+        with self.assertNumQueries(0):
+            CountedPaginator(self.board.topics.order_by('id'), 10, count_key=key).count
+
+    def test_new_topic_invalidates_cached_count(self):
+        key = topic_count_key(self.board.pk)
+        cache.set(key, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(subject='Another', board=self.board, starter=self.user)
+        self.assertIsNone(cache.get(key))
+
+    def test_topic_posts_last_page(self):
+        url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        response = self.client.get(url, {'page': 3})
+        self.assertEquals(len(response.context['posts']), 5)
+        self.assertEquals(response.context['paginator'].num_pages, 3)
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Board, Post, Topic
+
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_DIR=PROFILING_DIR, DEBUG=True)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=topic, created_by=user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk})
+
+    def tearDown(self):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def test_no_profile_without_header(self):
+        self.client.get(self.url)
+        self.assertFalse(os.path.isdir(PROFILING_DIR) and os.listdir(PROFILING_DIR))
+
+    def test_header_writes_profile_named_after_url(self):
+        self.client.get(self.url, HTTP_X_PROFILE='1')
+        files = os.listdir(PROFILING_DIR)
+        self.assertEquals(len(files), 1)
+        self.assertTrue(files[0].startswith('topic_posts.'))
+        self.assertTrue(files[0].endswith('.prof'))
+
+    @override_settings(PROFILING_MODE='sample', PROFILING_SAMPLE_INTERVAL=0.0001)
+    def test_sample_mode_writes_collapsed_stacks(self):
+        self.client.get(self.url, HTTP_X_PROFILE='1')
+        files = os.listdir(PROFILING_DIR)
+        self.assertTrue(files[0].endswith('.collapsed'))
+
+    def test_summary_command(self):
+        self.client.get(self.url, HTTP_X_PROFILE='1')
+        out = StringIO()
+        call_command('profile_summary', dir=PROFILING_DIR, stdout=out)
+        self.assertIn('topic_posts (1 profiled requests)', out.getvalue())
@@ -0,0 +1,53 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Board, Post, Topic
+
+
+class RenderPostsCommandTests(TestCase):
+    def setUp(self):
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        for i in range(5):
+            Post.objects.create(message='**post {}**'.format(i), topic=topic, created_by=user)
+        Post.objects.update(message_html='')
+
+    def test_post_save_stores_rendered_html(self):
+        post = Post.objects.first()
+        post.save()
+        post.refresh_from_db()
+        self.assertEquals(post.message_html, '<p><strong>post 0</strong></p>')
+
+    def test_partial_save_renders_only_with_message(self):
+        post = Post.objects.first()
+        with mock.patch('boards.models.render_markdown') as render:
+            post.save(update_fields=['updated_at'])
+        render.assert_not_called()
+        post.message = '*edited*'
+        post.save(update_fields=['message'])
+        post.refresh_from_db()
+        self.assertEquals(post.message_html, '<p><em>edited</em></p>')
+
+    def test_renders_all_posts(self):
+        call_command('render_posts', workers=1, chunk_size=2, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(message_html='').exists())
+        post = Post.objects.order_by('id').last()
+        self.assertEquals(post.message_html, '<p><strong>post 4</strong></p>')
+
+    def test_resume_from_checkpoint(self):
+        ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'checkpoint')
+            with open(checkpoint, 'w') as f:
+                f.write(str(ids[2]))
+            call_command('render_posts', workers=1, checkpoint=checkpoint, resume=True, stdout=StringIO())
+            with open(checkpoint) as f:
+                self.assertEquals(int(f.read()), ids[-1])
+        self.assertEquals(Post.objects.filter(message_html='').count(), 3)
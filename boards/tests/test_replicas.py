@@ -0,0 +1,142 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Board, Heartbeat, Topic
+from ..routers import ReplicaMonitor, ReplicaRouter, beat, replica_monitor, use_primary
+
+
+class ReplicaTestCase(TransactionTestCase):
+    '''
+    Replicas are off by default, so the class adds a 'replica' that mirrors
+    the test database and joins the class's databases once it exists
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cls.replicas = override_settings(DATABASE_REPLICAS=['replica'])
+        cls.replicas.enable()
+        connections.databases['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': '',
+                                            'TEST': {'MIRROR': 'default'}}
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        connections['replica'].creation.set_as_test_mirror(connections['default'].settings_dict)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        cls.replicas.disable()
+
+    def setUp(self):
+        replica_monitor.reset()
+        self.addCleanup(replica_monitor.reset)
+        self.addCleanup(use_primary.set, False)
+
+    def make_healthy(self):
+        beat()
+        replica_monitor.check()
+        self.assertEquals(replica_monitor.healthy, ['replica'])
+
+
+class ReplicaRouterTests(ReplicaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = ReplicaRouter()
+
+    def test_unhealthy_until_first_heartbeat(self):
+        self.assertIsNone(replica_monitor.choose())
+        self.assertFalse(Heartbeat.objects.exists())
+
+    def test_checks_do_not_write(self):
+        beat()
+        with CaptureQueriesContext(connections['default']) as primary:
+            replica_monitor.check()
+        self.assertEquals(primary.captured_queries, [])
+
+    def test_heartbeat_command(self):
+        call_command('replica_heartbeat')
+        replica_monitor.check()
+        self.assertEquals(replica_monitor.healthy, ['replica'])
+
+    def test_reads_go_to_healthy_replica(self):
+        self.make_healthy()
+        self.assertEquals(self.router.db_for_read(Topic), 'replica')
+
+    def test_pinned_reads_go_to_primary(self):
+        self.make_healthy()
+        use_primary.set(True)
+        self.assertEquals(self.router.db_for_read(Topic), 'default')
+
+    def test_writes_go_to_primary(self):
+        self.make_healthy()
+        board = Board(name='Django', description='Django board.')
+        board._state.db = 'replica'
+        self.assertEquals(self.router.db_for_write(Board, instance=board), 'default')
+        self.assertEquals(self.router.db_for_write(Topic), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'boards'))
+        self.assertIsNone(self.router.allow_migrate('default', 'boards'))
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.make_healthy()
+        with mock.patch.object(ReplicaMonitor, 'read_beat', return_value=timezone.now() - timedelta(minutes=1)):
+            replica_monitor.check()
+        self.assertEquals(replica_monitor.healthy, [])
+        self.assertEquals(self.router.db_for_read(Topic), 'default')
+
+
+class ReplicaPinTests(ReplicaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.client.login(username='john', password='123')
+        self.make_healthy()
+
+    def test_get_reads_from_replica(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertTrue(replica.captured_queries)
+
+    def test_write_pins_browser_to_primary(self):
+        response = self.client.post(reverse('new_topic', kwargs={'pk': self.board.pk}), {
+            'subject': 'Test title', 'message': 'Lorem ipsum dolor sit amet'})
+        self.assertIn('pin_primary', response.cookies)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(response.url)
+        self.assertContains(response, 'Lorem ipsum dolor sit amet')
+        self.assertEquals(replica.captured_queries, [])
+
+
+class ReplicaLagTests(SimpleTestCase):
+    def test_caught_up_replica(self):
+        monitor = ReplicaMonitor()
+        with mock.patch.object(monitor, 'read_beat', return_value=timezone.now() + timedelta(seconds=1)):
+            self.assertEquals(monitor.lag('replica'), 0.0)
+
+    def test_trailing_replica(self):
+        monitor = ReplicaMonitor()
+        with mock.patch.object(monitor, 'read_beat', return_value=timezone.now() - timedelta(seconds=30)):
+            self.assertGreaterEqual(monitor.lag('replica'), 30)
+
+    def test_unreadable_replica(self):
+        monitor = ReplicaMonitor()
+        with mock.patch.object(monitor, 'read_beat', side_effect=DatabaseError):
+            self.assertEquals(monitor.lag('replica'), float('inf'))
+
+    def test_off_by_default(self):
+        self.assertEquals(settings.DATABASE_REPLICAS, [])
+        self.assertIsNone(ReplicaRouter().db_for_read(Topic))
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Board, Post, Topic
+from ..viewed_topics import COOKIE_NAME
+
+
+class ViewedTopicsTests(TestCase):
+    def setUp(self):
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': self.topic.pk})
+        self.client.login(username='john', password='123')
+
+    def test_views_counted_once_per_browser(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.views, 1)
+        self.assertIn(COOKIE_NAME, self.client.cookies)
+
+    def test_reading_topic_does_not_write_session(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        session_writes = [query['sql'] for query in context.captured_queries
+                          if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')]
+        self.assertEquals(session_writes, [])
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies[COOKIE_NAME] = 'garbage'
+        response = self.client.get(self.url)
+        self.assertEquals(response.status_code, 200)
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.views, 1)
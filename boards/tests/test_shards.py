@@ -0,0 +1,234 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..autocomplete import SubjectIndex
+from ..models import Board, Post, Topic
+from ..paginator import post_page_key, topic_count_key, topic_page_key
+from ..routers import BoardShardRouter, board_databases, current_board, first_shard_id
+
+
+@override_settings(BOARD_SHARDS=['games'])
+class BoardShardRouterTests(TestCase):
+    def setUp(self):
+        self.router = BoardShardRouter()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board = Board.objects.create(name='Games', description='Game threads.', shard='games')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.addCleanup(current_board.set, None)
+
+    def test_board_instance_picks_its_shard(self):
+        self.assertEquals(self.router.db_for_read(Topic, instance=self.board), 'games')
+        self.assertEquals(self.router.db_for_write(Post, instance=self.board), 'games')
+
+    def test_saved_instance_keeps_its_database(self):
+        topic = Topic(board_id=self.board.pk)
+        topic._state.db = 'games'
+        self.assertEquals(self.router.db_for_read(Post, instance=topic), 'games')
+
+    def test_new_topic_uses_its_board_shard(self):
+        self.assertEquals(self.router.db_for_write(Topic, instance=Topic(board_id=self.board.pk)), 'games')
+
+    def test_current_board_routes_class_querysets(self):
+        self.assertIsNone(self.router.db_for_read(Topic))
+        current_board.set(self.board.pk)
+        self.assertEquals(self.router.db_for_read(Topic), 'games')
+
+    def test_boards_and_users_stay_on_default(self):
+        current_board.set(self.board.pk)
+        self.assertIsNone(self.router.db_for_read(Board, instance=self.board))
+        self.assertIsNone(self.router.db_for_write(User))
+
+    def test_cross_database_relations_allowed(self):
+        topic = Topic(board_id=self.board.pk)
+        self.assertTrue(self.router.allow_relation(topic, self.user))
+        self.assertIsNone(self.router.allow_relation(self.board, self.user))
+
+    def test_shard_id_ranges(self):
+        self.assertEquals(board_databases(), ['default', 'games'])
+        self.assertEquals(first_shard_id('games'), 10 ** 12)
+
+
+class BoardShardMiddlewareTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.addCleanup(current_board.set, None)
+
+    def test_board_urls_set_current_board(self):
+        self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertEquals(current_board.get(), self.board.pk)
+
+    def test_other_urls_clear_current_board(self):
+        current_board.set(self.board.pk)
+        self.client.get(reverse('home'))
+        self.assertIsNone(current_board.get())
+
+    def test_unsharded_router_is_a_no_op(self):
+        current_board.set(self.board.pk)
+        self.assertIsNone(BoardShardRouter().db_for_read(Topic))
+
+
+class MoveBoardCommandTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+
+    def test_unknown_shard(self):
+        with self.assertRaises(CommandError):
+            call_command('move_board', self.board.pk, 'nowhere', stdout=StringIO())
+
+    def test_same_shard_is_a_no_op(self):
+        out = StringIO()
+        call_command('move_board', self.board.pk, 'default', stdout=out)
+        self.assertIn('already on default', out.getvalue())
+
+
+class MoveBoardBetweenShardsTests(TestCase):
+    '''
+    Runs against a real 'games' database, created for this class only since
+    the settings define no shards. The test runner only knows the configured
+    databases, so 'games' joins the class's databases once it exists.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.shards = override_settings(BOARD_SHARDS=['games'])
+        cls.shards.enable()
+        cls.directory = tempfile.mkdtemp()
+        name = os.path.join(cls.directory, 'games.sqlite3')
+        connections.databases['games'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name, 'TEST': {'NAME': name}}
+        connections.ensure_defaults('games')
+        connections.prepare_test_settings('games')
+        connections['games'].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        cls.databases = {'default', 'games'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['games'].close()
+        del connections['games']
+        del connections.databases['games']
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        cls.shards.disable()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(current_board.set, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board = Board.objects.create(name='Games', description='Game threads.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topics = [Topic.objects.create(subject='Game {}'.format(i), board=self.board, starter=self.user)
+                       for i in range(2)]
+        self.posts = [Post.objects.create(message='Post {}'.format(i), topic=self.topics[i % 2], created_by=self.user)
+                      for i in range(5)]
+
+    def move(self, shard):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('move_board', self.board.pk, shard, batch_size=2, stdout=StringIO())
+        self.board.refresh_from_db()
+
+    def test_rows_move_with_their_ids(self):
+        created_at = Post.objects.get(pk=self.posts[0].pk).created_at
+        self.move('games')
+        self.assertEquals(self.board.shard, 'games')
+        self.assertFalse(Topic.objects.using('default').filter(board=self.board).exists())
+        self.assertEquals(sorted(self.board.topics.values_list('id', flat=True)), [topic.pk for topic in self.topics])
+        self.assertEquals(sorted(Post.objects.using('games').values_list('id', flat=True)),
+                          [post.pk for post in self.posts])
+        self.assertEquals(Post.objects.using('games').get(pk=self.posts[0].pk).created_at, created_at)
+        self.assertEquals(sorted(self.board.topics.values_list('post_count', flat=True)), [2, 3])
+
+    def test_requests_follow_the_board(self):
+        url = reverse('board_topics', kwargs={'pk': self.board.pk})
+        topic_url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topics[0].pk})
+        self.client.get(url)
+        self.client.get(topic_url)
+        keys = [topic_count_key(self.board.pk), topic_page_key(self.board.pk) + '1', post_page_key(self.topics[0].pk) + '1']
+        self.assertEquals(len(cache.get_many(keys)), 3)
+        self.move('games')
+        self.assertEquals(cache.get_many(keys), {})
+        response = self.client.get(url)
+        self.assertContains(response, 'Game 1')
+        self.assertEquals(response.context['topics'].paginator.count, 2)
+        self.assertContains(self.client.get(topic_url), 'Post 4')
+
+    def test_new_topics_get_the_shard_id_range(self):
+        self.move('games')
+        topic = Topic(subject='After the move', board=self.board, starter=self.user)
+        topic.save()  # Like new_topic, which routes by the instance
+        self.assertEquals(topic._state.db, 'games')
+        self.assertGreater(topic.pk, first_shard_id('games'))
+
+    def test_round_trip_keeps_each_id_range(self):
+        self.move('games')
+        self.move('default')
+        self.assertEquals(self.board.shard, 'default')
+        topic = Topic(subject='Back on default', board=self.board, starter=self.user)
+        topic.save()
+        post = Post(message='On default', topic=topic, created_by=self.user)
+        post.save()
+        self.assertEquals(topic._state.db, 'default')
+        self.assertLess(topic.pk, first_shard_id('games'))
+        self.assertLess(post.pk, first_shard_id('games'))
+
+    def test_rows_from_a_higher_range_do_not_move_down(self):
+        self.move('games')
+        Topic(subject='Played on games', board=self.board, starter=self.user).save()
+        with self.assertRaisesMessage(CommandError, 'numbered after the id range of default'):
+            self.move('default')
+        self.assertEquals(self.board.shard, 'games')
+        self.assertEquals(self.board.topics.count(), 3)
+        other = Board.objects.create(name='Other', description='Stays on default.')
+        topic = Topic(subject='Still low', board=other, starter=self.user)
+        topic.save()
+        self.assertLess(topic.pk, first_shard_id('games'))
+
+    def test_site_wide_reads_cover_the_shard(self):
+        self.move('games')
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Board.objects.create(name='Other', description='Stays on default.')
+        Topic(subject='Default thread', board=other, starter=self.user).save()
+
+        feed = self.client.get(reverse('site_feed')).content.decode()
+        self.assertIn('Game 0', feed)
+        self.assertIn('Default thread', feed)
+
+        with override_settings(SITEMAP_SHARD_SIZE=2):
+            cache.clear()
+            index = self.client.get(reverse('sitemap_index')).content.decode()
+            self.assertEquals(index.count('<sitemap>'), 2)
+            urls = ''.join(b''.join(self.client.get(reverse('sitemap_topics', kwargs={'shard': shard}))
+                                    .streaming_content).decode() for shard in range(2))
+        for topic in self.topics:
+            self.assertIn('/topics/{}/'.format(topic.pk), urls)
+
+        index = SubjectIndex()
+        self.assertEquals(len(index.search('game')), 2)
+
+        out = StringIO()
+        call_command('export_posts', stdout=out, stderr=StringIO())
+        self.assertEquals(len(out.getvalue().splitlines()), 5)
+        out = StringIO()
+        call_command('export_posts', topic=self.topics[0].pk, stdout=out, stderr=StringIO())
+        self.assertEquals(len(out.getvalue().splitlines()), 3)
+
+    def test_admin_live_mode_writes_to_the_shard(self):
+        self.move('games')
+        User.objects.create_superuser(username='admin', email='admin@doe.com', password='123')
+        self.client.login(username='admin', password='123')
+        url = reverse('admin:boards_topic_changelist') + '?board__id__exact={}'.format(self.board.pk)
+        self.assertContains(self.client.get(url), 'Game 1')
+        self.client.post(url, {'action': 'start_live_mode', '_selected_action': [self.topics[0].pk]})
+        self.assertTrue(Topic.objects.using('games').get(pk=self.topics[0].pk).is_live)
+        self.client.post(url, {'action': 'stop_live_mode', '_selected_action': [self.topics[0].pk]})
+        self.assertFalse(Topic.objects.using('games').get(pk=self.topics[0].pk).is_live)
+        change = reverse('admin:boards_topic_change', args=[self.topics[0].pk])
+        self.assertContains(self.client.get(change), 'Game 0')
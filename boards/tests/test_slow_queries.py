@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import slow_queries
+from ..models import Board, Post, Topic
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_literals_and_in_lists_are_normalized(self):
+        self.assertEquals(
+            slow_queries.normalize("SELECT *  FROM t WHERE a = 'x' AND b = 42 AND c IN (%s, %s, %s)"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)')
+        self.assertEquals(slow_queries.fingerprint('SELECT 1 WHERE id IN (%s, %s)'),
+                          slow_queries.fingerprint('SELECT 2 WHERE id IN (%s, %s, %s, %s)'))
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.log = os.path.join(directory, 'slow.log')
+        settings_override = override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG=self.log,
+                                              SLOW_QUERY_SUMMARY_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        slow_queries.seen.clear()
+        slow_queries.logger.handlers.clear()
+        self.addCleanup(slow_queries.logger.handlers.clear)
+        slow_queries.install(connection)
+
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=user)
+        Post.objects.create(message='Post', topic=topic, created_by=user)
+
+    def entries(self):
+        for handler in slow_queries.logger.handlers:
+            handler.flush()
+        return list(slow_queries.read_entries(self.log))
+
+    def test_first_entry_carries_the_plan(self):
+        self.board.get_last_post()
+        self.board.get_last_post()
+        entries = [entry for entry in self.entries() if 'boards_post' in entry['sql']]
+        first, second = entries[-2:]
+        self.assertEquals(first['fingerprint'], second['fingerprint'])
+        self.assertIn('ORDER BY', second['sql'])
+        self.assertTrue(any('SCAN' in line or 'SEARCH' in line for line in first['plan']))
+        self.assertEquals(first['params'], [str(self.board.pk)])
+        self.assertNotIn('plan', second)
+        self.assertTrue(first['site'].startswith('boards/models.py'))
+
+    @override_settings(SLOW_QUERY_SUMMARY_INTERVAL=60)
+    def test_repeats_are_summarized(self):
+        for i in range(5):
+            self.board.get_last_post()
+        entries = [entry for entry in self.entries() if 'boards_post' in entry['sql'] and 'ORDER BY' in entry['sql']]
+        self.assertEquals(len(entries), 1)
+        self.assertIn('plan', entries[0])
+        with override_settings(SLOW_QUERY_SUMMARY_INTERVAL=0):
+            self.board.get_last_post()
+        summary = [entry for entry in self.entries() if entry['fingerprint'] == entries[0]['fingerprint']][-1]
+        self.assertEquals(summary['count'], 5)
+        self.assertNotIn('plan', summary)
+        out = StringIO()
+        call_command('slow_query_report', sort='count', limit=1, stdout=out)
+        self.assertIn('count 6', out.getvalue())
+
+    def test_plans_are_logged_again_after_rotation(self):
+        self.board.get_last_post()
+        self.entries()
+        os.rename(self.log, self.log + '.1')
+        self.board.get_last_post()
+        for handler in slow_queries.logger.handlers:
+            handler.flush()
+        with open(self.log, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        self.assertTrue(any('plan' in entry for entry in entries if 'boards_post' in entry['sql']))
+
+    def test_private_parameters_are_not_logged(self):
+        User.objects.get(username='john')
+        self.client.get(reverse('home'))
+        self.board.save()
+        for entry in self.entries():
+            if 'auth_user' in entry['sql'] or 'django_session' in entry['sql'] or entry['sql'].startswith('UPDATE'):
+                self.assertIsNone(entry.get('params'), entry['sql'])
+
+    def test_log_is_not_world_readable(self):
+        self.board.get_last_post()
+        self.assertEquals(os.stat(self.log).st_mode & 0o007, 0)
+
+    def test_entries_name_the_view(self):
+        self.client.get(reverse('board_topics', kwargs={'pk': self.board.pk}))
+        self.assertIn('boards.views.board_topics', {entry['view'] for entry in self.entries()})
+
+    def test_report_ranks_fingerprints(self):
+        for i in range(3):
+            self.board.get_last_post()
+        out = StringIO()
+        call_command('slow_query_report', limit=2, sort='count', stdout=out)
+        report = out.getvalue()
+        self.assertEquals(report.count('total '), 2)
+        self.assertIn('plan:', report)
+        self.assertIn('site:   boards/models.py', report)
+
+    def test_writes_are_not_explained(self):
+        self.board.save()
+        update = [entry for entry in self.entries() if entry.get('sql', '').startswith('UPDATE')]
+        self.assertIsNone(update[0]['plan'])
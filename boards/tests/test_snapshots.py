@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import snapshots
+from ..models import Board, Post, Topic
+
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(SNAPSHOT_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.idle = Topic.objects.create(subject='Old thread', board=self.board, starter=self.user)
+        for i in range(12):
+            Post.objects.create(message='Old post {}'.format(i), topic=self.idle, created_by=self.user)
+        Topic.objects.filter(pk=self.idle.pk).update(last_updated=timezone.now() - timedelta(days=30))
+        self.active = Topic.objects.create(subject='New thread', board=self.board, starter=self.user)
+        Post.objects.create(message='New post', topic=self.active, created_by=self.user)
+
+    def snapshot(self, topic, name):
+        with open(os.path.join(snapshots.topic_dir(topic.board_id, topic.pk), name), encoding='utf-8') as f:
+            return f.read()
+
+    def run_command(self):
+        out = StringIO()
+        call_command('snapshot_topics', stdout=out)
+        return out.getvalue()
+
+
+class SnapshotTopicsCommandTests(SnapshotTestCase):
+    def test_idle_topics_are_rendered(self):
+        self.assertIn('Wrote 2 pages of 1 topics', self.run_command())
+        self.assertIn('Old post 0', self.snapshot(self.idle, 'index.html'))
+        self.assertIn('Old post 11', self.snapshot(self.idle, 'page-2.html'))
+        self.assertFalse(snapshots.exists(self.active))
+
+    def test_snapshots_render_as_anonymous_and_count_no_views(self):
+        self.run_command()
+        self.assertIn('Log in', self.snapshot(self.idle, 'index.html'))
+        self.idle.refresh_from_db()
+        self.assertEquals(self.idle.views, 0)
+
+    def test_snapshots_page_by_links_only(self):
+        self.run_command()
+        html = self.snapshot(self.idle, 'index.html')
+        self.assertNotIn('more-posts', html)
+        self.assertIn('topic-pagination', html)
+
+    def test_fresh_snapshots_are_skipped(self):
+        self.run_command()
+        self.assertIn('Wrote 0 pages of 0 topics', self.run_command())
+
+
+class SnapshotRefreshTests(SnapshotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.run_command()
+
+    def test_late_reply_rerenders_last_page(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(message='Late reply', topic=self.idle, created_by=self.user)
+        self.assertIn('Late reply', self.snapshot(self.idle, 'page-2.html'))
+
+    def test_reply_starting_a_page_renders_only_the_last_two(self):
+        for i in range(8):
+            Post.objects.create(message='Filler {}'.format(i), topic=self.idle, created_by=self.user)
+        call_command('snapshot_topics', force=True, stdout=StringIO())
+        with mock.patch('boards.snapshots.render_page', wraps=snapshots.render_page) as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(message='Page three', topic=self.idle, created_by=self.user)
+        self.assertEquals([call.args[1] for call in render.call_args_list], [2, 3])
+        self.assertIn('Page three', self.snapshot(self.idle, 'page-3.html'))
+        self.assertTrue(snapshots.is_stale(self.idle))
+
+    def test_deleted_post_leaves_its_page(self):
+        post = self.idle.posts.order_by('created_at').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertNotIn('Old post 0<', self.snapshot(self.idle, 'page-1.html'))
+        self.assertTrue(snapshots.is_stale(self.idle))
+        self.assertIn('Wrote 2 pages of 1 topics', self.run_command())
+        self.assertFalse(snapshots.is_stale(self.idle))
+
+    def test_edit_rerenders_its_page(self):
+        post = self.idle.posts.order_by('created_at').first()
+        post.message = 'Edited post'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertIn('Edited post', self.snapshot(self.idle, 'page-1.html'))
+
+    def test_deleted_topic_loses_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.idle.delete()
+        self.assertFalse(os.path.exists(snapshots.topic_dir(self.board.pk, self.idle.pk)))
@@ -0,0 +1,70 @@
+from io import StringIO
+from types import SimpleNamespace
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..sqlite import retry_when_locked
+
+
+class SQLiteConnectionTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA {}'.format(name))
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEquals(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEquals(self.pragma('busy_timeout'), 5000)
+        self.assertEquals(self.pragma('cache_size'), -20000)
+
+    def test_wrapper_installed_once(self):
+        self.assertEquals(connection.execute_wrappers.count(retry_when_locked), 1)
+
+
+class RetryWhenLockedTests(SimpleTestCase):
+    context = {'connection': SimpleNamespace(in_atomic_block=False)}
+
+    def execute(self, failures):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+            return 'done'
+        return execute, calls
+
+    @override_settings(SQLITE_BUSY_BACKOFF=0)
+    def test_retries_locked_statement(self):
+        execute, calls = self.execute(failures=2)
+        self.assertEquals(retry_when_locked(execute, 'SELECT 1', None, False, self.context), 'done')
+        self.assertEquals(len(calls), 3)
+
+    @override_settings(SQLITE_BUSY_BACKOFF=0, SQLITE_BUSY_RETRIES=1)
+    def test_gives_up_after_retries(self):
+        execute, calls = self.execute(failures=5)
+        with self.assertRaises(OperationalError):
+            retry_when_locked(execute, 'SELECT 1', None, False, self.context)
+        self.assertEquals(len(calls), 2)
+
+    def test_no_retry_inside_transaction(self):
+        execute, calls = self.execute(failures=1)
+        with self.assertRaises(OperationalError):
+            retry_when_locked(execute, 'SELECT 1', None, False, {'connection': SimpleNamespace(in_atomic_block=True)})
+        self.assertEquals(len(calls), 1)
+
+    def test_transactions_begin_immediate(self):
+        execute, calls = self.execute(failures=0)
+        retry_when_locked(execute, 'BEGIN', None, False, self.context)
+        self.assertEquals(calls, ['BEGIN IMMEDIATE'])
+
+
+class BenchSQLiteCommandTests(TestCase):
+    def test_reports_both_modes(self):
+        out = StringIO()
+        call_command('bench_sqlite', seconds=0.1, readers=1, writers=1, topics=5, posts=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn('rollback', output)
+        self.assertIn('tuned', output)
@@ -1,8 +1,11 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse, resolve
 from ..views import home, board_topics, new_topic
-from ..models import Board
+from ..models import Board, Topic
 from ..forms import NewTopicForm
+from ..paginator import starter_topic_count_key
 
 # Create your tests here.
 
@@ -32,4 +35,66 @@ class BoardTopicsTests(TestCase):
         response = self.client.get(board_topics_url)
         
         self.assertContains(response, 'href="{0}"'.format(homepage_url))
-        self.assertContains(response, 'href="{0}"'.format(new_topic_url))        
+        self.assertContains(response, 'href="{0}"'.format(new_topic_url))
+
+
+class BoardTopicsSortTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        other = User.objects.create_user(username='jane', email='jane@doe.com', password='123')
+        self.old = Topic.objects.create(subject='Old', board=self.board, starter=self.user, views=50, post_count=2)
+        self.busy = Topic.objects.create(subject='Busy', board=self.board, starter=other, views=5, post_count=30)
+        self.new = Topic.objects.create(subject='New', board=self.board, starter=other, views=1, post_count=1)
+        Topic.objects.filter(pk=self.old.pk).update(last_updated=self.new.last_updated)
+        self.url = reverse('board_topics', kwargs={'pk': self.board.pk})
+
+    def subjects(self, **params):
+        response = self.client.get(self.url, params)
+        return [topic.subject for topic in response.context['topics']]
+
+    def test_sort_modes(self):
+        self.assertEquals(self.subjects(sort='views'), ['Old', 'Busy', 'New'])
+        self.assertEquals(self.subjects(sort='replies'), ['Busy', 'Old', 'New'])
+        self.assertEquals(self.subjects(sort='newest'), ['New', 'Busy', 'Old'])
+
+    def test_ties_are_broken_by_id(self):
+        self.assertEquals(self.subjects(), ['New', 'Old', 'Busy'])
+
+    def test_unknown_sort_falls_back_to_recent(self):
+        self.assertEquals(self.subjects(sort='random'), self.subjects())
+
+    def test_replies_come_from_post_count(self):
+        response = self.client.get(self.url, {'sort': 'replies'})
+        self.assertEquals(response.context['topics'][0].replies, 29)
+        self.assertContains(response, '<td>29</td>')
+
+    def test_my_topics(self):
+        self.client.login(username='john', password='123')
+        self.assertEquals(self.subjects(mine='1'), ['Old'])
+
+    def test_my_topics_count_is_cached_until_a_new_topic(self):
+        self.client.login(username='john', password='123')
+        self.subjects(mine='1')
+        self.assertEquals(cache.get(starter_topic_count_key(self.board.pk, self.user.pk)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(subject='Mine too', board=self.board, starter=self.user)
+        self.assertEquals(self.subjects(mine='1'), ['Mine too', 'Old'])
+
+    def test_my_topics_ignored_when_logged_out(self):
+        self.assertEquals(len(self.subjects(mine='1')), 3)
+
+    def test_page_links_keep_the_sort(self):
+        for i in range(10):
+            Topic.objects.create(subject='Topic {}'.format(i), board=self.board, starter=self.user)
+        response = self.client.get(self.url, {'sort': 'views'})
+        self.assertContains(response, 'href="?sort=views&amp;page=2"')
+
+    def test_every_sort_reads_an_index_in_order(self):
+        for sort, ordering in Topic.ORDERINGS.items():
+            mine = Topic.objects.filter(board=self.board, starter=self.user)
+            for topics in (Topic.objects.filter(board=self.board), mine):
+                plan = topics.order_by(*ordering)[:11].explain()
+                self.assertIn('USING INDEX', plan, sort)
+                self.assertNotIn('TEMP B-TREE', plan, sort)
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Board, Post, Topic
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Games', description='Game threads.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123', is_staff=True)
+        self.topic = Topic.objects.create(subject='Lakers @ Celtics', board=self.board, starter=self.user)
+        for i in range(5):
+            Post.objects.create(message='Post {}\nwith, "quotes"'.format(i), topic=self.topic, created_by=self.user)
+        other = Topic.objects.create(subject='Other', board=self.board, starter=self.user)
+        Post.objects.create(message='Elsewhere', topic=other, created_by=self.user)
+        self.client.login(username='john', password='123')
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEquals(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+
+class ExportViewTests(ExportTestCase):
+    def test_topic_jsonl(self):
+        content = self.export(reverse('export_topic', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk, 'fmt': 'jsonl'}))
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEquals(len(rows), 5)
+        self.assertEquals(rows[0]['message'], 'Post 0\nwith, "quotes"')
+        self.assertEquals(rows[0]['created_by'], 'john')
+
+    def test_board_csv(self):
+        content = self.export(reverse('export_board', kwargs={'pk': self.board.pk, 'fmt': 'csv'}))
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEquals(rows[0][0], 'id')
+        self.assertEquals(len(rows), 7)
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('export_board', kwargs={'pk': self.board.pk, 'fmt': 'xml'}))
+        self.assertEquals(response.status_code, 404)
+
+    def test_staff_only(self):
+        User.objects.create_user(username='jane', email='jane@doe.com', password='321')
+        self.client.login(username='jane', password='321')
+        response = self.client.get(reverse('export_board', kwargs={'pk': self.board.pk, 'fmt': 'csv'}))
+        self.assertEquals(response.status_code, 302)
+
+
+class ExportCommandTests(ExportTestCase):
+    def test_export_topic(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('export_posts', topic=self.topic.pk, stdout=out, stderr=err)
+        self.assertEquals(len(out.getvalue().splitlines()), 5)
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..deltas import apply_delta, make_delta
+from ..models import Board, Post, PostRevision, Topic
+
+
+class DeltaTests(TestCase):
+    def test_round_trip(self):
+        source = 'The quick brown fox jumps over the lazy dog'
+        target = 'The quick red fox leaps over the lazy dog!'
+        self.assertEquals(apply_delta(source, make_delta(source, target)), target)
+
+    def test_delta_grows_with_edit_size(self):
+        source = 'Lorem ipsum dolor sit amet. ' * 100
+        target = source + 'One more sentence.'
+        self.assertLess(len(make_delta(source, target)), 100)
+
+
+@override_settings(POST_REVISION_SNAPSHOT_INTERVAL=3)
+class PostHistoryTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        self.post = Post.objects.create(message='version 0', topic=self.topic, created_by=self.user)
+        self.client.login(username='john', password='123')
+        edit_url = reverse('edit_post', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk, 'post_pk': self.post.pk})
+        for i in range(1, 8):
+            self.client.post(edit_url, {'message': 'version {}'.format(i)})
+        self.post.refresh_from_db()
+        self.url = reverse('post_history', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk, 'post_pk': self.post.pk})
+
+    def test_every_edit_is_kept(self):
+        self.assertEquals(self.post.message, 'version 7')
+        self.assertEquals(PostRevision.objects.filter(post=self.post).count(), 7)
+        self.assertEquals(PostRevision.objects.filter(post=self.post, is_snapshot=True).count(), 2)
+
+    def test_reconstruct_any_revision(self):
+        for number in range(7):
+            self.assertEquals(self.post.get_revision_message(number), 'version {}'.format(number))
+
+    def test_all_revisions_newest_first(self):
+        messages = [revision.message for revision in self.post.get_revisions()]
+        self.assertEquals(messages, ['version {}'.format(i) for i in range(6, -1, -1)])
+
+    def test_author_sees_history(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'version 0')
+
+    def test_other_users_are_forbidden(self):
+        User.objects.create_user(username='jane', email='jane@doe.com', password='321')
+        self.client.login(username='jane', password='321')
+        response = self.client.get(self.url)
+        self.assertEquals(response.status_code, 403)
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ..models import Board, Post, Topic
+from ..views import topic_posts_fragment
+
+
+class TopicPostsFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.jane = User.objects.create_user(username='jane', email='jane@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Game thread', board=self.board, starter=self.user)
+        self.posts = [
+            Post.objects.create(message='Post {}'.format(i), topic=self.topic,
+                                created_by=self.user if i % 2 else self.jane)
+            for i in range(25)
+        ]
+        self.url = reverse('topic_posts_fragment', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+
+    def test_view_function(self):
+        self.assertEquals(resolve(self.url).func, topic_posts_fragment)
+
+    def test_next_posts_after_cursor(self):
+        data = self.client.get(self.url, {'after': self.posts[9].id}).json()
+        self.assertIn('Post 10', data['html'])
+        self.assertIn('Post 19', data['html'])
+        self.assertNotIn('Post 20', data['html'])
+        self.assertNotIn('<html', data['html'])
+        self.assertEquals(data['next'], self.posts[19].id)
+
+    def test_last_fragment_has_no_cursor(self):
+        data = self.client.get(self.url, {'after': self.posts[19].id}).json()
+        self.assertIn('Post 24', data['html'])
+        self.assertIsNone(data['next'])
+
+    def test_author_post_counts(self):
+        data = self.client.get(self.url, {'after': 0, 'limit': 2}).json()
+        self.assertIn('Posts: 13', data['html'])
+        self.assertIn('Posts: 12', data['html'])
+
+    def test_queries_do_not_grow_with_limit(self):
+        self.client.get(self.url)  # Fill the board cache
+        counts = []
+        for limit in (2, 20):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(self.url, {'limit': limit})
+            counts.append(len(context.captured_queries))
+        self.assertEquals(counts[0], counts[1])
+
+    def test_posts_follow_page_order_not_ids(self):
+        # An imported reply keeps its old date, so it sorts before posts with lower ids
+        imported = Post.objects.create(message='Imported post', topic=self.topic, created_by=self.user)
+        Post.objects.filter(pk=imported.pk).update(created_at=self.posts[4].created_at)
+        seen, after = [], 0
+        while after is not None:
+            data = self.client.get(self.url, {'after': after, 'limit': 3}).json()
+            seen.append(data['html'])
+            after = data['next']
+        html = ''.join(seen)
+        self.assertEquals(html.count('Imported post'), 1)
+        self.assertLess(html.index('Post 4<'), html.index('Imported post'))
+        self.assertLess(html.index('Imported post'), html.index('Post 5<'))
+        for i in range(25):
+            self.assertEquals(html.count('Post {}<'.format(i)), 1)
+
+    def test_unknown_cursor(self):
+        self.assertEquals(self.client.get(self.url, {'after': 999}).status_code, 404)
+
+    def test_bad_cursor(self):
+        self.assertEquals(self.client.get(self.url, {'after': 'x'}).status_code, 400)
+
+    def test_unknown_topic(self):
+        url = reverse('topic_posts_fragment', kwargs={'pk': self.board.pk, 'topic_pk': 99})
+        self.assertEquals(self.client.get(url).status_code, 404)
+
+    def test_topic_page_starts_the_scroll_after_its_last_post(self):
+        response = self.client.get(reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk}))
+        self.assertContains(response, 'data-next="{}"'.format(self.posts[9].id))
+        self.assertContains(response, 'Posts: 13')
@@ -0,0 +1,115 @@
+import threading
+import time
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import board_stats_key, get_or_compute
+from ..models import Board, Post, Topic
+from ..paginator import post_page_key, topic_page_key
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_or_compute('key', compute, 60)))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(results, ['value'] * 8)
+
+    def test_waits_for_the_process_holding_the_lock(self):
+        cache.add('key:lock', 1)
+        threading.Timer(0.1, cache.set, ['key', 'theirs']).start()
+        self.assertEquals(get_or_compute('key', lambda: 'ours', 60), 'theirs')
+
+    @override_settings(CACHE_LOCK_TIMEOUT=0.1)
+    def test_stale_lock_is_not_waited_on_forever(self):
+        cache.add('key:lock', 1)
+        self.assertEquals(get_or_compute('key', lambda: 'ours', 60), 'ours')
+
+    def test_failed_compute_is_not_cached(self):
+        def compute():
+            raise ValueError
+        with self.assertRaises(ValueError):
+            get_or_compute('key', compute, 60)
+        self.assertEquals(get_or_compute('key', lambda: 'value', 60), 'value')
+
+
+class CachedPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        Post.objects.create(message='First post', topic=self.topic, created_by=self.user)
+
+    def test_home_stats_follow_new_posts(self):
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(message='Second post', topic=self.topic, created_by=self.user)
+        response = self.client.get(reverse('home'))
+        self.assertEquals(response.context['boards'][0].stats['posts'], 2)
+
+    def test_new_topic_clears_cached_topic_list(self):
+        url = reverse('board_topics', kwargs={'pk': self.board.pk})
+        self.client.get(url)
+        self.assertIsNotNone(cache.get(topic_page_key(self.board.pk) + '1'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(subject='Another topic', board=self.board, starter=self.user)
+        self.assertContains(self.client.get(url), 'Another topic')
+
+    def test_reply_clears_cached_thread_page(self):
+        url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(message='Second post', topic=self.topic, created_by=self.user)
+            # Dropped at the commit, after which no reader sees the old rows
+            self.assertIsNotNone(cache.get(post_page_key(self.topic.pk) + '1'))
+        self.assertIsNone(cache.get(post_page_key(self.topic.pk) + '1'))
+
+
+class WarmCachesCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        for i in range(15):
+            Post.objects.create(message='Post **{}**'.format(i), topic=self.topic, created_by=self.user)
+        Post.objects.filter(topic=self.topic).update(message_html='')
+        cache.clear()
+
+    def test_stats_and_first_pages_are_cached(self):
+        out = StringIO()
+        call_command('warm_caches', workers=1, stdout=out)
+        self.assertIn('3 pages of 1 boards and 1 topics', out.getvalue())
+        self.assertEquals(cache.get(board_stats_key(self.board.pk))['posts'], 15)
+        self.assertIsNotNone(cache.get(topic_page_key(self.board.pk) + '1'))
+        self.assertIsNotNone(cache.get(post_page_key(self.topic.pk) + '2'))
+        self.assertIsNone(cache.get(post_page_key(self.topic.pk) + '3'))
+
+    def test_missing_html_is_rendered(self):
+        call_command('warm_caches', workers=1, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(message_html='').exists())
+        self.assertIn('<strong>0</strong>', cache.get(post_page_key(self.topic.pk) + '1')[0].message_html)
@@ -1,30 +1,55 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Count
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect, reverse
+from django.template.loader import render_to_string
 from django.views.generic import View, CreateView, UpdateView, ListView
 from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
-from .models import Board, Topic, Post
+from . import activity, export, feeds, live, metrics
+from .autocomplete import subject_index
+from .cache import board_cache, board_stats
+from .models import Activity, Board, Subscription, Topic, Post
+from .paginator import CountedPaginator, post_page_key, starter_topic_count_key, topic_count_key, topic_page_key
 from .forms import NewTopicForm, PostForm
+from .viewed_topics import get_viewed_topics, set_viewed_topics
 
 
 # Create your views here.
 def home(request):
-    boards = Board.objects.all()
+    boards = board_cache.all()
+    for board in boards:
+        board.stats = board_stats(board)
     return render(request, 'home.html', {'boards': boards})
 
 def board_topics(request, pk):
     '''
-    Paginate a function-based view
+    Paginate a function-based view. ?sort= picks one of Topic.ORDERINGS and
+    ?mine=1 keeps the user's own topics.
     '''
-    board = get_object_or_404(Board, id=pk)
-    queryset = board.topics.order_by('-last_updated').annotate(replies=Count('posts') - 1)
+    board = board_cache.get_or_404(pk)
+    sort = request.GET.get('sort')
+    if sort not in Topic.ORDERINGS:
+        sort = 'recent'
+    mine = request.user.is_authenticated and request.GET.get('mine') == '1'
+    queryset = board.topics.order_by(*Topic.ORDERINGS[sort]).prefetch_related('starter')
     page = request.GET.get('page', 1)
     
-    paginator = Paginator(queryset, 10)
+    if mine:
+        paginator = CountedPaginator(queryset.filter(starter=request.user), 10,
+                                     count_key=starter_topic_count_key(board.pk, request.user.pk))
+    else:
+        paginator = CountedPaginator(queryset, 10, count_key=topic_count_key(board.pk),
+                                     page_key=topic_page_key(board.pk, sort))
     
     try:
         topics = paginator.page(page)
@@ -32,12 +57,34 @@ def board_topics(request, pk):
         topics = paginator.page(1)
     except EmptyPage:
         topics = paginator.page(paginator.num_pages)
-        
-    return render(request, 'topics.html', {'board': board, 'topics':topics})
+    
+    # Kept on the page links
+    query = urlencode([('sort', sort)] + ([('mine', '1')] if mine else []))
+    return render(request, 'topics.html', {
+        'board': board,
+        'topics': topics,
+        'sort': sort,
+        'mine': mine,
+        'sort_choices': Topic.SORT_CHOICES,
+        'query': query,
+        'subscribed': request.user.is_authenticated and board.subscriptions.filter(user=request.user).exists(),
+    })
+
+@login_required
+def subscribe_board(request, pk):
+    '''
+    POST toggles the board in the user's daily digest
+    '''
+    board = board_cache.get_or_404(pk)
+    if request.method == 'POST':
+        subscription, created = Subscription.objects.get_or_create(user=request.user, board=board)
+        if not created:
+            subscription.delete()
+    return redirect('board_topics', pk=board.pk)
 
 @login_required
 def new_topic(request, pk):
-    board = get_object_or_404(Board, id=pk)
+    board = board_cache.get_or_404(pk)
     if request.method == 'POST':
         form = NewTopicForm(request.POST)
         if form.is_valid():
@@ -59,6 +106,7 @@ def new_topic(request, pk):
 @login_required
 def reply_topic(request, pk, topic_pk):
     topic = get_object_or_404(Topic, board_id=pk, id=topic_pk)
+    topic.board = board_cache.get(topic.board_id)
     if request.method == 'POST':
         form = PostForm(request.POST)
         if form.is_valid():
@@ -67,8 +115,11 @@ def reply_topic(request, pk, topic_pk):
             post.created_by = request.user
             post.save()
             
-            topic.last_updated = timezone.now()
-            topic.save()
+            if not topic.is_live:
+                # Live topics coalesce these writes, see boards/live.py
+                topic.last_updated = timezone.now()
+                topic.save(update_fields=['last_updated'])
+                topic.refresh_from_db(fields=['post_count'])
             
             topic_url = reverse('topic_posts', kwargs={'pk':pk, 'topic_pk':topic_pk})
             topic_post_url = '{url}?page={page}#{id}'.format(
@@ -81,7 +132,11 @@ def reply_topic(request, pk, topic_pk):
     else:
         form = PostForm()
         
-    return render(request, 'reply_topic.html', {'topic':topic, 'form':form})
+    if topic.is_live:
+        recent_posts = live.recent_posts(topic)
+    else:
+        recent_posts = topic.get_last_ten_posts()
+    return render(request, 'reply_topic.html', {'topic':topic, 'form':form, 'recent_posts':recent_posts})
 
 
 class PostListView(ListView):
@@ -92,22 +147,94 @@ class PostListView(ListView):
     context_object_name = 'posts'
     template_name = 'topic_posts.html'
     paginate_by = 10
+    paginator_class = CountedPaginator
+    # Both off for static snapshots
+    count_views = True
+    infinite_scroll = True
     
     def get_context_data(self, **kwargs):
-        session_key = 'viewed_topic_{}'.format(self.topic.id)
-        if not self.request.session.get(session_key, False):
+        '''
+        Viewed topics live in a signed cookie rather than the session, so
+        reading a thread never writes to the session store
+        '''
+        self.viewed_topics = get_viewed_topics(self.request)
+        self.first_view = self.count_views and self.topic.id not in self.viewed_topics
+        if self.first_view and self.topic.is_live:
+            live.record_view(self.topic)
+        elif self.first_view:
+            Topic.objects.filter(pk=self.topic.pk).update(views=F('views') + 1)
             self.topic.views += 1
-            self.topic.save()
-            self.request.session[session_key] = True
         kwargs['topic'] = self.topic
-        return super().get_context_data(**kwargs)
+        kwargs['infinite_scroll'] = self.infinite_scroll
+        context = super().get_context_data(**kwargs)
+        count_author_posts(context['posts'])
+        return context
+    
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if self.first_view:
+            set_viewed_topics(response, self.viewed_topics + [self.topic.id])
+        return response
+    
+    def get_paginator(self, queryset, per_page, **kwargs):
+        '''
+        Count pages from the maintained post counter instead of COUNT(*)
+        '''
+        if self.topic.is_live:
+            return live.TailPaginator(queryset, per_page, topic=self.topic, count=live.get_post_count(self.topic),
+                                      page_key=post_page_key(self.topic.pk), **kwargs)
+        return super().get_paginator(queryset, per_page, count=self.topic.post_count,
+                                     page_key=post_page_key(self.topic.pk), repair=self.repair_post_count, **kwargs)
+
+    def repair_post_count(self, count):
+        Topic.objects.filter(pk=self.topic.pk).update(post_count=count)
+        self.topic.post_count = count
     
     def get_queryset(self):
         self.topic = get_object_or_404(Topic, board_id=self.kwargs.get('pk'), id=self.kwargs.get('topic_pk'))
-        queryset = self.topic.posts.order_by('created_at')
+        self.topic.board = board_cache.get(self.topic.board_id)
+        queryset = self.topic.posts.prefetch_related('created_by__avatar').order_by('created_at', 'id')
         return queryset
     
     
+def count_author_posts(posts):
+    '''
+    Post counts of the authors on a page in one grouped query, rather than
+    a COUNT per card
+    '''
+    authors = {post.created_by_id for post in posts}
+    counts = dict(Post.objects.filter(created_by__in=authors).values_list('created_by').annotate(Count('id')).order_by())
+    for post in posts:
+        post.author_posts = counts.get(post.created_by_id, 0)
+
+def topic_posts_fragment(request, pk, topic_pk):
+    '''
+    Post cards after ?after=<post id>, for infinite scroll:
+    {"html": "...", "next": <cursor, or null after the last post>}
+
+    Posts come in the thread pages' (created_at, id) order, which imported
+    posts do not share with their ids.
+    '''
+    topic = get_object_or_404(Topic, board_id=pk, id=topic_pk)
+    topic.board = board_cache.get(topic.board_id)
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = max(1, min(int(request.GET.get('limit', PostListView.paginate_by)), 50))
+    except ValueError:
+        return JsonResponse({'error': 'after and limit must be integers'}, status=400)
+    posts = topic.posts.prefetch_related('created_by__avatar').order_by('created_at', 'id')
+    if after:
+        cursor = get_object_or_404(topic.posts.only('created_at'), id=after)
+        # One range of post_topic_created_idx
+        posts = posts.filter(Q(created_at__gt=cursor.created_at) | Q(created_at=cursor.created_at, id__gt=after))
+    posts = list(posts[:limit + 1])
+    more = len(posts) > limit
+    posts = posts[:limit]
+    count_author_posts(posts)
+    html = render_to_string('includes/post_cards.html', {'posts': posts, 'topic': topic}, request=request)
+    return JsonResponse({'html': html, 'next': posts[-1].id if more else None})
+    
+    
 class NewPostView(View):
     '''
     Example of a Class-Based View
@@ -143,12 +270,144 @@ class PostUpdateView(UpdateView):
         queryset = super().get_queryset()
         return queryset.filter(created_by=self.request.user)
     
+    def get_object(self, queryset=None):
+        post = super().get_object(queryset)
+        self.previous = (post.message, post.updated_by or post.created_by, post.updated_at or post.created_at)
+        return post
+    
     def form_valid(self, form):
         '''
         Overriding form_valid() to add extra fields
         '''
         post = form.save(commit=False)
-        post.updated_by = self.request.user
-        post.updated_at = timezone.now()
-        post.save()
-        return redirect('topic_posts', pk=post.topic.board.id, topic_pk=post.topic.id)
\ No newline at end of file
+        with transaction.atomic():
+            if post.message != self.previous[0]:
+                post.add_revision(*self.previous)
+            post.updated_by = self.request.user
+            post.updated_at = timezone.now()
+            post.save()
+        return redirect('topic_posts', pk=post.topic.board.id, topic_pk=post.topic.id)
+
+
+@login_required
+def post_history(request, pk, topic_pk, post_pk):
+    post = get_object_or_404(Post, topic__board_id=pk, topic_id=topic_pk, id=post_pk)
+    if not (request.user.is_staff or post.created_by_id == request.user.id):
+        raise PermissionDenied
+    return render(request, 'post_history.html', {'post': post, 'revisions': post.get_revisions()})
+
+
+def site_feed_last_modified(request):
+    request.feed_topics = feeds.newest_topics()
+    return feeds.get_last_modified(request.feed_topics)
+
+def board_feed_last_modified(request, pk):
+    request.feed_topics = feeds.newest_topics(board_cache.get_or_404(pk))
+    return feeds.get_last_modified(request.feed_topics)
+
+def sitemap_shard_last_modified(request, shard):
+    return feeds.shard_topics(shard).aggregate(last_updated=Max('last_updated'))['last_updated']
+
+@condition(last_modified_func=site_feed_last_modified)
+def site_feed(request):
+    return HttpResponse(feeds.get_feed(request, None, request.feed_topics), content_type='application/atom+xml; charset=utf-8')
+
+@condition(last_modified_func=board_feed_last_modified)
+def board_feed(request, pk):
+    board = board_cache.get_or_404(pk)
+    return HttpResponse(feeds.get_feed(request, board, request.feed_topics), content_type='application/atom+xml; charset=utf-8')
+
+@condition(last_modified_func=site_feed_last_modified)
+def sitemap_index(request):
+    return HttpResponse(feeds.build_sitemap_index(request), content_type='application/xml; charset=utf-8')
+
+@condition(last_modified_func=sitemap_shard_last_modified)
+def sitemap_topics(request, shard):
+    if shard >= feeds.get_shard_count():
+        raise Http404('No such sitemap')
+    return StreamingHttpResponse(feeds.stream_sitemap_shard(request, shard), content_type='application/xml; charset=utf-8')
+
+
+def topic_autocomplete(request):
+    '''
+    Typeahead over topic subjects: ?q=prefix[&board=pk][&order=views][&limit=n]
+    '''
+    query = request.GET.get('q', '')
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+        board_id = int(request.GET['board']) if request.GET.get('board') else None
+    except ValueError:
+        return JsonResponse({'error': 'limit and board must be integers'}, status=400)
+    results = []
+    if len(query.strip()) >= settings.AUTOCOMPLETE_MIN_LENGTH:
+        matches = subject_index.search(query, limit, request.GET.get('order', 'recent'), board_id)
+        for topic_id, subject, topic_board_id, views in matches:
+            results.append({
+                'id': topic_id,
+                'subject': subject,
+                'views': views,
+                'url': reverse('topic_posts', kwargs={'pk': topic_board_id, 'topic_pk': topic_id}),
+            })
+    return JsonResponse({'results': results})
+
+
+def chart(series):
+    '''
+    Adds the bar width, in percent of the busiest bucket
+    '''
+    busiest = max([posts for bucket, posts in series] + [1])
+    return [(bucket, posts, posts * 100 // busiest) for bucket, posts in series]
+
+def board_activity(request, pk):
+    board = board_cache.get_or_404(pk)
+    return render(request, 'board_activity.html', {
+        'board': board,
+        'hours': chart(activity.series(board.pk, Activity.HOUR, settings.ACTIVITY_HOURS)),
+        'days': chart(activity.series(board.pk, Activity.DAY, settings.ACTIVITY_DAYS)),
+    })
+
+def activity_json(request, pk=None):
+    '''
+    Posts per bucket: ?period=hour|day[&buckets=n], for a board or the site
+    '''
+    if pk is not None:
+        board_cache.get_or_404(pk)
+    period = request.GET.get('period', Activity.HOUR)
+    if period not in activity.PERIODS:
+        return JsonResponse({'error': 'period must be one of {}'.format(', '.join(activity.PERIODS))}, status=400)
+    default = settings.ACTIVITY_HOURS if period == Activity.HOUR else settings.ACTIVITY_DAYS
+    try:
+        count = max(1, min(int(request.GET.get('buckets', default)), settings.ACTIVITY_MAX_BUCKETS))
+    except ValueError:
+        return JsonResponse({'error': 'buckets must be an integer'}, status=400)
+    series = activity.series(pk, period, count)
+    return JsonResponse({
+        'board': pk,
+        'period': period,
+        'buckets': [{'start': bucket.isoformat(), 'posts': posts} for bucket, posts in series],
+    })
+
+
+def export_response(querysets, fmt, filename):
+    if fmt not in export.FORMATS:
+        raise Http404('Unknown export format')
+    response = StreamingHttpResponse(export.stream(querysets, fmt), content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(filename, fmt)
+    return response
+
+@staff_member_required
+def export_board(request, pk, fmt):
+    board = board_cache.get_or_404(pk)
+    return export_response(export.posts_for(board=board), fmt, 'board-{}'.format(board.pk))
+
+@staff_member_required
+def export_topic(request, pk, topic_pk, fmt):
+    topic = get_object_or_404(Topic, board_id=pk, id=topic_pk)
+    return export_response(export.posts_for(topic=topic), fmt, 'topic-{}'.format(topic.pk))
+
+
+def metrics_view(request):
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        raise PermissionDenied
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
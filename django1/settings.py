@@ -48,24 +48,42 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'boards.middleware.MetricsMiddleware',
+    'boards.middleware.SlowQueryMiddleware',
+    'boards.middleware.CompressionMiddleware',
+    'boards.middleware.ReplicaPinMiddleware',
+    'boards.middleware.BoardShardMiddleware',
+    'boards.middleware.AnonymousReadMiddleware',
+    'boards.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'boards.middleware.AuthenticationMiddleware',
+    'boards.middleware.ProfilingMiddleware',
+    'boards.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'django1.urls'
 
+# Project templates lose their indentation once, when they are compiled
+# (see boards/template_loaders.py). Templates are cached unless DEBUG is on.
+TEMPLATE_MINIFY = config('TEMPLATE_MINIFY', default=True, cast=bool)
+
+TEMPLATE_MINIFY_SKIP = ('password_reset_email.html', )
+
+template_loaders = [
+    'boards.template_loaders.Loader' if TEMPLATE_MINIFY else 'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [
 	    os.path.join(BASE_DIR, 'templates')
 	],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': template_loaders if DEBUG else [('django.template.loaders.cached.Loader', template_loaders)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -83,13 +101,209 @@ WSGI_APPLICATION = 'django1.wsgi.application'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 # Set this up with decouple when pushing to production
 
+# Seconds a worker keeps its connection open between requests
+CONN_MAX_AGE = config('CONN_MAX_AGE', default=600, cast=int)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+    }
+}
+
+# SQLite pragmas applied to every new connection, see boards/sqlite.py.
+# Compare settings with `manage.py bench_sqlite`.
+SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', default='wal')
+
+SQLITE_SYNCHRONOUS = config('SQLITE_SYNCHRONOUS', default='normal')
+
+SQLITE_CACHE_SIZE = config('SQLITE_CACHE_SIZE', default=-20000, cast=int)  # Negative is KiB
+
+SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=268435456, cast=int)
+
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)  # Milliseconds
+
+SQLITE_IMMEDIATE_TRANSACTIONS = config('SQLITE_IMMEDIATE_TRANSACTIONS', default=True, cast=bool)
+
+SQLITE_BUSY_RETRIES = config('SQLITE_BUSY_RETRIES', default=3, cast=int)
+
+SQLITE_BUSY_BACKOFF = config('SQLITE_BUSY_BACKOFF', default=0.05, cast=float)
+
+# Board shards
+# Topics and posts of a board live in the database named by Board.shard, one
+# SQLite file per shard. Create the tables with `manage.py migrate --database
+# <shard>` and move boards with `manage.py move_board`.
+BOARD_SHARDS = config('BOARD_SHARDS', default='', cast=Csv())
+
+for shard in BOARD_SHARDS:
+    DATABASES[shard] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / '{}.sqlite3'.format(shard),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+    }
+
+# Read replicas
+# Read-only copies of 'default', off unless listed here; GET requests read
+# from them while they lag less than REPLICA_MAX_LAG seconds, and a browser
+# reads from the primary for REPLICA_PIN_SECONDS after it writes. Keep
+# `manage.py replica_heartbeat --loop 1` running, or locally
+# `manage.py sync_replica --loop 1`, which keeps a SQLite copy up to date.
+DATABASE_REPLICAS = config('DATABASE_REPLICAS', default='', cast=Csv())
+
+for replica in DATABASE_REPLICAS:
+    DATABASES[replica] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:{}?mode=ro'.format(BASE_DIR / '{}.sqlite3'.format(replica)),
+        'OPTIONS': {'uri': True},
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5.0, cast=float)
+
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=5.0, cast=float)
+
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=15, cast=int)
+
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+DATABASE_ROUTERS = ['boards.routers.ReplicaRouter', 'boards.routers.BoardShardRouter']
+
+
+# Caching
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
     }
 }
 
+# Board rows are cached in a per-process LRU in front of the shared cache
+BOARD_CACHE_SIZE = config('BOARD_CACHE_SIZE', default=256, cast=int)
+
+BOARD_CACHE_LOCAL_TTL = config('BOARD_CACHE_LOCAL_TTL', default=5.0, cast=float)
+
+BOARD_CACHE_TIMEOUT = config('BOARD_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Paginators read topic counts from the cache for this many seconds
+PAGINATOR_COUNT_TIMEOUT = config('PAGINATOR_COUNT_TIMEOUT', default=60, cast=int)
+
+# Board stats and the first PAGE_CACHE_PAGES pages of topic lists and threads
+# are cached too. Concurrent misses for one key wait up to CACHE_LOCK_TIMEOUT
+# seconds for the first to fill it. Refill them after a deploy with
+# `manage.py warm_caches`.
+BOARD_STATS_TIMEOUT = config('BOARD_STATS_TIMEOUT', default=60, cast=int)
+
+PAGE_CACHE_PAGES = config('PAGE_CACHE_PAGES', default=3, cast=int)
+
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=30, cast=int)
+
+CACHE_LOCK_TIMEOUT = config('CACHE_LOCK_TIMEOUT', default=5.0, cast=float)
+
+CACHE_LOCK_POLL = config('CACHE_LOCK_POLL', default=0.05, cast=float)
+
+
+# Live game threads
+# Counters of live topics are written back at most once per LIVE_FLUSH_INTERVAL
+# seconds and the newest LIVE_TAIL_SIZE posts are kept in memory per process.
+
+LIVE_FLUSH_INTERVAL = config('LIVE_FLUSH_INTERVAL', default=5, cast=int)
+
+LIVE_TAIL_SIZE = config('LIVE_TAIL_SIZE', default=50, cast=int)
+
+LIVE_TAIL_REFRESH = config('LIVE_TAIL_REFRESH', default=1.0, cast=float)
+
+LIVE_TAIL_TTL = config('LIVE_TAIL_TTL', default=30.0, cast=float)
+
+
+# Post edit history keeps deltas, with a full copy every N revisions
+POST_REVISION_SNAPSHOT_INTERVAL = config('POST_REVISION_SNAPSHOT_INTERVAL', default=10, cast=int)
+
+
+# Atom feeds and sitemaps
+FEED_SIZE = config('FEED_SIZE', default=50, cast=int)
+
+FEED_CACHE_TIMEOUT = config('FEED_CACHE_TIMEOUT', default=86400, cast=int)
+
+SITEMAP_SHARD_SIZE = config('SITEMAP_SHARD_SIZE', default=50000, cast=int)
+
+SITEMAP_CACHE_TIMEOUT = config('SITEMAP_CACHE_TIMEOUT', default=3600, cast=int)
+
+
+# Topic subject autocomplete keeps the most recent topics in memory per process
+AUTOCOMPLETE_MAX_TOPICS = config('AUTOCOMPLETE_MAX_TOPICS', default=200000, cast=int)
+
+AUTOCOMPLETE_REBUILD_INTERVAL = config('AUTOCOMPLETE_REBUILD_INTERVAL', default=300, cast=int)
+
+AUTOCOMPLETE_SCAN_LIMIT = config('AUTOCOMPLETE_SCAN_LIMIT', default=5000, cast=int)
+
+AUTOCOMPLETE_MIN_LENGTH = config('AUTOCOMPLETE_MIN_LENGTH', default=2, cast=int)
+
+
+# Post exports fetch and emit this many rows at a time
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+
+# Topics without replies for SNAPSHOT_IDLE_DAYS are rendered to static HTML
+# under SNAPSHOT_ROOT by `manage.py snapshot_topics`, see boards/snapshots.py
+SNAPSHOT_ROOT = config('SNAPSHOT_ROOT', default=os.path.join(BASE_DIR, 'snapshots'))
+
+SNAPSHOT_IDLE_DAYS = config('SNAPSHOT_IDLE_DAYS', default=7, cast=int)
+
+
+# Response compression (see boards/compression.py); brotli needs the optional
+# brotli package, gzip is always available
+COMPRESSION_ENABLED = config('COMPRESSION_ENABLED', default=True, cast=bool)
+
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=200, cast=int)
+
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
+
+# Logged-out GETs of these pages without a session or messages cookie get a
+# plain AnonymousUser and skip the session and messages response work, which
+# leaves the auth and messages context processors nothing to look up. Compare
+# with `manage.py bench_anonymous`.
+ANONYMOUS_FAST_PATH = config('ANONYMOUS_FAST_PATH', default=True, cast=bool)
+
+ANONYMOUS_FAST_PATH_VIEWS = ('home', 'board_topics', 'topic_posts', 'topic_posts_fragment')
+
+
+# Posts per hour and per day are rolled up as they are written, see
+# boards/activity.py. The board activity page charts this many buckets.
+ACTIVITY_HOURS = config('ACTIVITY_HOURS', default=48, cast=int)
+
+ACTIVITY_DAYS = config('ACTIVITY_DAYS', default=30, cast=int)
+
+ACTIVITY_MAX_BUCKETS = config('ACTIVITY_MAX_BUCKETS', default=744, cast=int)
+
+# Seconds a process collects new posts before writing them to the rollups
+ACTIVITY_FLUSH_INTERVAL = config('ACTIVITY_FLUSH_INTERVAL', default=10, cast=float)
+
+
+# Sessions
+# 'db' stores every session in django_session, 'cache' reads sessions from the
+# cache and writes through to the database, 'cookie' keeps them in a signed
+# cookie and never touches the database. Compare with `manage.py bench_sessions`.
+
+SESSION_MODE = config('SESSION_MODE', default='db')
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+# Topics a browser has viewed are remembered in a signed cookie, newest last
+VIEWED_TOPICS_MAX = config('VIEWED_TOPICS_MAX', default=200, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -133,6 +347,12 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# Uploaded and generated files (avatars)
+
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -146,4 +366,59 @@ LOGIN_REDIRECT_URL = 'home'
 
 # Testing email for password change
 
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Daily digests, see boards/digest.py. Links in emails start with SITE_URL.
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+
+DIGEST_FROM_EMAIL = config('DIGEST_FROM_EMAIL', default='digest@nbaboards.local')
+
+DIGEST_CHUNK_SIZE = config('DIGEST_CHUNK_SIZE', default=500, cast=int)  # Users per batch
+
+DIGEST_TOPICS_PER_BOARD = config('DIGEST_TOPICS_PER_BOARD', default=5, cast=int)
+
+# Metrics
+# Each worker dumps its counters into METRICS_DIR; /metrics sums all of them.
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(BASE_DIR, 'metrics'))
+
+METRICS_WRITE_INTERVAL = config('METRICS_WRITE_INTERVAL', default=5.0, cast=float)
+
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1', cast=Csv())
+
+
+# Request profiling
+# Send the PROFILING_HEADER as staff (or with DEBUG on) to profile one request,
+# or set a sample rate between 0 and 1. Summarize with `manage.py profile_summary`.
+
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+
+PROFILING_HEADER = config('PROFILING_HEADER', default='X-Profile')
+
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+
+PROFILING_MODE = config('PROFILING_MODE', default='cprofile')  # 'cprofile' or 'sample'
+
+PROFILING_SAMPLE_INTERVAL = config('PROFILING_SAMPLE_INTERVAL', default=0.005, cast=float)
+
+PROFILING_DIR = config('PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+
+
+# Slow queries
+# Queries taking SLOW_QUERY_THRESHOLD seconds or more are logged with their
+# plan to SLOW_QUERY_LOG. Rank them with `manage.py slow_query_report`. The
+# log is not rotated by the app; slow_query_report also reads up to
+# SLOW_QUERY_LOG_BACKUPS files rotated to SLOW_QUERY_LOG.1, .2, ...
+
+SLOW_QUERY_ENABLED = config('SLOW_QUERY_ENABLED', default=True, cast=bool)
+
+SLOW_QUERY_THRESHOLD = config('SLOW_QUERY_THRESHOLD', default=0.1, cast=float)
+
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=os.path.join(BASE_DIR, 'slow-queries.log'))
+
+SLOW_QUERY_LOG_BACKUPS = config('SLOW_QUERY_LOG_BACKUPS', default=5, cast=int)
+
+# After its first line, a fingerprint gets one summary line per this many seconds
+SLOW_QUERY_SUMMARY_INTERVAL = config('SLOW_QUERY_SUMMARY_INTERVAL', default=60, cast=float)
@@ -22,6 +22,7 @@ from accounts import views as accounts_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', views.metrics_view, name='metrics'),
     path('signup/', accounts_views.signup, name='signup'),
     path('logout/',
          auth_views.LogoutView.as_view(), 
@@ -54,14 +55,31 @@ urlpatterns = [
          name='password_change_done'),
     
     path('settings/account/', accounts_views.UserUpdateView.as_view(), name='my_account'),
+    path('media/avatars/<slug:name>.svg', accounts_views.avatar, name='avatar'),
     
     path('', views.home,  name='home'),
     path('boards/<int:pk>/', views.board_topics, name='board_topics'),
     path('boards/<int:pk>/new/', views.new_topic, name='new_topic'),
+    path('boards/<int:pk>/subscribe/', views.subscribe_board, name='subscribe_board'),
+    path('topics/autocomplete/', views.topic_autocomplete, name='topic_autocomplete'),
     
     path('boards/<int:pk>/topics/<int:topic_pk>/', views.PostListView.as_view(), name='topic_posts'),
+    path('boards/<int:pk>/topics/<int:topic_pk>/posts/', views.topic_posts_fragment, name='topic_posts_fragment'),
     path('boards/<int:pk>/topics/<int:topic_pk>/reply/', views.reply_topic, name='reply_topic'),
+    path('boards/<int:pk>/export.<str:fmt>', views.export_board, name='export_board'),
+    path('boards/<int:pk>/activity/', views.board_activity, name='board_activity'),
+    path('boards/<int:pk>/activity.json', views.activity_json, name='board_activity_json'),
+    path('activity.json', views.activity_json, name='site_activity_json'),
+    path('boards/<int:pk>/topics/<int:topic_pk>/export.<str:fmt>', views.export_topic, name='export_topic'),
+    
+    path('feed/', views.site_feed, name='site_feed'),
+    path('boards/<int:pk>/feed/', views.board_feed, name='board_feed'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path('sitemap-topics-<int:shard>.xml', views.sitemap_topics, name='sitemap_topics'),
+    
     path('new_post/', views.NewPostView.as_view(), name='new_post'),
     path('boards/<int:pk>/topics/<int:topic_pk>/posts/<int:post_pk>/edit/', 
          views.PostUpdateView.as_view(), name='edit_post'),
+    path('boards/<int:pk>/topics/<int:topic_pk>/posts/<int:post_pk>/history/',
+         views.post_history, name='post_history'),
 ]
\ No newline at end of file